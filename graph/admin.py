@@ -1,99 +1,167 @@
-from typing import Dict, Any
-from langchain_openai import ChatOpenAI
+import os
+import re
+import json
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Optional
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from .state import ContractState
-from tools.doc_tools import export_signature_pdf, export_to_pdf
+from tools.doc_tools import export_signature_pdf, export_to_docx, export_to_pdf
 from tools.signature_tools import generate_signature_placeholder
+from tools.payment_tools import PAYMENT_TEXT_FACTS, batch_schedules
+from tools.fact_tools import parse_date, extract_local_facts, load_facts
+from tools.contract_rules import RULES, section_text
+from tools.placeholder_tools import is_plain_value
+from tools.content_cache import ContentCache, content_hash
+from tools.llm_gateway import get_gateway
+from tools.portfolio_index import export_recorder, record_export
+from tools.speculation import get_speculator
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+
+# Output -> pattern that requests it
+OUTPUT_PATTERNS = {
+    "txt": re.compile(r"\btxt\b|\btext file\b|\bplain text\b"),
+    "ics": re.compile(r"\bics\b|\bcalendar\b|\bdeadlines?\b|\breminders?\b"),
+    "pdf": re.compile(r"\bpdf\b"),
+    "docx": re.compile(r"\bdocx\b|\bword (?:doc|document|file)\b"),
+    "signature": re.compile(r"\be-?sign\w*|\bsignatures?\b"),
+    "payments": re.compile(r"\binvoices?\b|\bpayment schedule\b|\bmilestones?\b|\bbilling\b"),
+}
+# Used when the request names no specific output (e.g. "handle the admin for this contract")
+DEFAULT_OUTPUTS = ["ics", "signature"]
+
+def versioned_path(base_name: str, extension: str) -> str:
+    # contract.txt, contract_v2.txt, ... so earlier exports are never overwritten
+    os.makedirs(DATA_DIR, exist_ok=True)
+    counter = 1
+    while True:
+        filename = f"{base_name}_v{counter}{extension}" if counter > 1 else f"{base_name}{extension}"
+        filepath = os.path.join(DATA_DIR, filename)
+        try:
+            # Reserve the name atomically: parallel exporters, background renders and other daemon sessions
+            # must never be handed the same file
+            os.close(os.open(filepath, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+            return filepath
+        except FileExistsError:
+            counter += 1
 
 class AdminSupervisor:
     def __init__(self):
-        self.llm = ChatOpenAI(model="gpt-4o", temperature=0)
+        self.gateway = get_gateway()
+        self.deadline_cache = ContentCache("deadlines")
 
     def run(self, state: ContractState) -> ContractState:
         print("--- Admin Subgraph Started ---")
-        
-        # 1. Deadline Extractor
-        self._deadline_extractor(state)
-        
-        # 2. Scheduler / ICS Generator
-        self._scheduler_generator(state)
-        
-        # 3. Signature Exporter
-        self._signature_exporter(state)
-        
-        # 4. Export & Notify
-        self._export_and_notify(state)
-
-        # 5. Text Exporter
-        self._text_exporter(state)
-        
+
+        # 1. Plan which outputs the user asked for
+        plan = self._plan_node(state)
+
+        # 2. Run the requested exporters; they are independent, so run them in parallel
+        exporters = {
+            "txt": self._text_exporter,
+            "ics": self._calendar_exporter,
+            "pdf": self._pdf_exporter,
+            "docx": self._docx_exporter,
+            "signature": self._signature_exporter,
+            "payments": self._payment_exporter,
+        }
+        with ThreadPoolExecutor(max_workers=len(plan)) as pool:
+            # Each exporter gets a copy of the turn's context so it sees the turn budget
+            futures = {output: pool.submit(contextvars.copy_context().run, exporters[output], state) for output in plan}
+
+        # Log in plan order so the message log stays deterministic
+        for output in plan:
+            try:
+                for entry in futures[output].result():
+                    state.log_node(entry)
+            except Exception as e:
+                print(f"Admin export '{output}' failed: {e}")
+                state.log_node({"node": f"{output}_exporter", "status": "failed", "info": str(e)})
+
+        # 3. Export & Notify
+        self._export_and_notify(state, plan)
+
         return state
 
-    def _text_exporter(self, state: ContractState):
-        print("--- Admin: Checking for Text Export ---")
-        # Find the last user message
-        last_user_msg = next((m.get("content", "") for m in reversed(state.messages) if m.get("role") == "user"), "").lower()
-        
-        # Check if user asked for text file
-        if any(keyword in last_user_msg for keyword in ["txt", "text file", ".txt", "plain text"]):
-            print("--- Admin: Exporting to .txt ---")
-            import os
-            data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
-            os.makedirs(data_dir, exist_ok=True)
-            
-            # Generate unique filename
-            base_name = "contract"
-            extension = ".txt"
-            counter = 1
-            while True:
-                filename = f"{base_name}_v{counter}{extension}" if counter > 1 else f"{base_name}{extension}"
-                filepath = os.path.join(data_dir, filename)
-                if not os.path.exists(filepath):
-                    break
-                counter += 1
-            
-            content = state.draft_content or "No contract content available."
-            with open(filepath, "w", encoding="utf-8") as f:
-                f.write(content)
-                
-            state.messages.append({
-                "node": "text_exporter",
-                "status": "done",
-                "info": f"Text file generated at {filepath}"
-            })
-
-    def _deadline_extractor(self, state: ContractState):
+    def _plan_node(self, state: ContractState) -> List[str]:
+        print("--- Admin: Planning Outputs ---")
+        request = state.current_request().lower()
+        plan = [output for output, pattern in OUTPUT_PATTERNS.items() if pattern.search(request)]
+        if not plan:
+            plan = list(DEFAULT_OUTPUTS)
+
+        state.log_node({
+            "node": "admin_plan",
+            "status": "done",
+            "outputs": plan
+        })
+        return plan
+
+    def _text_exporter(self, state: ContractState) -> List[Dict[str, Any]]:
+        print("--- Admin: Exporting to .txt ---")
+        filepath = versioned_path("contract", ".txt")
+        content = state.draft_content or "No contract content available."
+        with open(filepath, "w", encoding="utf-8") as f:
+            f.write(content)
+        record_export(state, filepath)
+
+        return [{
+            "node": "text_exporter",
+            "status": "done",
+            "info": f"Text file generated at {filepath}"
+        }]
+
+    def _calendar_exporter(self, state: ContractState) -> List[Dict[str, Any]]:
+        # The scheduler needs the extracted deadlines, so these two stay sequential
+        return [self._deadline_extractor(state), self._scheduler_generator(state)]
+
+    def _deadline_extractor(self, state: ContractState) -> Dict[str, Any]:
         print("--- Admin: Extracting Deadlines ---")
+        text = state.draft_content or state.current_request()
+        key = content_hash(text)
+
+        # Deadlines only depend on the contract text, so repeated exports (and speculation) reuse them
+        # Only a result that is already there: waiting on a running LLM job would spend the turn budget
+        deadlines = get_speculator().take(state, "deadlines", wait=False)
+        if deadlines is None:
+            deadlines = self.deadline_cache.get(key)
+        cached = deadlines is not None
+        if not cached:
+            deadlines = self.extract_deadlines(text) or []
+
+        state.extracted_facts["deadlines"] = deadlines
+        return {
+            "node": "deadline_extractor",
+            "status": "done",
+            "cached": cached,
+            "deadlines": deadlines
+        }
+
+    def extract_deadlines(self, text: str) -> Optional[List[Dict[str, Any]]]:
+        """LLM deadline extraction, cached by content hash. None if the response could not be parsed."""
         prompt = ChatPromptTemplate.from_template(
             "Extract all deadlines and dates from this contract text: {text}. "
             "Return a JSON list of objects with 'date' (YYYY-MM-DD) and 'description'. "
             "Example: [{{\"date\": \"2023-12-31\", \"description\": \"Project Completion\"}}]"
         )
-        chain = prompt | self.llm | StrOutputParser()
-        
-        text = state.draft_content or (state.messages[0].get("content", "") if state.messages else "")
+        chain = prompt | self.gateway.chat("deadline_extractor") | StrOutputParser()
         try:
             deadlines_json = chain.invoke({"text": text[:5000]})
             # Clean up potential markdown code blocks
             deadlines_json = deadlines_json.replace("```json", "").replace("```", "").strip()
-            import json
             deadlines = json.loads(deadlines_json)
         except Exception as e:
             print(f"Error parsing deadlines: {e}")
-            deadlines = []
-        
-        state.extracted_facts["deadlines"] = deadlines
-        state.messages.append({
-            "node": "deadline_extractor",
-            "status": "done",
-            "deadlines": deadlines
-        })
+            return None
+        self.deadline_cache.set(content_hash(text), deadlines)
+        return deadlines
 
-    def _scheduler_generator(self, state: ContractState):
+    def _scheduler_generator(self, state: ContractState) -> Dict[str, Any]:
         print("--- Admin: Generating Scheduler ---")
         deadlines = state.extracted_facts.get("deadlines", [])
-        
+
         if not deadlines:
             info = "No deadlines found to schedule."
         else:
@@ -108,46 +176,110 @@ class AdminSupervisor:
                     ics_content += f"SUMMARY:{desc}\n"
                     ics_content += "END:VEVENT\n"
             ics_content += "END:VCALENDAR"
-            
-            # Save to file
-            import os
-            data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
-            os.makedirs(data_dir, exist_ok=True)
-            filepath = os.path.join(data_dir, "contract_deadlines.ics")
+
+            # Versioned like the other exports: one shared name let concurrent sessions overwrite each other's
+            # calendar while the portfolio index pointed at the wrong contract
+            filepath = versioned_path("contract_deadlines", ".ics")
             with open(filepath, "w") as f:
                 f.write(ics_content)
-            
+            record_export(state, filepath)
+
             info = f"ICS file generated at {filepath}"
 
-        state.messages.append({
+        return {
             "node": "scheduler_generator",
             "status": "done",
             "info": info
-        })
+        }
+
+    def _export_after_speculation(self, state: ContractState, fmt: str, export: Callable[..., str]) -> str:
+        # A speculative render of this draft fills the render cache, making the export a copy. The export is
+        # chained onto that render instead of waiting for it, so the node returns at once either way; the
+        # file is indexed only once it has been written.
+        content = state.draft_content or "No content"
+        path = versioned_path("contract", f".{fmt}")
+        recorded = export_recorder(state)
+        if not get_speculator().then(state, fmt, lambda _: export(content, path, wait=False, on_done=recorded)):
+            # Rendering continues in the background process pool; cached renders finish immediately
+            export(content, path, wait=False, on_done=recorded)
+        return path
 
-    def _signature_exporter(self, state: ContractState):
+    def _pdf_exporter(self, state: ContractState) -> List[Dict[str, Any]]:
+        print("--- Admin: Exporting to PDF ---")
+        pdf_path = self._export_after_speculation(state, "pdf", export_to_pdf)
+        return [{
+            "node": "pdf_exporter",
+            "status": "rendering",
+            "info": f"PDF rendering to {pdf_path}"
+        }]
+
+    def _docx_exporter(self, state: ContractState) -> List[Dict[str, Any]]:
+        print("--- Admin: Exporting to DOCX ---")
+        docx_path = self._export_after_speculation(state, "docx", export_to_docx)
+        return [{
+            "node": "docx_exporter",
+            "status": "rendering",
+            "info": f"DOCX rendering to {docx_path}"
+        }]
+
+    def _signature_exporter(self, state: ContractState) -> List[Dict[str, Any]]:
         print("--- Admin: Exporting for Signature ---")
         # Generate signature placeholder
         sig_data = generate_signature_placeholder("Client")
         state.signatures = sig_data
-        
+
         # Export PDF
-        pdf_path = export_signature_pdf(state.draft_content or "No content", sig_data)
-        
-        state.messages.append({
+        pdf_path = export_signature_pdf(state.draft_content or "No content", sig_data, versioned_path("signed_contract", ".pdf"),
+                                        wait=False, on_done=export_recorder(state))
+
+        return [{
             "node": "signature_exporter",
-            "status": "done",
+            "status": "rendering",
             "pdf_path": pdf_path,
             "signature_data": sig_data
-        })
+        }]
+
+    def _payment_exporter(self, state: ContractState) -> List[Dict[str, Any]]:
+        print("--- Admin: Scheduling Payments ---")
+
+        def skipped(info: str) -> List[Dict[str, Any]]:
+            return [{"node": "payment_scheduler", "status": "skipped", "info": info}]
+
+        # Only the payment section says what to bill: a liability cap or insurance minimum elsewhere is not a price
+        payment = section_text(state.draft_content or "", RULES["payment_heading"])
+        if RULES["amount_placeholder"].search(payment):
+            return skipped("The payment amount is still a placeholder; fill it in before scheduling payments.")
+        local, _ = extract_local_facts(payment)
+        # Facts the user gave win over the contract text; run-on answers are not values to bill from
+        given = {k: v for k, v in load_facts(state.extracted_facts.get("key_info")).items() if is_plain_value(str(v))}
+        facts = {**{k: local[k] for k in PAYMENT_TEXT_FACTS if k in local}, **given}
+        if not parse_date(str(facts.get("START_DATE") or "")):
+            return skipped("No start date to date the invoices from; add [START_DATE] to schedule payments.")
+        portfolio = batch_schedules([facts], [state.session_id])
+        if not len(portfolio):
+            return skipped("No amount in the payment section, or no end date to spread milestones or monthly "
+                           "invoices over.")
+
+        state.payment_schedule = portfolio.for_contract(0)
+        invoices_path = versioned_path("invoices", ".jsonl")
+        ics_path = versioned_path("payment_schedule", ".ics")
+        portfolio.write_invoices(invoices_path)
+        portfolio.write_ics(ics_path)
+        return [{
+            "node": "payment_scheduler",
+            "status": "done",
+            "schedule_id": state.payment_schedule["schedule_id"],
+            "installments": len(portfolio),
+            "info": f"Invoices at {invoices_path}, payment reminders at {ics_path}"
+        }]
 
-    def _export_and_notify(self, state: ContractState):
+    def _export_and_notify(self, state: ContractState, plan: List[str]):
         print("--- Admin: Notifying ---")
         # Placeholder notification
-        state.messages.append({
+        state.log_node({
             "node": "export_and_notify",
             "status": "done",
-            "info": "Notification sent (placeholder)"
+            "info": f"Notification sent (placeholder) for: {', '.join(plan)}"
         })
 
 if __name__ == "__main__":
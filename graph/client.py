@@ -0,0 +1,149 @@
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+# Kept free of heavy imports so the client starts instantly; the daemon holds the models
+SOCKET_PATH = os.getenv("LEXIS_SOCKET", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "lexis.sock"))
+
+class RPCError(Exception):
+    def __init__(self, error: Dict[str, Any]):
+        super().__init__(f"{error.get('message')} (code {error.get('code')})")
+        self.code = error.get("code")
+
+class LexisClient:
+    """JSON-RPC 2.0 client for the Lexis daemon; one newline-delimited JSON message per request."""
+
+    def __init__(self, socket_path: str = SOCKET_PATH, timeout: Optional[float] = None):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(socket_path)
+        self.reader = self.sock.makefile("r", encoding="utf-8")
+        self.next_id = 0
+
+    def call(self, method: str, **params) -> Any:
+        self.next_id += 1
+        request = {"jsonrpc": "2.0", "id": self.next_id, "method": method, "params": params}
+        self.sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        return self.receive()
+
+    def receive(self) -> Any:
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("Daemon closed the connection")
+        response = json.loads(line)
+        if "error" in response:
+            raise RPCError(response["error"])
+        return response["result"]
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+LOAD_TEST_DRAFT = (
+    "SERVICE AGREEMENT\n\n"
+    "This Agreement is between [CLIENT_NAME] and [PROVIDER_NAME].\n\n"
+    "1. Payment\n\nClient shall pay [AMOUNT] within [PAYMENT_TIMELINE] days of each invoice.\n\n"
+    "2. Term\n\nThis Agreement begins on [START_DATE] and ends on [END_DATE].\n"
+)
+LOAD_TEST_FILLS = ["[CLIENT_NAME]{name}", "[PROVIDER_NAME]Studio {n}", "[AMOUNT]${n}000",
+                   "[PAYMENT_TIMELINE]30", "[START_DATE]2025-01-01 [END_DATE]2025-12-31"]
+
+def load_test(sessions: int = 20, socket_path: str = SOCKET_PATH) -> Dict[str, Any]:
+    """Drive many sessions at once with fill-only turns (no LLM calls) and check isolation."""
+    run_id = uuid.uuid4().hex[:6]
+
+    def drive(n: int) -> Dict[str, Any]:
+        session_id = f"load-{run_id}-{n}"
+        client = LexisClient(socket_path)
+        latencies, errors = [], 0
+        try:
+            client.call("load_draft", session_id=session_id, draft=LOAD_TEST_DRAFT)
+            for template in LOAD_TEST_FILLS:
+                start = time.perf_counter()
+                try:
+                    client.call("turn", session_id=session_id, text=template.format(name=f"Client {n}", n=n))
+                except RPCError:
+                    errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+            draft = client.call("state", session_id=session_id)["draft_content"]
+            isolated = f"Client {n} and Studio {n}." in draft
+        finally:
+            client.close()
+        return {"latencies": latencies, "errors": errors, "isolated": isolated}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        results = list(pool.map(drive, range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(ms for result in results for ms in result["latencies"])
+    report = {
+        "sessions": sessions,
+        "turns": len(latencies),
+        "errors": sum(result["errors"] for result in results),
+        "isolation_failures": sum(not result["isolated"] for result in results),
+        "elapsed_s": round(elapsed, 2),
+        "turns_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 1),
+        "p95_ms": round(latencies[max(int(len(latencies) * 0.95) - 1, 0)], 1),
+    }
+    print(f"Load test: {report}")
+    return report
+
+def repl(session_id: str = "default", socket_path: str = SOCKET_PATH):
+    print("\n🤖 Lexis-Freelance-Local (connected to daemon)")
+    print("Type 'exit' to quit.\n")
+    client = LexisClient(socket_path)
+    while True:
+        try:
+            user_input = input(f"\nUser ({session_id}): ")
+            if user_input.lower() in ["exit", "quit"]:
+                print("Lexis: Goodbye!")
+                break
+            if user_input.startswith("/sessions"):
+                print(client.call("sessions"))
+                continue
+            elif user_input.startswith("/session"):
+                parts = user_input.split()
+                if len(parts) > 1:
+                    session_id = parts[1]
+                    print(f"Switched to session: {session_id}")
+                else:
+                    print(f"Current session: {session_id}")
+                continue
+            elif user_input.startswith("/new"):
+                session_id = str(uuid.uuid4())[:8]
+                print(f"Started new session: {session_id}")
+                continue
+            elif user_input.startswith("/info"):
+                print(f"Current Session ID: {session_id}")
+                continue
+
+            try:
+                result = client.call("turn", session_id=session_id, text=user_input)
+            except KeyboardInterrupt:
+                # Ctrl-C cancels the turn on the daemon; its (cancelled) reply is still read off the socket
+                canceller = LexisClient(socket_path)
+                canceller.call("cancel", session_id=session_id)
+                canceller.close()
+                result = client.receive()
+            print(result["output"], end="")
+        except (KeyboardInterrupt, EOFError):
+            print("\nLexis: Goodbye!")
+            break
+        except RPCError as e:
+            print(f"An error occurred: {e}")
+    client.close()
+
+if __name__ == "__main__":
+    # python -m graph.client [--session ID] | python -m graph.client --load-test [SESSIONS]
+    if len(sys.argv) > 1 and sys.argv[1] == "--load-test":
+        load_test(int(sys.argv[2]) if len(sys.argv) > 2 else 20)
+    else:
+        repl(sys.argv[2] if len(sys.argv) > 2 and sys.argv[1] == "--session" else "default")
@@ -0,0 +1,194 @@
+import os
+import io
+import sys
+import json
+import stat
+import asyncio
+import inspect
+import contextvars
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+from .client import SOCKET_PATH
+from .main import Router, Orchestrator, checkpoint_path, checkpoint_state, load_checkpoint, run_turn
+from tools.turn_budget import TurnBudget, TurnCancelled
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR, INVALID_REQUEST, METHOD_NOT_FOUND, INVALID_PARAMS, SERVER_ERROR = -32700, -32600, -32601, -32602, -32000
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+# Output printed by a turn goes to that turn's buffer instead of the daemon's stdout
+_turn_output: contextvars.ContextVar[Optional[io.StringIO]] = contextvars.ContextVar("turn_output", default=None)
+
+class _TurnStdout(io.TextIOBase):
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text: str) -> int:
+        buffer = _turn_output.get()
+        return (buffer if buffer is not None else self.stream).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+class LexisDaemon:
+    """Serves concurrent sessions over a Unix socket.
+
+    The router, orchestrator (vector stores, Presidio, LLM gateway) and embedder are built once and
+    shared; each session's turns are serialized by a per-session lock and its state lives in its own checkpoint.
+    """
+
+    def __init__(self, socket_path: str = SOCKET_PATH, max_workers: Optional[int] = None):
+        self.socket_path = socket_path
+        self.router = Router()
+        self.orchestrator = Orchestrator()
+        self.embedder = ThreadPoolExecutor(max_workers=4, thread_name_prefix="embed")
+        # Turns are synchronous (LLM calls, Chroma, Presidio), so they run on worker threads
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or int(os.getenv("LEXIS_DAEMON_WORKERS", "8")),
+                                           thread_name_prefix="turn")
+        self.session_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self.budgets: Dict[str, TurnBudget] = {}  # running turn per session, for cancel
+        self.methods = {
+            "ping": self.ping,
+            "turn": self.turn,
+            "cancel": self.cancel,
+            "state": self.get_state,
+            "load_draft": self.load_draft,
+            "sessions": self.sessions,
+            "speculation": self.speculation,
+        }
+
+    async def _run(self, func, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, contextvars.copy_context().run, func, *args)
+
+    async def ping(self) -> str:
+        return "pong"
+
+    async def turn(self, session_id: str, text: str, budget_seconds: Optional[float] = None) -> Dict[str, Any]:
+        checkpoint_path(session_id)  # validates the id before any work
+        buffer = io.StringIO()
+
+        def work():
+            _turn_output.set(buffer)
+            try:
+                return run_turn(self.router, self.orchestrator, session_id, text, self.embedder, budget)
+            except TurnCancelled as e:
+                print(f"\n⏹️ Turn cancelled ({e}).")
+                return None
+
+        async with self.session_locks[session_id]:
+            budget = self.budgets[session_id] = TurnBudget(budget_seconds)
+            try:
+                state = await self._run(work)
+            finally:
+                del self.budgets[session_id]
+        return {
+            "session_id": session_id,
+            "category": state.task_category if state else None,
+            "output": buffer.getvalue(),
+            "validation_report": state.validation_report if state else {},
+            "cancelled": budget.cancelled,
+            "degraded": budget.degraded,
+        }
+
+    async def cancel(self, session_id: str) -> Dict[str, Any]:
+        """Cancel the session's running turn; its in-flight LLM calls are abandoned."""
+        budget = self.budgets.get(session_id)
+        if budget is not None:
+            budget.cancel()
+        return {"session_id": session_id, "cancelled": budget is not None}
+
+    async def get_state(self, session_id: str) -> Dict[str, Any]:
+        async with self.session_locks[session_id]:
+            state = await self._run(load_checkpoint, session_id)
+        return state.model_dump()
+
+    async def load_draft(self, session_id: str, draft: str) -> Dict[str, Any]:
+        """Replace a session's draft (e.g. a contract to review) without running a turn."""
+        def work():
+            state = load_checkpoint(session_id)
+            state.draft_content = draft
+            checkpoint_state(state)
+            return len(draft)
+
+        async with self.session_locks[session_id]:
+            return {"session_id": session_id, "chars": await self._run(work)}
+
+    async def sessions(self) -> Dict[str, Any]:
+        return {"active": sorted(sid for sid, lock in self.session_locks.items() if lock.locked()),
+                "known": len(self.session_locks)}
+
+    async def speculation(self) -> Dict[str, Any]:
+        return self.orchestrator.speculator.report()
+
+    async def dispatch(self, line: bytes) -> Optional[Dict[str, Any]]:
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": PARSE_ERROR, "message": str(e)}}
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": INVALID_REQUEST, "message": "Invalid request"}}
+
+        request_id = request.get("id")
+        method = self.methods.get(request["method"])
+        params = request.get("params") or {}
+        if method is None:
+            error = {"code": METHOD_NOT_FOUND, "message": f"Unknown method: {request['method']}"}
+        elif not isinstance(params, dict):
+            error = {"code": INVALID_PARAMS, "message": "params must be an object"}
+        else:
+            try:
+                inspect.signature(method).bind(**params)
+                result = await method(**params)
+                return None if request_id is None else {"jsonrpc": "2.0", "id": request_id, "result": result}
+            except (TypeError, ValueError) as e:
+                # Bad or missing params, or an invalid session id
+                error = {"code": INVALID_PARAMS, "message": str(e)}
+            except Exception as e:
+                print(f"⚠️ {request['method']} failed: {e}")
+                error = {"code": SERVER_ERROR, "message": str(e)}
+        # Notifications (no id) get no response, even on error
+        return None if request_id is None else {"jsonrpc": "2.0", "id": request_id, "error": error}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                response = await self.dispatch(line)
+                if response is not None:
+                    writer.write((json.dumps(response, default=str) + "\n").encode("utf-8"))
+                    await writer.drain()
+        except (ConnectionResetError, BrokenPipeError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.LimitOverrunError:
+            print("⚠️ Client sent a message over the size limit; closing connection")
+        finally:
+            writer.close()
+
+    async def serve(self):
+        os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+        if os.path.exists(self.socket_path) and stat.S_ISSOCK(os.stat(self.socket_path).st_mode):
+            os.remove(self.socket_path)  # stale socket from a previous run
+        server = await asyncio.start_unix_server(self.handle, path=self.socket_path, limit=MAX_MESSAGE_BYTES)
+        os.chmod(self.socket_path, 0o600)  # local user only
+        print(f"Lexis daemon listening on {self.socket_path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+if __name__ == "__main__":
+    # python -m graph.daemon [SOCKET_PATH]; connect with python -m graph.client
+    sys.stdout = _TurnStdout(sys.stdout)
+    daemon = LexisDaemon(sys.argv[1] if len(sys.argv) > 1 else SOCKET_PATH)
+    try:
+        asyncio.run(daemon.serve())
+    except KeyboardInterrupt:
+        print("\nLexis daemon stopped.")
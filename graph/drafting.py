@@ -1,15 +1,26 @@
-from typing import Dict, Any
-from langchain_openai import ChatOpenAI
+from typing import Dict, Any, Optional
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from .state import ContractState
 import datetime
 from tools.template_store import TemplateStore
+from tools.prompt_budget import PromptBudgeter, condense_snippets, dedupe_texts
+from tools.draft_sections import parse_sections, select_sections, splice_sections, unwrap_draft, wrap_draft
+from tools.placeholder_tools import PlaceholderIndex, parse_fill_input
+from tools.fact_tools import format_facts, load_facts, merge_facts
+from tools.check_registry import CONSISTENCY_PROMPT, get_check_registry, is_pass
+from tools.llm_gateway import get_gateway
+from tools.portfolio_index import record_version
+from tools.speculation import get_speculator
+from tools.turn_budget import current_budget
 
 class DraftingSupervisor:
-    def __init__(self):
-        self.llm = ChatOpenAI(model="gpt-4o", temperature=0)
+    def __init__(self, prompt_budget: Optional[int] = None, max_correction_passes: int = 1):
+        self.gateway = get_gateway()
         self.template_store = TemplateStore()
+        self.prompt_budget = prompt_budget
+        self.max_correction_passes = max_correction_passes
+        self.check_registry = get_check_registry()
 
     def run(self, state: ContractState) -> ContractState:
         print("--- Drafting Subgraph Started ---")
@@ -34,19 +45,34 @@ class DraftingSupervisor:
         
         return state
 
+    def fill_placeholders(self, state: ContractState) -> ContractState:
+        """Fill-only turns ('[KEY]Value' input): substitute locally, no LLM calls."""
+        print("--- Drafting: Filling Placeholders ---")
+        self._placeholder_filler(state)
+        self._draft_audit(state)
+        return state
+
     def _template_retriever(self, state: ContractState):
         print("--- Drafting: Retrieving Templates ---")
         # Use the research plan or context to find templates
-        query = state.messages[0]["content"] if state.messages else "contract"
+        query = state.current_request() or "contract"
         results = self.template_store.search(query)
         state.extracted_facts["drafting_templates"] = results
-        state.messages.append({
+        state.log_node({
             "node": "template_retriever",
             "status": "done",
             "found": len(results)
         })
 
     def _contract_writer_agent(self, state: ContractState):
+        # Improve turns that only touch a few sections are redrafted incrementally
+        if state.task_category == "improve" and state.draft_content:
+            sections = parse_sections(unwrap_draft(state.draft_content))
+            targets = select_sections(sections, state.current_request())
+            if targets:
+                self._section_writer_agent(state, sections, targets)
+                return
+
         print("--- Drafting: Writing Contract ---")
         prompt = ChatPromptTemplate.from_template(
             "You are an expert legal drafter. Your task is to {task_type} a contract based on this brief: {brief}. "
@@ -67,54 +93,140 @@ class DraftingSupervisor:
             "Explain WHY they are important. "
             "Return the full contract text in Markdown format."
         )
-        chain = prompt | self.llm | StrOutputParser()
+        chain = prompt | self.gateway.chat("contract_writer") | StrOutputParser()
         
         task_type = state.task_category if state.task_category else "create"
         
-        # Find brief message
-        brief_msg = next((m for m in state.messages if m.get("node") == "synthesizer"), {})
+        # Latest brief for this turn
+        brief_msg = state.latest("synthesizer")
         
-        templates = "\n\n".join(state.extracted_facts.get("drafting_templates", []))
+        templates = "\n\n".join(dedupe_texts(state.extracted_facts.get("drafting_templates", [])))
+        
+        # Fit the prompt to the token budget, trimming web snippets and templates first
+        budgeter = PromptBudgeter(self.prompt_budget)
+        budgeter.add("brief", brief_msg.get("brief", "") + "\n\nEXTRACTED FACTS:\n" + format_facts(state.extracted_facts.get("key_info")), priority=100, required=True)
+        budgeter.add("current_draft", state.draft_content or "No existing draft.", priority=90, required=True)
+        budgeter.add("structure", state.contract_structure, priority=40, condense=condense_snippets)
+        budgeter.add("templates", templates, priority=30)
+        budgeter.add("market_terms", state.market_terms, priority=20, condense=condense_snippets)
+        parts = budgeter.fit(reserved=budgeter.prompt_overhead(prompt))
+        print(f"--- Drafting: Prompt budget {budgeter.summary()} ---")
         
         contract = chain.invoke({
             "task_type": task_type,
-            "brief": brief_msg.get("brief", "") + "\n\nEXTRACTED FACTS:\n" + state.extracted_facts.get("key_info", ""), 
-            "structure": state.contract_structure,
-            "market_terms": state.market_terms,
-            "templates": templates,
-            "current_draft": state.draft_content or "No existing draft."
+            "brief": parts["brief"],
+            "structure": parts["structure"],
+            "market_terms": parts["market_terms"],
+            "templates": parts["templates"],
+            "current_draft": parts["current_draft"]
         })
         state.draft_content = contract
         
-        state.messages.append({
+        state.log_node({
             "node": "contract_writer",
             "status": "done",
-            "content_preview": contract[:100] + "..."
+            "content_preview": contract[:100] + "...",
+            "prompt_budget": budgeter.report
         })
 
-    def _consistency_checker(self, state: ContractState):
-        print("--- Drafting: Checking Consistency ---")
+    def _section_writer_agent(self, state: ContractState, sections: list, targets: list):
+        print(f"--- Drafting: Redrafting {len(targets)} of {len(sections)} sections ---")
         prompt = ChatPromptTemplate.from_template(
-            "Check this contract for internal consistency, clarity, and placeholder usage: {contract}. "
-            "Ensure all necessary sections are present. "
-            "Return 'Pass' or a list of issues/missing information."
+            "You are an expert legal drafter editing one section of an existing contract. "
+            "User request: {request}\n"
+            "Extracted facts (JSON): {facts}\n"
+            "Contract outline: {outline}\n"
+            "SECTION TO REVISE:\n{section}\n\n"
+            "Apply the request to this section only. Fill placeholders like [CLIENT_NAME] when the facts provide the value; "
+            "keep them otherwise. Do not make up values. Keep the section heading and numbering unchanged. "
+            "Return only the revised section text in Markdown."
         )
-        chain = prompt | self.llm | StrOutputParser()
-        report = chain.invoke({"contract": state.draft_content})
+        chain = prompt | self.gateway.chat("section_writer") | StrOutputParser()
+        
+        outline = "; ".join(s["heading"] for s in sections if s["heading"])
+        request = state.current_request()
+        facts = format_facts(state.extracted_facts.get("key_info"))
+        
+        # Sections are independent, so revise them concurrently
+        revised = chain.batch([
+            {"request": request, "facts": facts, "outline": outline, "section": sections[i]["text"]}
+            for i in targets
+        ])
+        state.draft_content = splice_sections(sections, dict(zip(targets, revised)))
+        
+        state.log_node({
+            "node": "contract_writer",
+            "status": "done",
+            "mode": "incremental",
+            "sections": [sections[i]["heading"] or "preamble" for i in targets],
+            "content_preview": state.draft_content[:100] + "..."
+        })
+
+    def _placeholder_filler(self, state: ContractState):
+        values = parse_fill_input(state.current_request())
+        index = get_speculator().take(state, "placeholders") or PlaceholderIndex(state.draft_content or "")
+        state.draft_content, report = index.fill(values)
+        state.extracted_facts["key_info"] = merge_facts(load_facts(state.extracted_facts.get("key_info")), values)
+        
+        state.log_node({
+            "node": "placeholder_filler",
+            "status": "done",
+            "report": report
+        })
+
+    def _consistency_checker(self, state: ContractState):
+        print("--- Drafting: Checking Consistency ---")
+        chain = CONSISTENCY_PROMPT | self.gateway.chat("consistency_checker") | StrOutputParser()
+        
+        # Results are shared with the Validator through the check registry (keyed by draft hash)
+        corrections = 0
+        while True:
+            text = unwrap_draft(state.draft_content)
+            report, cached = self.check_registry.get_or_compute(
+                "consistency", text, lambda: chain.invoke({"contract": text})
+            )
+            if is_pass(report) or corrections >= self.max_correction_passes:
+                break
+            budget = current_budget()
+            if budget is not None and not budget.allows("self_correction"):
+                # Keep the issues in the report; the user can ask for an improve turn
+                budget.degrade("self_correction", "skipped")
+                break
+            self._self_correct(state, report)
+            corrections += 1
         
         state.validation_report["drafting_consistency"] = report
-        state.messages.append({
+        state.log_node({
             "node": "consistency_checker",
             "status": "done",
+            "cached": cached,
+            "corrections": corrections,
             "report": report
         })
 
+    def _self_correct(self, state: ContractState, issues: str):
+        print("--- Drafting: Self-Correcting Draft ---")
+        prompt = ChatPromptTemplate.from_template(
+            "You are an expert legal drafter. Revise this contract to resolve the reviewer's issues.\n"
+            "ISSUES:\n{issues}\n\nCONTRACT:\n{contract}\n\n"
+            "Change only what is needed to resolve the issues and keep everything else unchanged. "
+            "Do not make up values; keep placeholders for missing information. "
+            "Return the full contract text in Markdown format."
+        )
+        chain = prompt | self.gateway.chat("self_correction") | StrOutputParser()
+        state.draft_content = chain.invoke({"issues": issues, "contract": unwrap_draft(state.draft_content)})
+        state.log_node({
+            "node": "self_correction",
+            "status": "done",
+            "content_preview": state.draft_content[:100] + "..."
+        })
+
     def _draft_assembler(self, state: ContractState):
         print("--- Drafting: Assembling Draft ---")
         # In a real app, this would combine multiple clauses. Here we just use the single clause.
-        full_draft = f"DRAFT CONTRACT\n\n{state.draft_content}\n\n[End of Draft]"
+        full_draft = wrap_draft(state.draft_content)
         state.draft_content = full_draft
-        state.messages.append({
+        state.log_node({
             "node": "draft_assembler",
             "status": "done",
             "info": "Draft assembled"
@@ -123,7 +235,7 @@ class DraftingSupervisor:
     def _redline_generator(self, state: ContractState):
         print("--- Drafting: Generating Redlines ---")
         # Simple placeholder for diff
-        state.messages.append({
+        state.log_node({
             "node": "redline_generator",
             "status": "done",
             "info": "No previous version to diff against"
@@ -131,12 +243,14 @@ class DraftingSupervisor:
 
     def _draft_audit(self, state: ContractState):
         print("--- Drafting: Auditing ---")
-        state.versions.append({
+        version = {
             "version_number": len(state.versions) + 1,
             "content": state.draft_content,
             "type": "draft"
-        })
-        state.messages.append({
+        }
+        state.versions.append(version)
+        record_version(state, version)
+        state.log_node({
             "node": "draft_audit",
             "status": "done",
             "info": "Draft version saved"
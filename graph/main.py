@@ -1,9 +1,11 @@
 import os
+import re
 import json
 import sys
-from typing import Optional
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import List, Optional
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from .state import ContractState
@@ -13,22 +15,34 @@ from .validator import Validator
 from .research import ResearchSupervisor
 from .drafting import DraftingSupervisor
 from tools.memory_store import MemoryStore
+from tools.llm_gateway import get_gateway
+from tools.placeholder_tools import PlaceholderIndex, is_fill_only, parse_fill_input
+from tools.content_cache import atomic_write
+from tools.turn_budget import TurnBudget, TurnCancelled, active_budget, current_budget
+from tools.speculation import get_speculator
+from tools.doc_tools import prerender
 
 # Load environment variables
 load_dotenv()
 
 class Router:
     def __init__(self):
-        self.llm = ChatOpenAI(model="gpt-4o", temperature=0)
+        self.llm = get_gateway().chat("router")
+
+    def route(self, text: str, state: Optional[ContractState] = None) -> str:
+        # '[KEY]Value' input for placeholders in the current draft is filled locally
+        if state is not None and state.draft_content and is_fill_only(text):
+            index = get_speculator().take(state, "placeholders") or PlaceholderIndex(state.draft_content)
+            if index.covers(parse_fill_input(text)):
+                return "fill"
 
-    def route(self, text: str) -> str:
         prompt = ChatPromptTemplate.from_template(
             "Classify the user intent into one of these categories: "
             "['create', 'improve', 'review', 'admin', 'chat'].\n"
             "create: User wants to draft/create a new contract. Keywords: 'draft', 'create', 'write', 'make a contract'.\n"
             "improve: User wants to edit, modify, or improve an existing contract. INCLUDES providing details to fill placeholders (e.g. '[DATE]...', 'Here are the details').\n"
             "review: User wants a contract reviewed, analyzed, or completed. Keywords: 'review', 'check', 'fix loopholes', 'complete this'.\n"
-            "admin: User wants to manage deadlines, signatures, or export files. Keywords: 'export', 'save as', 'generate pdf', 'generate txt', 'ics', 'calendar'.\n"
+            "admin: User wants to manage deadlines, signatures, invoices, or export files. Keywords: 'export', 'save as', 'generate pdf', 'generate txt', 'ics', 'calendar', 'invoice', 'payment schedule'.\n"
             "chat: User is greeting, asking general questions, or not requesting a specific legal task.\n\n"
             "CRITICAL: If the user provides a block of text with contract details or values for placeholders, classify as 'improve' or 'review'.\n"
             "CRITICAL: If the user asks to export/generate a file (pdf, txt, ics), classify as 'admin'.\n"
@@ -45,15 +59,15 @@ class Router:
 
 class GeneralAssistant:
     def __init__(self, memory_store: MemoryStore):
-        self.llm = ChatOpenAI(model="gpt-4o", temperature=0.7)
+        self.llm = get_gateway().chat("general_assistant", temperature=0.7)
         self.memory_store = memory_store
 
-    def run(self, state: ContractState) -> ContractState:
+    def run(self, state: ContractState, user_embedding: Optional[List[float]] = None) -> ContractState:
         print("--- General Assistant ---")
         
-        # Retrieve context from memory
-        user_input = state.messages[-1]["content"]
-        context = self.memory_store.get_context(user_input, session_id=state.session_id)
+        # Retrieve context from memory (reusing the user message's embedding when it was computed up front)
+        user_input = state.current_request()
+        context = self.memory_store.get_context(user_input, session_id=state.session_id, query_embedding=user_embedding)
         context_str = "\n".join(context)
         
         prompt = ChatPromptTemplate.from_template(
@@ -66,7 +80,7 @@ class GeneralAssistant:
         response = chain.invoke({"input": user_input, "context": context_str})
         
         print(f"Lexis: {response}")
-        state.messages.append({"role": "assistant", "content": response})
+        state.log_node({"node": "general_assistant", "role": "assistant", "content": response})
         
         # Save assistant response to memory
         self.memory_store.add_message("assistant", response, session_id=state.session_id)
@@ -82,19 +96,50 @@ class Orchestrator:
         self.drafting_supervisor = DraftingSupervisor()
         self.memory_store = MemoryStore()
         self.general_assistant = GeneralAssistant(self.memory_store)
+        # Likely follow-ups to a fresh draft (admin export, fill-in), precomputed when LEXIS_SPECULATE=1
+        self.speculator = get_speculator()
+        self.speculator.register("placeholders", PlaceholderIndex)
+        self.speculator.register("deadlines", self.admin_supervisor.extract_deadlines)
+        self.speculator.register("pdf", lambda draft: prerender(draft, "pdf"))
+        self.speculator.register("docx", lambda draft: prerender(draft, "docx"))
+
+    def embed_request(self, user_input: str) -> Optional[List[float]]:
+        """Embed the user message once; memory search and storage both reuse the vector."""
+        try:
+            return self.memory_store.embed(user_input)
+        except Exception as e:
+            print(f"⚠️ Could not embed message ({e}); memory will embed it later")
+            return None
 
-    def run(self, state: ContractState):
+    def run(self, state: ContractState, user_embedding: Optional[List[float]] = None):
+        try:
+            return self._run(state, user_embedding)
+        except TurnCancelled as e:
+            # Nothing from a cancelled turn is checkpointed; the session keeps its last saved state
+            print(f"\n⏹️ Turn cancelled ({e}). Back to the prompt.")
+            return state
+
+    def _run(self, state: ContractState, user_embedding: Optional[List[float]] = None):
         print(f"--- Orchestrator: Routing to {state.task_category} ---")
         
         # Save user input to memory (if it's a new message)
         if state.messages and state.messages[-1].get("role") == "user":
-             self.memory_store.add_message("user", state.messages[-1]["content"], session_id=state.session_id)
+             self.memory_store.add_message("user", state.current_request(), session_id=state.session_id,
+                                           embedding=user_embedding)
 
         # Route to subgraph
         if state.task_category == "chat":
-            state = self.general_assistant.run(state)
+            state = self.general_assistant.run(state, user_embedding)
             return state # Skip validation for chat
             
+        elif state.task_category == "fill":
+            state = self.drafting_supervisor.fill_placeholders(state)
+            state = self.validator.run_local(state)
+            checkpoint_state(state)
+            self.speculator.schedule(state)
+            self.print_fill_summary(state)
+            return state
+            
         elif state.task_category == "admin":
             state = self.admin_supervisor.run(state)
         elif state.task_category in ["create", "improve", "review"]:
@@ -116,6 +161,8 @@ class Orchestrator:
         
         # Checkpoint
         checkpoint_state(state)
+        if state.task_category in ["create", "improve", "review"]:
+            self.speculator.schedule(state)
         
         # Summary
         self.print_summary(state)
@@ -142,12 +189,43 @@ class Orchestrator:
         
         print("\n🤖 Lexis Analysis:")
         self.generate_helpful_feedback(state)
+        self.print_budget_report()
         
         print("="*30 + "\n")
 
+    def print_budget_report(self):
+        budget = current_budget()
+        if budget is None:
+            return
+        print(f"\n⏱️ Turn time: {budget.elapsed():.1f}s of {budget.seconds:.0f}s budget")
+        for stage, how in budget.degraded.items():
+            print(f"   ⚠️ {stage.replace('_', ' ').title()}: {how}")
+
+    def print_fill_summary(self, state: ContractState):
+        report = state.latest("placeholder_filler").get("report", {})
+        print("\n" + "="*30)
+        print("       📝 MISSION REPORT       ")
+        print("="*30)
+        print("📌 Task Type: FILL")
+        for key, count in report.get("filled", {}).items():
+            print(f"   ✅ {key}: filled ({count}x)")
+        unfilled = report.get("unfilled", [])
+        if unfilled:
+            print(f"\n⚠️ Still missing: {', '.join('[' + key + ']' for key in unfilled)}")
+            print("Send them as [KEY]Value to finish the contract.")
+        else:
+            print("\n✅ All placeholders are filled.")
+        print("="*30 + "\n")
+
     def generate_helpful_feedback(self, state: ContractState):
+        budget = current_budget()
+        if budget is not None and not budget.allows("feedback"):
+            budget.degrade("feedback", "skipped")
+            print("Skipped to stay within the turn budget; see the validation results above.")
+            return
+
         # Use LLM to analyze the report and guide the user
-        llm = ChatOpenAI(model="gpt-4o", temperature=0.7)
+        llm = get_gateway().chat("feedback", temperature=0.7)
         prompt = ChatPromptTemplate.from_template(
             "You are Lexis, the AI legal assistant. Analyze this contract task execution.\n"
             "Task: {task}\n"
@@ -174,27 +252,80 @@ class Orchestrator:
         except Exception as e:
             print(f"Could not generate feedback: {e}")
 
-def checkpoint_state(state: ContractState):
+SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+_archive_lock = threading.Lock()
+
+def checkpoint_path(session_id: str = "default") -> str:
+    # The default session keeps the original data/state.json; others get data/sessions/<id>.json
     data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
-    os.makedirs(data_dir, exist_ok=True)
-    filepath = os.path.join(data_dir, "state.json")
-    with open(filepath, "w") as f:
-        json.dump(state.model_dump(), f, indent=2)
+    if session_id == "default":
+        return os.path.join(data_dir, "state.json")
+    if not SESSION_ID_RE.match(session_id):
+        raise ValueError(f"Invalid session id: {session_id!r}")
+    return os.path.join(data_dir, "sessions", f"{session_id}.json")
+
+def checkpoint_state(state: ContractState):
+    filepath = checkpoint_path(state.session_id)
+    # Atomic so a concurrent reader never sees a half-written checkpoint
+    atomic_write(filepath, json.dumps(state.model_dump(), indent=2))
     # print(f"State saved to {filepath}") # Reduce noise
 
-def load_checkpoint() -> ContractState:
+def archive_messages(session_id: str, messages: list):
+    # Messages windowed out of the checkpoint are kept in an append-only log
+    if not messages:
+        return
     data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
-    filepath = os.path.join(data_dir, "state.json")
+    os.makedirs(data_dir, exist_ok=True)
+    filepath = os.path.join(data_dir, "message_archive.jsonl")
+    with _archive_lock, open(filepath, "a", encoding="utf-8") as f:
+        for message in messages:
+            f.write(json.dumps({"session_id": session_id, **message}) + "\n")
+
+def load_checkpoint(session_id: str = "default") -> ContractState:
+    filepath = checkpoint_path(session_id)
     if os.path.exists(filepath):
         try:
             with open(filepath, "r") as f:
                 data = json.load(f)
-            return ContractState(**data)
+            state = ContractState(**data)
         except Exception as e:
             # print(f"Error loading checkpoint: {e}")
-            return ContractState()
+            state = ContractState()
     else:
-        return ContractState()
+        state = ContractState()
+    state.session_id = session_id # Ensure state has current session ID
+    return state
+
+def run_turn(router: Router, orchestrator: Orchestrator, session_id: str, user_input: str,
+             embedder: Optional[ThreadPoolExecutor] = None, budget: Optional[TurnBudget] = None) -> ContractState:
+    """One turn for a session: load its checkpoint, route, and run the orchestrator under a turn budget."""
+    with active_budget(budget or TurnBudget()):
+        state = load_checkpoint(session_id)
+
+        # Embed the message while the router classifies it; '[KEY]Value' fills are local and never wait for it
+        embedding_future = None
+        if embedder and not is_fill_only(user_input):
+            embedding_future = embedder.submit(orchestrator.embed_request, user_input)
+
+        # Router
+        category = router.route(user_input, state)
+        state.task_category = category
+        archive_messages(state.session_id, state.begin_turn(user_input))
+
+        # Orchestrator; turns without a vector queue the message and the memory flush embeds it
+        user_embedding = None
+        if embedding_future is not None and category != "fill":
+            user_embedding = await_embedding(embedding_future)
+        return orchestrator.run(state, user_embedding)
+
+def await_embedding(future: Future) -> Optional[List[float]]:
+    """Wait for the message embedding within the turn budget (cancellation still applies)."""
+    budget = current_budget()
+    while True:
+        try:
+            return future.result(timeout=min(0.25, max(budget.remaining(), 0.01)) if budget else None)
+        except FutureTimeout:
+            budget.check()
 
 if __name__ == "__main__":
     # CLI Interface
@@ -202,6 +333,9 @@ if __name__ == "__main__":
     print("Type 'exit' to quit.\n")
     
     current_session_id = "default"
+    router = Router()
+    orchestrator = Orchestrator()
+    embedder = ThreadPoolExecutor(max_workers=1)
     
     while True:
         try:
@@ -228,22 +362,18 @@ if __name__ == "__main__":
                 print(f"Current Session ID: {current_session_id}")
                 continue
             
-            # Load or create state (fresh state for chat, load for tasks if needed - simplified to load always)
-            state = load_checkpoint()
-            state.session_id = current_session_id # Ensure state has current session ID
-            
-            # Router
-            router = Router()
-            category = router.route(user_input)
-            state.task_category = category
-            state.messages.append({"role": "user", "content": user_input})
-            
-            # Orchestrator
-            orchestrator = Orchestrator()
-            orchestrator.run(state)
+            # Each session has its own checkpoint (the default session uses data/state.json)
+            try:
+                run_turn(router, orchestrator, current_session_id, user_input, embedder)
+            except (KeyboardInterrupt, TurnCancelled):
+                # Ctrl-C cancels the turn (in-flight LLM calls are abandoned), not the CLI
+                print("\n⏹️ Turn cancelled. Back to the prompt.")
             
         except (KeyboardInterrupt, EOFError):
             print("\nLexis: Goodbye!")
             break
         except Exception as e:
             print(f"An error occurred: {e}")
+
+    if orchestrator.speculator.enabled:
+        print(f"Speculation: {orchestrator.speculator.report()}")
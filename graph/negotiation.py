@@ -1,13 +1,14 @@
 from typing import Dict, Any
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from .state import ContractState
+from tools.llm_gateway import get_gateway
+from tools.portfolio_index import record_version
 import datetime
 
 class NegotiationSupervisor:
     def __init__(self):
-        self.llm = ChatOpenAI(model="gpt-4o", temperature=0)
+        self.gateway = get_gateway()
 
     def run(self, state: ContractState) -> ContractState:
         print("--- Negotiation Subgraph Started ---")
@@ -33,9 +34,9 @@ class NegotiationSupervisor:
         print("--- Negotiation: Extracting Changes ---")
         # In a real scenario, compare state.draft_content with previous version
         # Here we just assume the user input contains the requested changes
-        changes = state.messages[0]["content"] if state.messages else "No changes requested"
+        changes = state.current_request() or "No changes requested"
         
-        state.messages.append({
+        state.log_node({
             "node": "change_extractor",
             "status": "done",
             "changes_detected": changes
@@ -47,12 +48,12 @@ class NegotiationSupervisor:
             "Analyze the legal and business impact of these requested changes: {changes}. "
             "Return a brief summary of risks."
         )
-        chain = prompt | self.llm | StrOutputParser()
+        chain = prompt | self.gateway.chat("impact_analyzer") | StrOutputParser()
         
-        changes = state.messages[-1]["changes_detected"]
+        changes = state.latest("change_extractor")["changes_detected"]
         impact = chain.invoke({"changes": changes})
         
-        state.messages.append({
+        state.log_node({
             "node": "impact_analyzer",
             "status": "done",
             "impact_analysis": impact
@@ -64,15 +65,15 @@ class NegotiationSupervisor:
             "Generate a counterproposal for these changes: {changes}, considering this impact: {impact}. "
             "Return the suggested clause text."
         )
-        chain = prompt | self.llm | StrOutputParser()
+        chain = prompt | self.gateway.chat("counterproposal_generator") | StrOutputParser()
         
-        changes = state.messages[-2]["changes_detected"]
-        impact = state.messages[-1]["impact_analysis"]
+        changes = state.latest("change_extractor")["changes_detected"]
+        impact = state.latest("impact_analyzer")["impact_analysis"]
         
         counterproposal = chain.invoke({"changes": changes, "impact": impact})
         state.draft_content = counterproposal # Update draft with counterproposal
         
-        state.messages.append({
+        state.log_node({
             "node": "counterproposal_generator",
             "status": "done",
             "counterproposal": counterproposal
@@ -80,13 +81,15 @@ class NegotiationSupervisor:
 
     def _versioning_node(self, state: ContractState):
         print("--- Negotiation: Versioning ---")
-        state.versions.append({
+        version = {
             "version_number": len(state.versions) + 1,
             "content": state.draft_content,
             "timestamp": datetime.datetime.now().isoformat(),
             "type": "negotiation"
-        })
-        state.messages.append({
+        }
+        state.versions.append(version)
+        record_version(state, version)
+        state.log_node({
             "node": "versioning_node",
             "status": "done",
             "info": "New version saved"
@@ -96,7 +99,7 @@ class NegotiationSupervisor:
         print("--- Negotiation: Checking Policy ---")
         # Simple check
         state.validation_report["policy_gate"] = "pass"
-        state.messages.append({
+        state.log_node({
             "node": "policy_gate",
             "status": "done",
             "info": "Policy check passed"
@@ -1,19 +1,25 @@
-from typing import Dict, Any
-from langchain_openai import ChatOpenAI
+from typing import Dict, Any, Optional
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from .state import ContractState
-from .state import ContractState
+from .state import ContractState, ContractFacts
 from tools.template_store import TemplateStore
+from tools.prompt_budget import PromptBudgeter, condense_snippets
+from tools.llm_gateway import get_gateway
+from tools.fact_tools import extract_local_facts, format_facts, load_facts, merge_facts, needs_llm
+from tools.content_cache import ContentCache, content_hash
+from tools.turn_budget import current_budget
 try:
     from langchain_tavily import TavilySearchResults
 except ImportError:
     from langchain_community.tools.tavily_search import TavilySearchResults
 
 class ResearchSupervisor:
-    def __init__(self):
-        self.llm = ChatOpenAI(model="gpt-4o", temperature=0)
+    def __init__(self, prompt_budget: Optional[int] = None):
+        self.gateway = get_gateway()
         self.template_store = TemplateStore()
+        self.prompt_budget = prompt_budget
+        # Last web search result per query, used when the turn budget is too tight to search again
+        self.research_cache = ContentCache("research")
 
     def run(self, state: ContractState) -> ContractState:
         print("--- Research Subgraph Started ---")
@@ -47,10 +53,10 @@ class ResearchSupervisor:
             "You are a legal research assistant. Create a brief research plan for a contract request: {request}. "
             "Focus on identifying necessary clauses and potential risks."
         )
-        chain = prompt | self.llm | StrOutputParser()
-        plan = chain.invoke({"request": state.messages[0]["content"] if state.messages else "No request"})
+        chain = prompt | self.gateway.chat("research_plan") | StrOutputParser()
+        plan = chain.invoke({"request": state.current_request() or "No request"})
         
-        state.messages.append({
+        state.log_node({
             "node": "research_plan",
             "status": "done",
             "content": plan
@@ -59,31 +65,48 @@ class ResearchSupervisor:
     def _search_node(self, state: ContractState):
         print("--- Research: Searching Templates ---")
         # Simple keyword extraction for search (could be LLM based)
-        query = state.messages[0]["content"] if state.messages else ""
+        query = state.current_request()
         results = self.template_store.search(query)
         
         state.extracted_facts["relevant_clauses"] = results
-        state.messages.append({
+        state.log_node({
             "node": "template_search",
             "status": "done",
             "found_clauses": len(results)
         })
 
+    def _web_search(self, stage: str, query: str, max_results: int) -> Optional[str]:
+        """Tavily search for an optional stage; cached or skipped (None) when the turn budget is tight."""
+        key = content_hash(query)
+        budget = current_budget()
+        if budget is not None and not budget.allows(stage):
+            cached = self.research_cache.get(key)
+            budget.degrade(stage, "served from cache" if cached is not None else "skipped")
+            return cached
+
+        tool = TavilySearchResults(max_results=max_results)
+        results = tool.invoke({"query": query})
+        
+        info = []
+        for res in results:
+            content = res.get('content', res.get('body', str(res)))
+            info.append(f"- {content}")
+        text = "\n".join(info)
+        self.research_cache.set(key, text)
+        return text
+
     def _structure_research_node(self, state: ContractState):
         print("--- Research: Structure Research (Tavily) ---")
         try:
-            tool = TavilySearchResults(max_results=2)
-            request = state.messages[0]["content"] if state.messages else ""
+            request = state.current_request()
             query = f"standard contract structure outline for {request}"
-            results = tool.invoke({"query": query})
+            structure_info = self._web_search("structure_research", query, max_results=2)
+            if structure_info is None:
+                state.log_node({"node": "structure_research", "status": "skipped", "info": "Turn budget"})
+                return
             
-            structure_info = []
-            for res in results:
-                content = res.get('content', res.get('body', str(res)))
-                structure_info.append(f"- {content}")
-            
-            state.contract_structure = "\n".join(structure_info)
-            state.messages.append({
+            state.contract_structure = structure_info
+            state.log_node({
                 "node": "structure_research",
                 "status": "done",
                 "info": "Found contract structure"
@@ -95,22 +118,17 @@ class ResearchSupervisor:
     def _market_research_node(self, state: ContractState):
         print("--- Research: Market Pricing (Tavily) ---")
         try:
-            tool = TavilySearchResults(max_results=3)
             # Construct a query for pricing
-            request = state.messages[0]["content"] if state.messages else ""
-            request = state.messages[0]["content"] if state.messages else ""
+            request = state.current_request()
             query = f"standard terms and market price rate for {request} freelance contract"
-            results = tool.invoke({"query": query})
-            
-            # Extract relevant info (simplified)
-            pricing_info = []
-            for res in results:
-                content = res.get('content', res.get('body', str(res)))
-                pricing_info.append(f"- {content}")
+            pricing_info = self._web_search("market_research", query, max_results=3)
+            if pricing_info is None:
+                state.log_node({"node": "market_research", "status": "skipped", "info": "Turn budget"})
+                return
             
-            state.market_terms = "\n".join(pricing_info)
+            state.market_terms = pricing_info
             state.extracted_facts["market_pricing"] = state.market_terms # Keep for backward compatibility
-            state.messages.append({
+            state.log_node({
                 "node": "market_research",
                 "status": "done",
                 "info": "Found market pricing data"
@@ -121,23 +139,39 @@ class ResearchSupervisor:
 
     def _extractor_node(self, state: ContractState):
         print("--- Research: Extracting Facts ---")
-        prompt = ChatPromptTemplate.from_template(
-            "Extract all key facts and specific details from this request: {request}. "
-            "The user might provide data in a format like '[KEY]Value' or just natural language. "
-            "Return a valid JSON object where keys are the placeholder names (e.g., 'CLIENT_NAME', 'DATE') and values are the extracted content. "
-            "Example Input: '[DATE]2024-01-01 [NAME]John Doe' -> Output: {{'DATE': '2024-01-01', 'NAME': 'John Doe'}}"
-        )
-        chain = prompt | self.llm | StrOutputParser()
-        facts_json = chain.invoke({"request": state.messages[0]["content"] if state.messages else ""})
+        request = state.current_request()
+        known = load_facts(state.extracted_facts.get("key_info"))
+        sources = state.extracted_facts.get("fact_sources", {})
         
-        # Clean up json
-        facts_json = facts_json.replace("```json", "").replace("```", "").strip()
+        # Stage 1: local parser ([KEY]Value, dates, amounts, currency, emails)
+        new_facts, residual = extract_local_facts(request)
+        sources.update({key: "local" for key in new_facts})
         
-        state.extracted_facts["key_info"] = facts_json
-        state.messages.append({
+        # Stage 2: structured LLM extraction, only for free-form text
+        if needs_llm(residual):
+            prompt = ChatPromptTemplate.from_template(
+                "Extract the key contract facts from this request: {request}\n"
+                "Already known facts (JSON): {known}\n"
+                "Only return facts that are new or changed by this request. "
+                "Use 'other' for any additional placeholder values (e.g. CLIENT_ADDRESS). Do not make up values."
+            )
+            chain = prompt | self.gateway.chat("fact_extractor").with_structured_output(ContractFacts)
+            try:
+                llm_facts = chain.invoke({"request": request, "known": format_facts(merge_facts(known, new_facts))}).to_facts()
+                # Values parsed locally are exact, so they win over the model's reading
+                llm_facts = {k: v for k, v in llm_facts.items() if k not in new_facts}
+                sources.update({key: "llm" for key in llm_facts})
+                new_facts = merge_facts(new_facts, llm_facts)
+            except Exception as e:
+                print(f"Structured fact extraction failed: {e}")
+        
+        state.extracted_facts["key_info"] = merge_facts(known, new_facts)
+        state.extracted_facts["fact_sources"] = sources
+        state.log_node({
             "node": "fact_extractor",
             "status": "done",
-            "info": "Extracted key facts"
+            "info": f"Extracted {len(new_facts)} new facts",
+            "new_facts": sorted(new_facts)
         })
 
     def _synthesizer_node(self, state: ContractState):
@@ -149,27 +183,36 @@ class ResearchSupervisor:
             "Identify any missing information that needs placeholders. "
             "If improving/reviewing, highlight areas that need change."
         )
-        chain = prompt | self.llm | StrOutputParser()
-        # Find plan message
-        plan_msg = next((m for m in state.messages if m.get("node") == "research_plan"), {})
+        chain = prompt | self.gateway.chat("synthesizer") | StrOutputParser()
+        # Latest plan for this turn
+        plan_msg = state.latest("research_plan")
+        
+        budgeter = PromptBudgeter(self.prompt_budget)
+        budgeter.add("facts", format_facts(state.extracted_facts.get("key_info")), priority=100, required=True)
+        budgeter.add("plan", plan_msg.get("content", ""), priority=80)
+        budgeter.add("structure", state.contract_structure, priority=40, condense=condense_snippets)
+        budgeter.add("market_terms", state.market_terms, priority=20, condense=condense_snippets)
+        parts = budgeter.fit(reserved=budgeter.prompt_overhead(prompt))
+        print(f"--- Research: Prompt budget {budgeter.summary()} ---")
         
         brief = chain.invoke({
-            "plan": plan_msg.get("content", ""), 
-            "structure": state.contract_structure,
-            "market_terms": state.market_terms,
-            "facts": state.extracted_facts.get("key_info", "")
+            "plan": parts["plan"], 
+            "structure": parts["structure"],
+            "market_terms": parts["market_terms"],
+            "facts": parts["facts"]
         })
         
-        state.messages.append({
+        state.log_node({
             "node": "synthesizer",
             "status": "done",
-            "brief": brief
+            "brief": brief,
+            "prompt_budget": budgeter.report
         })
 
     def _audit_node(self, state: ContractState):
         print("--- Research: Auditing ---")
         # In a real system, save to a persistent log
-        state.messages.append({
+        state.log_node({
             "node": "research_audit",
             "status": "done",
             "info": "Research step logged"
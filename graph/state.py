@@ -1,9 +1,41 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Any, Dict, List, Optional
 
+# Conversation log window: older entries are archived out of the checkpoint
+MAX_MESSAGES = 200
+
+class PlaceholderFact(BaseModel):
+    key: str = Field(description="Placeholder name in UPPER_SNAKE_CASE, e.g. CLIENT_ADDRESS")
+    value: str
+
+class ContractFacts(BaseModel):
+    """Structured output schema for the research fact extractor."""
+    client_name: Optional[str] = None
+    provider_name: Optional[str] = None
+    services_description: Optional[str] = None
+    start_date: Optional[str] = Field(None, description="YYYY-MM-DD")
+    end_date: Optional[str] = Field(None, description="YYYY-MM-DD")
+    total_amount: Optional[float] = None
+    hourly_rate: Optional[float] = None
+    currency: Optional[str] = Field(None, description="ISO 4217 code, e.g. USD")
+    payment_terms_days: Optional[int] = None
+    late_fee_percent: Optional[float] = None
+    governing_law: Optional[str] = None
+    other: List[PlaceholderFact] = []
+
+    def to_facts(self) -> Dict[str, Any]:
+        """Flatten to the placeholder-keyed dict stored in extracted_facts['key_info']."""
+        facts = {key.upper(): value for key, value in self.model_dump(exclude={"other"}).items() if value is not None}
+        for item in self.other:
+            facts[item.key.strip().upper().replace(" ", "_")] = item.value
+        return facts
+
 class ContractState(BaseModel):
     session_id: str = "default"
+    turn: int = 0
     messages: List[Dict[str, Any]] = []
+    node_outputs: Dict[str, Dict[str, Any]] = {}  # latest output per node, O(1) lookup
+    archived_messages: int = 0
     task_category: Optional[str] = None   # "create", "improve", "review", "admin"
     extracted_facts: Dict[str, Any] = {}
     draft_content: Optional[str] = None
@@ -14,3 +46,39 @@ class ContractState(BaseModel):
     payment_schedule: Optional[Dict[str, Any]] = None
     contract_structure: Optional[str] = None
     market_terms: Optional[str] = None
+
+    def begin_turn(self, user_input: str, max_messages: int = MAX_MESSAGES) -> List[Dict[str, Any]]:
+        """Record a new user message and window the log. Returns the archived entries."""
+        self.turn += 1
+        message = {"role": "user", "content": user_input, "turn": self.turn}
+        self.messages.append(message)
+        self.node_outputs["user"] = message
+        return self.window_messages(max_messages)
+
+    def log_node(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Append a node record to the log and index it as that node's latest output."""
+        entry = {**entry, "turn": self.turn}
+        self.messages.append(entry)
+        self.node_outputs[entry["node"]] = entry
+        return entry
+
+    def latest(self, node: str) -> Dict[str, Any]:
+        """Latest output recorded by a node (empty dict if it never ran)."""
+        return self.node_outputs.get(node, {})
+
+    def current_request(self) -> str:
+        """Content of the most recent user message."""
+        if "user" in self.node_outputs:
+            return self.node_outputs["user"].get("content", "")
+        # Checkpoints written before node_outputs existed
+        return next((m.get("content", "") for m in reversed(self.messages) if m.get("role") == "user"), "")
+
+    def window_messages(self, max_messages: int = MAX_MESSAGES) -> List[Dict[str, Any]]:
+        """Drop the oldest log entries beyond the window and return them for archiving."""
+        overflow = len(self.messages) - max_messages
+        if overflow <= 0:
+            return []
+        archived = self.messages[:overflow]
+        self.messages = self.messages[overflow:]
+        self.archived_messages += overflow
+        return archived
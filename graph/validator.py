@@ -1,14 +1,19 @@
 from typing import Dict, Any
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from .state import ContractState
 from presidio_analyzer import AnalyzerEngine
+from tools.contract_rules import UNCERTAIN, check_ip_ownership, check_payment_terms, readability_metrics
+from tools.placeholder_tools import PlaceholderIndex
+from tools.check_registry import CONSISTENCY_PROMPT, get_check_registry, is_pass
+from tools.draft_sections import unwrap_draft
+from tools.llm_gateway import get_gateway
 
 class Validator:
     def __init__(self):
-        self.llm = ChatOpenAI(model="gpt-4o", temperature=0)
+        self.gateway = get_gateway()
         self.analyzer = AnalyzerEngine()
+        self.check_registry = get_check_registry()
 
     def run(self, state: ContractState) -> ContractState:
         print("--- Validator Started ---")
@@ -31,11 +36,23 @@ class Validator:
         # 6. Consistency Check
         self._consistency_check(state)
         
+        # 7. Placeholder Check (local)
+        self._placeholder_check(state)
+        
         # Append completion message
-        state.messages.append({"node": "validator", "status": "done", "info": "Validator run completed"})
+        state.log_node({"node": "validator", "status": "done", "info": "Validator run completed"})
         
         return state
 
+    def run_local(self, state: ContractState) -> ContractState:
+        """Checks that need no LLM call, for turns that only substitute values."""
+        print("--- Validator Started (local checks) ---")
+        self._pii_scan(state)
+        self._readability_score(state)
+        self._placeholder_check(state)
+        state.log_node({"node": "validator", "status": "done", "info": "Local validator checks completed"})
+        return state
+
     def _pii_scan(self, state: ContractState):
         print("--- Validator: Scanning for PII ---")
         text = state.draft_content or ""
@@ -51,7 +68,7 @@ class Validator:
             "Review this contract text for enforceability risks: {text}. "
             "Return 'Pass' or a list of risks."
         )
-        chain = prompt | self.llm | StrOutputParser()
+        chain = prompt | self.gateway.chat("enforceability_scan") | StrOutputParser()
         result = chain.invoke({"text": (state.draft_content or "")[:5000]})
         
         state.validation_report["enforceability"] = "pass" if "Pass" in result else "warning"
@@ -59,47 +76,71 @@ class Validator:
 
     def _payment_check(self, state: ContractState):
         print("--- Validator: Checking Payment Terms ---")
-        prompt = ChatPromptTemplate.from_template(
-            "Check if this contract contains clear payment terms (amount, schedule, currency): {text}. "
-            "Return 'Pass' or 'Fail' with reason."
-        )
-        chain = prompt | self.llm | StrOutputParser()
-        result = chain.invoke({"text": (state.draft_content or "")[:5000]})
+        # Local rules answer most cases; the LLM only sees the uncertain ones
+        verdict, reason = check_payment_terms(state.draft_content or "")
+        if verdict == UNCERTAIN:
+            prompt = ChatPromptTemplate.from_template(
+                "Check if this contract contains clear payment terms (amount, schedule, currency): {text}. "
+                "Return 'Pass' or 'Fail' with reason."
+            )
+            chain = prompt | self.gateway.chat("payment_check") | StrOutputParser()
+            result = chain.invoke({"text": (state.draft_content or "")[:5000]})
+            verdict = "pass" if "Pass" in result else "fail"
+        else:
+            result = f"{verdict.title()} (local rules): {reason}"
         
-        state.validation_report["payment_check"] = "pass" if "Pass" in result else "fail"
+        state.validation_report["payment_check"] = verdict
         state.validation_report["payment_details"] = result
 
     def _ip_ownership_check(self, state: ContractState):
         print("--- Validator: Checking IP Ownership ---")
-        prompt = ChatPromptTemplate.from_template(
-            "Check if this contract clearly defines Intellectual Property ownership: {text}. "
-            "Return 'Pass' or 'Fail' with reason."
-        )
-        chain = prompt | self.llm | StrOutputParser()
-        result = chain.invoke({"text": (state.draft_content or "")[:5000]})
+        verdict, reason = check_ip_ownership(state.draft_content or "")
+        if verdict == UNCERTAIN:
+            prompt = ChatPromptTemplate.from_template(
+                "Check if this contract clearly defines Intellectual Property ownership: {text}. "
+                "Return 'Pass' or 'Fail' with reason."
+            )
+            chain = prompt | self.gateway.chat("ip_ownership_check") | StrOutputParser()
+            result = chain.invoke({"text": (state.draft_content or "")[:5000]})
+            verdict = "pass" if "Pass" in result else "fail"
+        else:
+            result = f"{verdict.title()} (local rules): {reason}"
         
-        state.validation_report["ip_ownership"] = "pass" if "Pass" in result else "fail"
+        state.validation_report["ip_ownership"] = verdict
         state.validation_report["ip_details"] = result
 
     def _readability_score(self, state: ContractState):
         print("--- Validator: Scoring Readability ---")
-        text = state.draft_content or ""
-        words = text.split()
-        avg_len = sum(len(w) for w in words) / len(words) if words else 0
+        metrics = readability_metrics(state.draft_content or "")
         
-        state.validation_report["readability_score"] = round(avg_len, 2)
-        state.validation_report["readability_details"] = f"Average word length: {round(avg_len, 2)}"
+        # Flesch Reading Ease: higher is easier (60-70 is plain English, contracts usually land at 30-50)
+        state.validation_report["readability_score"] = metrics["flesch_reading_ease"]
+        state.validation_report["readability_details"] = (
+            f"Flesch reading ease {metrics['flesch_reading_ease']}, grade level {metrics['flesch_kincaid_grade']}, "
+            f"avg sentence length {metrics['avg_sentence_length']} words, avg word length {metrics['avg_word_length']}"
+        )
+
+    def _placeholder_check(self, state: ContractState):
+        print("--- Validator: Checking Placeholders ---")
+        unfilled = PlaceholderIndex(state.draft_content or "").keys
+        state.validation_report["placeholders"] = "warning" if unfilled else "pass"
+        state.validation_report["placeholders_details"] = (
+            f"Unfilled: {', '.join(unfilled)}" if unfilled else "All placeholders filled"
+        )
 
     def _consistency_check(self, state: ContractState):
         print("--- Validator: Checking Consistency ---")
-        prompt = ChatPromptTemplate.from_template(
-            "Check for contradictions in this contract: {text}. "
-            "Return 'Pass' or list of contradictions."
+        chain = CONSISTENCY_PROMPT | self.gateway.chat("consistency_checker") | StrOutputParser()
+        text = unwrap_draft(state.draft_content)
+        
+        # Reuses the drafting checker's result when the text hasn't changed since
+        result, cached = self.check_registry.get_or_compute(
+            "consistency", text, lambda: chain.invoke({"contract": text})
         )
-        chain = prompt | self.llm | StrOutputParser()
-        result = chain.invoke({"text": (state.draft_content or "")[:5000]})
+        if cached:
+            print("--- Validator: Reusing consistency result for this draft ---")
         
-        state.validation_report["consistency"] = "pass" if "Pass" in result else "warning"
+        state.validation_report["consistency"] = "pass" if is_pass(result) else "warning"
         state.validation_report["consistency_details"] = result
 
 if __name__ == "__main__":
@@ -0,0 +1,101 @@
+import re
+import sys
+import math
+import heapq
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+from tools.content_cache import content_hash
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of", "on", "or",
+    "shall", "that", "the", "this", "to", "will", "with", "any", "all", "such", "may", "must",
+}
+
+def terms(text: str) -> List[str]:
+    """Unigrams without stopwords plus adjacent bigrams, so 'net 30' and 'work for hire' match as phrases."""
+    tokens = TOKEN_RE.findall(text.lower())
+    unigrams = [t for t in tokens if t not in STOPWORDS]
+    bigrams = [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+    return unigrams + bigrams
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> List[str]:
+    """Fuse ranked id lists: score(d) = sum over lists of 1 / (k + rank)."""
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+class BM25Index:
+    """In-memory inverted index with Okapi BM25 scoring.
+
+    Only postings are kept, not the document text: each document is tracked by id and content hash, so
+    re-adding unchanged content is a no-op and an edit replaces just that document's postings.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)  # term -> {doc_id: term frequency}
+        self.lengths: Dict[str, int] = {}
+        self.hashes: Dict[str, str] = {}                              # doc_id -> content hash
+        self.doc_terms: Dict[str, Tuple[str, ...]] = {}               # doc_id -> its terms, for removal
+        self.total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.hashes
+
+    def add(self, doc_id: str, text: str, digest: Optional[str] = None) -> bool:
+        """Index text under doc_id, replacing any older version. Returns False when the content is unchanged."""
+        digest = digest or content_hash(text)
+        if self.hashes.get(doc_id) == digest:
+            return False
+        counts = Counter(sys.intern(term) for term in terms(text))
+        with self._lock:
+            self._remove(doc_id)
+            for term, tf in counts.items():
+                self.postings[term][doc_id] = tf
+            self.lengths[doc_id] = sum(counts.values())
+            self.hashes[doc_id] = digest
+            self.doc_terms[doc_id] = tuple(counts)
+            self.total_length += self.lengths[doc_id]
+        return True
+
+    def remove(self, doc_ids: Iterable[str]):
+        with self._lock:
+            for doc_id in doc_ids:
+                self._remove(doc_id)
+
+    def _remove(self, doc_id: str):
+        if doc_id not in self.hashes:
+            return
+        for term in self.doc_terms.pop(doc_id):
+            self.postings[term].pop(doc_id, None)
+            if not self.postings[term]:
+                del self.postings[term]
+        del self.hashes[doc_id]
+        self.total_length -= self.lengths.pop(doc_id)
+
+    def search(self, query: str, k: int = 3) -> List[Tuple[str, float]]:
+        """Top-k (doc_id, score) for the query."""
+        with self._lock:
+            if not self.hashes:
+                return []
+            n = len(self.hashes)
+            avg_length = self.total_length / n or 1.0
+            scores: Dict[str, float] = defaultdict(float)
+            for term in set(terms(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = tf + self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / norm
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
@@ -0,0 +1,223 @@
+import os
+import re
+import csv
+import json
+import time
+import hashlib
+import argparse
+import unicodedata
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+from tools.content_cache import CACHE_DIR, atomic_write
+from tools.template_store import TemplateStore
+
+TEXT_FIELDS = ("text", "content", "clause", "body")
+MAX_CHUNK_CHARS = 2000
+RECORDS_PER_TASK = 256
+EMBED_BATCH_SIZE = 256          # texts per embedding request
+EMBED_BATCH_CHARS = 400_000     # ~100k tokens, well under the per-request limit
+CHECKPOINT_DIR = os.path.join(CACHE_DIR, "ingest")
+FINGERPRINT_BYTES = 64 * 1024  # head of the source file hashed into the checkpoint
+
+WHITESPACE_RE = re.compile(r"[ \t\f\v]+")
+BLANK_LINES_RE = re.compile(r"\n{3,}")
+SENTENCE_END_RE = re.compile(r"(?<=[.;:])\s+")
+
+Chunk = Tuple[str, str, Dict[str, Any]]  # (id, text, metadata)
+
+def iter_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream records from a .jsonl or .csv file, one at a time."""
+    if path.endswith(".csv"):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            yield from csv.DictReader(f)
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                record = {}  # counted as skipped; keeps record numbering stable for resume
+            yield record if isinstance(record, dict) else {}
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).replace("\r\n", "\n").replace("\r", "\n")
+    lines = [WHITESPACE_RE.sub(" ", line).strip() for line in text.split("\n")]
+    return BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+
+def chunk_text(text: str, max_chars: int = MAX_CHUNK_CHARS) -> List[str]:
+    """Split on paragraphs, then sentences, so no chunk exceeds max_chars."""
+    if len(text) <= max_chars:
+        return [text]
+    pieces = []
+    for paragraph in text.split("\n\n"):
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        for sentence in SENTENCE_END_RE.split(paragraph):
+            pieces.extend(sentence[i:i + max_chars] for i in range(0, len(sentence), max_chars))
+
+    chunks, current = [], ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 2 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+def prepare_records(records: List[Dict[str, Any]], source: str) -> Tuple[List[Chunk], int]:
+    """Runs in a worker process: normalize and chunk records. Returns (chunks, skipped records)."""
+    chunks, skipped = [], 0
+    for record in records:
+        raw = next((record[field] for field in TEXT_FIELDS if record.get(field)), None)
+        text = normalize_text(str(raw)) if raw else ""
+        if not text:
+            skipped += 1
+            continue
+        metadata = {k: v for k, v in record.items()
+                    if k not in TEXT_FIELDS and isinstance(v, (str, int, float, bool)) and v != ""}
+        metadata.setdefault("source", source)
+        parts = chunk_text(text)
+        # Derived from the record's metadata and the chunk, so re-runs and resumes are idempotent (upsert, no
+        # duplicates) while the same text under different metadata stays a separate record
+        record_key = json.dumps(metadata, sort_keys=True, default=str)
+        for i, part in enumerate(parts):
+            chunk_id = hashlib.sha256(f"{record_key}:{i}:{part}".encode("utf-8")).hexdigest()[:32]
+            chunks.append((chunk_id, part, {**metadata, "chunk": i, "chunks": len(parts)}))
+    return chunks, skipped
+
+class BulkIngestor:
+    """Streams a JSONL/CSV clause library into the clause collection with bounded memory.
+
+    Records are read in fixed-size tasks, normalized in a process pool with a bounded number of tasks in
+    flight (backpressure), embedded in size-capped batches and upserted. Progress is checkpointed after
+    every write so an interrupted import resumes where it stopped.
+    """
+
+    def __init__(self, store: Optional[TemplateStore] = None, workers: Optional[int] = None,
+                 embed_batch_size: int = EMBED_BATCH_SIZE):
+        # Write-only: no BM25 index is loaded or grown here; searching stores resync from the collection
+        self.store = store or TemplateStore(lexical=False)
+        self.collection = self.store.vector_store._collection
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.embed_batch_size = embed_batch_size
+
+    def checkpoint_path(self, path: str) -> str:
+        key = hashlib.sha256(f"{os.path.abspath(path)}:{self.collection.name}".encode("utf-8")).hexdigest()[:16]
+        return os.path.join(CHECKPOINT_DIR, f"{key}.json")
+
+    @staticmethod
+    def _fingerprint(path: str) -> Dict[str, Any]:
+        """Size, mtime and a hash of the head: an edited or replaced source never resumes mid-file."""
+        stat = os.stat(path)
+        with open(path, "rb") as f:
+            head = hashlib.sha256(f.read(FINGERPRINT_BYTES)).hexdigest()
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "head": head}
+
+    def _load_checkpoint(self, path: str) -> Dict[str, Any]:
+        checkpoint_file = self.checkpoint_path(path)
+        fingerprint = self._fingerprint(path)
+        if os.path.exists(checkpoint_file):
+            with open(checkpoint_file, "r", encoding="utf-8") as f:
+                checkpoint = json.load(f)
+            if all(checkpoint.get(key) == value for key, value in fingerprint.items()):
+                return checkpoint
+            print("Source file changed since the last run; starting over")
+        return {"path": os.path.abspath(path), **fingerprint, "records": 0, "chunks": 0, "skipped": 0}
+
+    def _write(self, chunks: List[Chunk]):
+        """Embed and upsert chunks in batches capped by count and characters."""
+        batch: List[Chunk] = []
+        seen = set()
+        chars = 0
+        for chunk in chunks + [None]:
+            if chunk is None or (batch and (len(batch) >= self.embed_batch_size or chars + len(chunk[1]) > EMBED_BATCH_CHARS)):
+                if batch:
+                    # Embeds through the gateway (shared limits, retries)
+                    self.store.upsert_documents(
+                        ids=[c[0] for c in batch],
+                        documents=[c[1] for c in batch],
+                        metadatas=[c[2] for c in batch],
+                    )
+                batch, seen, chars = [], set(), 0
+            # Identical records (same text and metadata) share an id and are stored once
+            if chunk is not None and chunk[0] not in seen:
+                batch.append(chunk)
+                seen.add(chunk[0])
+                chars += len(chunk[1])
+
+    def ingest(self, path: str, reset: bool = False) -> Dict[str, Any]:
+        checkpoint_file = self.checkpoint_path(path)
+        if reset and os.path.exists(checkpoint_file):
+            os.remove(checkpoint_file)
+        checkpoint = self._load_checkpoint(path)
+        if checkpoint.get("done"):
+            print(f"{path} was already imported ({checkpoint['records']} records); use --reset to import again")
+            return checkpoint
+        if checkpoint["records"]:
+            print(f"Resuming {path} after {checkpoint['records']} records")
+
+        source = os.path.basename(path)
+        records = islice(iter_records(path), checkpoint["records"], None)
+        pending: Deque[Tuple[Future, int]] = deque()
+        max_pending = self.workers * 2
+        start = last_report = time.perf_counter()
+        ingested = 0
+
+        def drain_one():
+            nonlocal ingested, last_report
+            future, count = pending.popleft()
+            chunks, skipped = future.result()
+            self._write(chunks)
+            checkpoint["records"] += count
+            checkpoint["chunks"] += len(chunks)
+            checkpoint["skipped"] += skipped
+            atomic_write(checkpoint_file, json.dumps(checkpoint))
+            ingested += count
+            now = time.perf_counter()
+            if now - last_report >= 5:
+                print(f"  {checkpoint['records']} records, {checkpoint['chunks']} chunks, "
+                      f"{ingested / (now - start):.0f} clauses/sec")
+                last_report = now
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                task = list(islice(records, RECORDS_PER_TASK))
+                if not task:
+                    break
+                # Backpressure: never more than max_pending tasks read ahead of the writer
+                while len(pending) >= max_pending:
+                    drain_one()
+                pending.append((pool.submit(prepare_records, task, source), len(task)))
+            while pending:
+                drain_one()
+
+        elapsed = time.perf_counter() - start
+        checkpoint["done"] = True
+        atomic_write(checkpoint_file, json.dumps(checkpoint))
+        report = {
+            "records": ingested,
+            "chunks": checkpoint["chunks"],
+            "skipped": checkpoint["skipped"],
+            "elapsed_s": round(elapsed, 2),
+            "clauses_per_s": round(ingested / elapsed, 1) if elapsed else 0.0,
+        }
+        print(f"Imported {path}: {report}")
+        return report
+
+if __name__ == "__main__":
+    # python -m tools.bulk_ingest clauses.jsonl [--workers 4] [--batch-size 256] [--reset]
+    parser = argparse.ArgumentParser(description="Stream a JSONL/CSV clause library into the clause collection.")
+    parser.add_argument("path")
+    parser.add_argument("--collection", default="contract_clauses")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--reset", action="store_true", help="ignore the checkpoint and import from the start")
+    args = parser.parse_args()
+    ingestor = BulkIngestor(TemplateStore(collection_name=args.collection, lexical=False), args.workers, args.batch_size)
+    ingestor.ingest(args.path, reset=args.reset)
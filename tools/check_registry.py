@@ -0,0 +1,48 @@
+from typing import Callable, Optional, Tuple
+from langchain_core.prompts import ChatPromptTemplate
+from tools.content_cache import ContentCache, content_hash
+from tools.draft_sections import unwrap_draft
+
+# One consistency question shared by the drafting checker and the Validator
+CONSISTENCY_PROMPT = ChatPromptTemplate.from_template(
+    "Check this contract for contradictions, internal inconsistencies and unclear terms: {contract}. "
+    "Ensure all necessary sections are present. "
+    "Placeholders like [CLIENT_NAME] for missing information are expected and are not issues. "
+    "Return 'Pass' or a list of issues/missing information."
+)
+
+def is_pass(result: str) -> bool:
+    return (result or "").strip().strip("'\"*`").lower().startswith("pass")
+
+class CheckRegistry:
+    """Check results keyed by (check name, draft content hash), shared by every stage."""
+
+    def __init__(self, cache: Optional[ContentCache] = None):
+        self.cache = cache or ContentCache("checks")
+
+    def key(self, check: str, text: str) -> str:
+        # The assembler wrapper doesn't change the contract, so hash the unwrapped text
+        return f"{check}:{content_hash(unwrap_draft(text))}"
+
+    def get(self, check: str, text: str) -> Optional[str]:
+        return self.cache.get(self.key(check, text))
+
+    def put(self, check: str, text: str, result: str):
+        self.cache.set(self.key(check, text), result)
+
+    def get_or_compute(self, check: str, text: str, compute: Callable[[], str]) -> Tuple[str, bool]:
+        """Returns (result, cached)."""
+        result = self.get(check, text)
+        if result is not None:
+            return result, True
+        result = compute()
+        self.put(check, text, result)
+        return result, False
+
+_registry: Optional[CheckRegistry] = None
+
+def get_check_registry() -> CheckRegistry:
+    global _registry
+    if _registry is None:
+        _registry = CheckRegistry()
+    return _registry
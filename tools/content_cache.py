@@ -0,0 +1,66 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "cache")
+
+def content_hash(text: Optional[str]) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+def atomic_write(filepath: str, data, mode: str = "w"):
+    """Write to a temp file in the same directory, then rename over the target."""
+    directory = os.path.dirname(os.path.abspath(filepath))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+            f.write(data)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class ContentCache:
+    """Small JSON-backed cache for results keyed by content hash (one file per cache name)."""
+
+    def __init__(self, name: str, max_entries: int = 256, directory: str = CACHE_DIR):
+        self.filepath = os.path.join(directory, f"{name}.json")
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Any]] = None
+
+    def _load(self) -> Dict[str, Any]:
+        if self._entries is None:
+            try:
+                with open(self.filepath, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self._entries = {}
+        return self._entries
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            return self._load().get(key, default)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._load()
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            entries = self._load()
+            entries.pop(key, None)
+            entries[key] = value
+            # Insertion order doubles as age: evict the oldest entries
+            while len(entries) > self.max_entries:
+                entries.pop(next(iter(entries)))
+            atomic_write(self.filepath, json.dumps(entries))
+
+    def delete(self, key: str):
+        with self._lock:
+            if self._load().pop(key, None) is not None:
+                atomic_write(self.filepath, json.dumps(self._entries))
@@ -0,0 +1,136 @@
+import re
+from typing import Dict, Tuple
+from tools.fact_tools import AMOUNT_RE
+from tools.placeholder_tools import PLACEHOLDER_RE
+from tools.draft_sections import parse_sections
+
+# Verdicts: "pass" / "fail" are definitive, "uncertain" defers to the LLM check
+PASS, FAIL, UNCERTAIN = "pass", "fail", "uncertain"
+
+RULES = {
+    "payment_heading": re.compile(r"\b(?:payment|compensation|fees?|pricing|remuneration)\b", re.IGNORECASE),
+    "payment_mention": re.compile(r"\b(?:pay|pays|paid|payment|invoice|fee|fees|compensation|rate)\b", re.IGNORECASE),
+    "amount_placeholder": re.compile(r"\[(?:[A-Z_]*(?:AMOUNT|FEE|RATE|PRICE|COST)[A-Z_]*)\]"),
+    "currency": re.compile(r"[$€£₹]|\b(?:USD|EUR|GBP|INR|CAD|AUD|dollars|euros|pounds|rupees)\b", re.IGNORECASE),
+    "schedule": re.compile(
+        r"\b(?:within\s+\w+\s*(?:\(\d+\)\s*)?days|net\s*\d+|upon\s+(?:completion|delivery|signing|receipt)|"
+        r"monthly|weekly|bi-?weekly|installments?|milestones?|in\s+advance|due\s+(?:on|upon|within|by)|per\s+(?:hour|month|week))\b",
+        re.IGNORECASE,
+    ),
+    "ip_heading": re.compile(r"\b(?:intellectual\s+property|ownership|work\s+(?:made\s+)?for\s+hire|copyright)\b", re.IGNORECASE),
+    "ip_mention": re.compile(r"\b(?:intellectual\s+property|copyrights?|ownership|owns?|work\s+(?:made\s+)?for\s+hire|proprietary)\b", re.IGNORECASE),
+    "ip_ownership": re.compile(
+        r"\b(?:shall\s+(?:own|retain|vest)|(?:will|shall)\s+be\s+the\s+(?:sole\s+)?property|owns?\s+all|retains?\s+(?:all\s+)?(?:right|title|ownership)|"
+        r"(?:hereby\s+)?assigns?\s+(?:to|all)|work\s+(?:made\s+)?for\s+hire|vests?\s+in|exclusive\s+(?:right|license)|"
+        r"(?:right|title)(?:,)?\s+and\s+interest)\b",
+        re.IGNORECASE,
+    ),
+}
+
+# "Client shall retain no rights ..." matches the ownership phrasing but says the opposite
+NEGATION_AFTER_RE = re.compile(r"\s*(?:no|not|none|neither|nothing)\b", re.IGNORECASE)
+
+SENTENCE_END_RE = re.compile(r"[.!?]+(?=\s|$)")
+WORD_RE = re.compile(r"[A-Za-z]+(?:'[a-z]+)?")
+VOWEL_GROUP_RE = re.compile(r"[aeiouy]+")
+
+def section_text(text: str, heading_rule: re.Pattern) -> str:
+    """Text of the sections whose heading matches, up to the next heading of the same or a higher level."""
+    parts, level = [], None
+    for section in parse_sections(text):
+        if level is not None and section["level"] > level:
+            parts.append(section["text"])  # a subsection of the matching section
+            continue
+        level = None
+        if section["heading"] and heading_rule.search(section["heading"]):
+            parts.append(section["text"])
+            level = section["level"]
+    return "".join(parts)
+
+def check_payment_terms(text: str) -> Tuple[str, str]:
+    """Local payment check: amount, schedule and currency, read from the payment section only."""
+    if not RULES["payment_mention"].search(text):
+        return FAIL, "No payment or compensation terms found."
+    # Amounts elsewhere (a liability cap, an insurance minimum) say nothing about the price
+    payment = section_text(text, RULES["payment_heading"])
+    has_section = bool(payment)
+    amounts = [m for m in AMOUNT_RE.finditer(payment)]
+    has_schedule = bool(RULES["schedule"].search(payment))
+    has_currency = bool(RULES["currency"].search(payment))
+    if has_section and RULES["amount_placeholder"].search(payment):
+        return UNCERTAIN, "Payment section present but the amount is still a placeholder."
+    if has_section and amounts and has_schedule and has_currency:
+        return PASS, f"Payment section with {len(amounts)} amount(s), currency and schedule."
+    missing = [name for name, ok in (("section", has_section), ("amount", bool(amounts)),
+                                     ("schedule", has_schedule), ("currency", has_currency)) if not ok]
+    return UNCERTAIN, f"Could not confirm: {', '.join(missing)}."
+
+def check_ip_ownership(text: str) -> Tuple[str, str]:
+    """Local IP check: an ownership section with assignment/ownership phrasing."""
+    if not RULES["ip_mention"].search(text):
+        return FAIL, "No intellectual property or ownership terms found."
+    has_section = any(RULES["ip_heading"].search(section["heading"]) for section in parse_sections(text))
+    has_ownership = any(not NEGATION_AFTER_RE.match(text, m.end()) for m in RULES["ip_ownership"].finditer(text))
+    if has_section and has_ownership:
+        return PASS, "IP/ownership section with explicit ownership or assignment language."
+    return UNCERTAIN, "IP is mentioned but ownership could not be confirmed locally."
+
+def count_syllables(word: str) -> int:
+    word = word.lower()
+    count = len(VOWEL_GROUP_RE.findall(word))
+    if word.endswith("e") and not word.endswith(("le", "ee")) and count > 1:
+        count -= 1
+    return max(count, 1)
+
+def readability_metrics(text: str) -> Dict[str, float]:
+    """Sentence length, word length and Flesch scores in one pass over the text."""
+    words = syllables = letters = complex_words = 0
+    sentences = 0
+    for line in text.splitlines():
+        line = PLACEHOLDER_RE.sub("", line).strip()
+        if not line:
+            continue
+        line_words = 0
+        for match in WORD_RE.finditer(line):
+            word = match.group(0)
+            word_syllables = count_syllables(word)
+            words += 1
+            line_words += 1
+            letters += len(word)
+            syllables += word_syllables
+            complex_words += word_syllables >= 3
+        # Headings and list items without terminal punctuation still count as one sentence
+        if line_words:
+            sentences += max(len(SENTENCE_END_RE.findall(line)), 1)
+
+    if not words:
+        return {"words": 0, "sentences": 0, "avg_sentence_length": 0.0, "avg_word_length": 0.0,
+                "flesch_reading_ease": 0.0, "flesch_kincaid_grade": 0.0, "complex_word_ratio": 0.0}
+    words_per_sentence = words / sentences
+    syllables_per_word = syllables / words
+    return {
+        "words": words,
+        "sentences": sentences,
+        "avg_sentence_length": round(words_per_sentence, 2),
+        "avg_word_length": round(letters / words, 2),
+        "flesch_reading_ease": round(206.835 - 1.015 * words_per_sentence - 84.6 * syllables_per_word, 2),
+        "flesch_kincaid_grade": round(0.39 * words_per_sentence + 11.8 * syllables_per_word - 15.59, 2),
+        "complex_word_ratio": round(complex_words / words, 3),
+    }
+
+if __name__ == "__main__":
+    import os
+    sample_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "contract_v4.txt")
+    with open(sample_path, "r", encoding="utf-8") as f:
+        sample = f.read()
+    print("payment:", check_payment_terms(sample))
+    print("ip:", check_ip_ownership(sample))
+    print("readability:", readability_metrics(sample))
+
+    # Numbered clauses under a plain, markdown or bold heading are the section's body, not headings of their own
+    for heading in ("4. Payment Terms", "## 4. Payment Terms", "**Payment Terms**"):
+        numbered = (f"{heading}\n\n1. Client shall pay $5,000 USD.\n2. Invoices are due within 30 days.\n\n"
+                    "5. Ownership\n\n1. Client shall own all deliverables upon payment.\n")
+        assert check_payment_terms(numbered)[0] == PASS, heading
+        assert check_ip_ownership(numbered)[0] == PASS, heading
+    print("numbered-clause sections: pass")
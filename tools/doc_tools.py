@@ -1,26 +1,274 @@
 import os
-# Placeholder imports for python-docx and reportlab
-# from docx import Document
-# from reportlab.pdfgen import canvas
-
-def export_to_docx(content: str, filename: str = "contract.docx") -> str:
-    # doc = Document()
-    # doc.add_paragraph(content)
-    # doc.save(filename)
-    print(f"Exported content to DOCX: {filename} (Placeholder)")
-    return os.path.abspath(filename)
+import re
+import sys
+import json
+import time
+import shutil
+import tempfile
+import hashlib
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from docx import Document
+from docx.shared import Pt, Inches
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import LETTER
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table
 
-def export_to_pdf(content: str, filename: str = "contract.pdf") -> str:
-    # c = canvas.Canvas(filename)
-    # c.drawString(100, 750, content[:100] + "...")
-    # c.save()
-    print(f"Exported content to PDF: {filename} (Placeholder)")
-    return os.path.abspath(filename)
+RENDER_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "cache", "renders")
+
+# Layout presets; part of the render cache key
+TEMPLATES = {
+    "standard": {"font_size": 11, "leading": 15, "margin": 1.0},
+    "compact": {"font_size": 9, "leading": 12, "margin": 0.75},
+}
+
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.*)$")
+CLAUSE_RE = re.compile(r"^(\d+(?:\.\d+)*\.?)\s+(.*)$")
+BULLET_RE = re.compile(r"^[-*•]\s+(.*)$")
+SIGNATURE_RE = re.compile(r"_{4,}|^\s*(?:\*\*)?(?:signature|signed|by|date)\s*:", re.IGNORECASE)
+BOLD_RE = re.compile(r"\*\*(.+?)\*\*")
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def parse_blocks(content: str) -> List[Tuple[str, int, str]]:
+    """Markdown contract -> (kind, level, text) blocks: heading, clause, bullet, signature, paragraph."""
+    blocks = []
+    for raw in content.splitlines():
+        line = raw.strip()
+        if not line or line.startswith("```"):
+            continue
+        heading = HEADING_RE.match(line)
+        clause = CLAUSE_RE.match(line)
+        bullet = BULLET_RE.match(line)
+        if heading:
+            blocks.append(("heading", len(heading.group(1)), heading.group(2)))
+        elif SIGNATURE_RE.search(line):
+            blocks.append(("signature", 0, line))
+        elif clause:
+            blocks.append(("clause", clause.group(1).rstrip(".").count(".") + 1, line))
+        elif bullet:
+            blocks.append(("bullet", 1, bullet.group(1)))
+        else:
+            blocks.append(("paragraph", 0, line))
+    return blocks
+
+def _signature_lines(signatures: Optional[Dict]) -> List[Tuple[str, int, str]]:
+    if not signatures:
+        return []
+    signer = signatures.get("signer", "Signer")
+    return [
+        ("heading", 2, "Signatures"),
+        ("signature", 0, f"{signer}: ______________________________"),
+        ("paragraph", 0, f"Status: {signatures.get('status', 'pending')} | Signature ID: {signatures.get('signature_id', '')}"),
+        ("signature", 0, "Date: ______________________________"),
+    ]
+
+def _inline_pdf(text: str) -> str:
+    text = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    return BOLD_RE.sub(r"<b>\1</b>", text)
+
+def _tmp_path(filepath: str) -> str:
+    directory = os.path.dirname(os.path.abspath(filepath))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.splitext(filepath)[1])
+    os.close(fd)
+    return tmp_path
+
+def _render_pdf(blocks: List[Tuple[str, int, str]], filepath: str, template: str):
+    preset = TEMPLATES.get(template, TEMPLATES["standard"])
+    styles = getSampleStyleSheet()
+    body = ParagraphStyle("Body", parent=styles["BodyText"], fontSize=preset["font_size"], leading=preset["leading"])
+    headings = {
+        1: ParagraphStyle("H1", parent=styles["Heading1"], alignment=TA_CENTER),
+        2: styles["Heading2"],
+        3: styles["Heading3"],
+    }
+
+    story = []
+    for kind, level, text in blocks:
+        if kind == "heading":
+            story.append(Paragraph(_inline_pdf(text), headings.get(level, styles["Heading4"])))
+        elif kind == "clause":
+            story.append(Paragraph(_inline_pdf(text), ParagraphStyle(f"Clause{level}", parent=body, leftIndent=(level - 1) * 18)))
+        elif kind == "bullet":
+            story.append(Paragraph(_inline_pdf(text), body, bulletText="•"))
+        elif kind == "signature":
+            story.append(Spacer(1, 18))
+            story.append(Table([[Paragraph(_inline_pdf(text), body)]], colWidths=[4.5 * inch]))
+        else:
+            story.append(Paragraph(_inline_pdf(text), body))
+
+    margin = preset["margin"] * inch
+    tmp_path = _tmp_path(filepath)
+    try:
+        SimpleDocTemplate(tmp_path, pagesize=LETTER, leftMargin=margin, rightMargin=margin,
+                          topMargin=margin, bottomMargin=margin).build(story)
+        os.replace(tmp_path, filepath)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _render_docx(blocks: List[Tuple[str, int, str]], filepath: str, template: str):
+    preset = TEMPLATES.get(template, TEMPLATES["standard"])
+    doc = Document()
+    doc.styles["Normal"].font.size = Pt(preset["font_size"])
+    for section in doc.sections:
+        section.left_margin = section.right_margin = Inches(preset["margin"])
+
+    for kind, level, text in blocks:
+        plain = BOLD_RE.sub(r"\1", text)
+        if kind == "heading":
+            doc.add_heading(plain, level=min(level, 4))
+        elif kind == "clause":
+            paragraph = doc.add_paragraph(plain)
+            paragraph.paragraph_format.left_indent = Inches(0.25 * (level - 1))
+        elif kind == "bullet":
+            doc.add_paragraph(plain, style="List Bullet")
+        elif kind == "signature":
+            paragraph = doc.add_paragraph(plain)
+            paragraph.paragraph_format.space_before = Pt(18)
+        else:
+            doc.add_paragraph(plain)
+
+    tmp_path = _tmp_path(filepath)
+    try:
+        doc.save(tmp_path)
+        os.replace(tmp_path, filepath)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
-def export_signature_pdf(content: str, signatures: dict, filename: str = "signed_contract.pdf") -> str:
-    print(f"Exported signed PDF: {filename} with signatures {signatures} (Placeholder)")
+def _copy_atomic(source: str, target: str):
+    tmp_path = _tmp_path(target)
+    try:
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _render_to_cache(content: str, fmt: str, template: str, signatures: Optional[Dict], cache_path: str) -> str:
+    if not os.path.exists(cache_path):
+        blocks = parse_blocks(content) + _signature_lines(signatures)
+        renderer = _render_pdf if fmt == "pdf" else _render_docx
+        renderer(blocks, cache_path, template)
+    return cache_path
+
+def _render_job(content: str, fmt: str, template: str, signatures: Optional[Dict], cache_path: str, target: str) -> str:
+    # Runs in a worker process: render into the cache once, then copy out to the requested path
+    _render_to_cache(content, fmt, template, signatures, cache_path)
+    _copy_atomic(cache_path, target)
+    return target
+
+def render_cache_path(content: str, fmt: str, template: str = "standard", signatures: Optional[Dict] = None) -> str:
+    key = hashlib.sha256(json.dumps([content, fmt, template, signatures], sort_keys=True).encode("utf-8")).hexdigest()
+    return os.path.join(RENDER_CACHE_DIR, f"{key}.{fmt}")
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=min(4, os.cpu_count() or 1))
+    return _pool
+
+def submit_render(content: str, fmt: str, filename: str, template: str = "standard",
+                  signatures: Optional[Dict] = None) -> Future:
+    """Render in the background process pool. Cached renders complete without touching the pool."""
+    target = os.path.abspath(filename)
+    cache_path = render_cache_path(content, fmt, template, signatures)
+    if os.path.exists(cache_path):
+        future = Future()
+        _copy_atomic(cache_path, target)
+        future.set_result(target)
+        return future
+    return _get_pool().submit(_render_job, content, fmt, template, signatures, cache_path, target)
+
+def prerender(content: str, fmt: str, template: str = "standard", signatures: Optional[Dict] = None) -> str:
+    """Render into the cache only, so a later export of the same content is just a copy."""
+    cache_path = render_cache_path(content, fmt, template, signatures)
+    if os.path.exists(cache_path):
+        return cache_path
+    return _get_pool().submit(_render_to_cache, content, fmt, template, signatures, cache_path).result()
+
+def _discard_reserved(filename: str):
+    # The caller reserved the name with an empty file; a failed render must not leave it behind as an export
+    path = os.path.abspath(filename)
+    if os.path.exists(path) and os.path.getsize(path) == 0:
+        os.remove(path)
+
+def _export(content: str, fmt: str, filename: str, template: str, signatures: Optional[Dict], wait: bool,
+            on_done: Optional[Callable[[Optional[str]], Any]] = None) -> str:
+    """With wait=False, returns at once; on_done(path, or None on failure) runs once the file is written."""
+    future = submit_render(content, fmt, filename, template, signatures)
+    if wait:
+        try:
+            return future.result()
+        except Exception:
+            _discard_reserved(filename)
+            raise
+
+    def report(done: Future):
+        if done.exception():
+            print(f"\n⚠️ Rendering {filename} failed: {done.exception()}")
+            _discard_reserved(filename)
+        else:
+            print(f"\n📄 Rendered {done.result()}")
+        if on_done is not None:
+            on_done(None if done.exception() else done.result())
+    future.add_done_callback(report)
     return os.path.abspath(filename)
 
+def export_to_docx(content: str, filename: str = "contract.docx", template: str = "standard", wait: bool = True,
+                   on_done: Optional[Callable[[Optional[str]], Any]] = None) -> str:
+    path = _export(content, "docx", filename, template, None, wait, on_done)
+    print(f"Exported content to DOCX: {path}")
+    return path
+
+def export_to_pdf(content: str, filename: str = "contract.pdf", template: str = "standard", wait: bool = True,
+                  on_done: Optional[Callable[[Optional[str]], Any]] = None) -> str:
+    path = _export(content, "pdf", filename, template, None, wait, on_done)
+    print(f"Exported content to PDF: {path}")
+    return path
+
+def export_signature_pdf(content: str, signatures: dict, filename: str = "signed_contract.pdf",
+                         template: str = "standard", wait: bool = True,
+                         on_done: Optional[Callable[[Optional[str]], Any]] = None) -> str:
+    path = _export(content, "pdf", filename, template, signatures, wait, on_done)
+    print(f"Exported signed PDF: {path} with signatures {signatures}")
+    return path
+
+def benchmark_rendering(pages: int = 300, template: str = "standard"):
+    """Render a synthetic multi-hundred-page contract (bypassing the cache) and report throughput."""
+    clause = ("{n}.{m} The Service Provider shall deliver the Services described in Exhibit A in a professional "
+              "and workmanlike manner, and the Client shall pay all undisputed invoices within thirty (30) days.")
+    lines = ["# Benchmark Service Agreement", ""]
+    section = 1
+    # Roughly 12 clauses fill a LETTER page with the standard template
+    while len(lines) < pages * 12:
+        lines.append(f"## {section}. Section {section}")
+        lines.extend(clause.format(n=section, m=m) for m in range(1, 7))
+        section += 1
+    lines.append("Client Signature: ______________________________")
+    content = "\n".join(lines)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in ("pdf", "docx"):
+            start = time.perf_counter()
+            _render_job(content, fmt, template, None, os.path.join(tmp, f"cache.{fmt}"), os.path.join(tmp, f"out.{fmt}"))
+            elapsed = time.perf_counter() - start
+            size_mb = os.path.getsize(os.path.join(tmp, f"out.{fmt}")) / 1e6
+            print(f"{fmt.upper():5} {len(lines)} lines (~{pages} pages): {elapsed:.2f}s, "
+                  f"{pages / elapsed:.0f} pages/s, {size_mb:.2f} MB")
+
+        start = time.perf_counter()
+        cache_path = os.path.join(tmp, "cache.pdf")
+        _copy_atomic(cache_path, os.path.join(tmp, "again.pdf"))
+        print(f"Cached re-export: {(time.perf_counter() - start) * 1000:.1f} ms")
+
 if __name__ == "__main__":
-    export_to_docx("Test content")
-    export_to_pdf("Test content")
+    if len(sys.argv) > 1 and sys.argv[1] == "--benchmark":
+        benchmark_rendering(int(sys.argv[2]) if len(sys.argv) > 2 else 300)
+    else:
+        export_to_docx("# Test Agreement\n\n1. Scope\n\n1.1 Test content", "contract.docx")
+        export_to_pdf("# Test Agreement\n\n1. Scope\n\n1.1 Test content", "contract.pdf")
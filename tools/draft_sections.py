@@ -0,0 +1,118 @@
+import re
+from typing import Dict, List, Optional
+from tools.placeholder_tools import PLACEHOLDER_RE
+
+DRAFT_HEADER = "DRAFT CONTRACT\n\n"
+DRAFT_FOOTER = "\n\n[End of Draft]"
+
+# Heading lines: markdown ("## 4. Compensation"), bold ("**Payment Terms**"), all-caps titles ("PAYMENT TERMS:")
+# and short numbered titles ("4. Compensation"). Numbered clauses ("1. Client shall pay $5,000.") are body text.
+MARKDOWN_HEADING_RE = re.compile(r"^(#{1,6})\s+\S")
+BOLD_HEADING_RE = re.compile(r"^\*\*[^*\n]{1,80}\*\*:?$")
+CAPS_HEADING_RE = re.compile(r"^[A-Z][A-Z0-9 &/,()'’“”\-]{3,80}:?$")
+NUMBERED_HEADING_RE = re.compile(r"^\d{1,2}\.\s+[A-Z][^\n]{0,60}$")
+SENTENCE_END = (".", "!", "?", ";", ",")
+MAX_TITLE_WORDS = 8
+LINE_RE = re.compile(r"^.*$", re.MULTILINE)
+WORD_RE = re.compile(r"[a-z][a-z0-9\-]{2,}")
+
+STOPWORDS = {
+    "the", "and", "for", "this", "that", "with", "please", "can", "you", "make", "clause", "section",
+    "contract", "agreement", "add", "change", "update", "improve", "should", "would", "could", "into",
+    "from", "are", "our", "its", "more", "less", "all", "any", "also", "just", "want", "need", "about",
+}
+
+def unwrap_draft(text: Optional[str]) -> str:
+    """Strip the assembler wrapper and an enclosing markdown code fence from a draft."""
+    text = (text or "").strip()
+    if text.startswith(DRAFT_HEADER.strip()):
+        text = text[len(DRAFT_HEADER.strip()):].lstrip("\n")
+    if text.endswith(DRAFT_FOOTER.strip()):
+        text = text[:-len(DRAFT_FOOTER.strip())].rstrip("\n")
+    fenced = re.match(r"^```[a-z]*\n(.*)\n```$", text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1)
+    return text
+
+def wrap_draft(text: str) -> str:
+    return f"{DRAFT_HEADER}{unwrap_draft(text)}{DRAFT_FOOTER}"
+
+def heading_level(line: str) -> Optional[int]:
+    """Outline level of a heading line (markdown depth, 1 for the other forms), or None for body text."""
+    line = line.strip()
+    markdown = MARKDOWN_HEADING_RE.match(line)
+    if markdown:
+        return len(markdown.group(1))
+    if BOLD_HEADING_RE.match(line) or CAPS_HEADING_RE.match(line):
+        return 1
+    # A numbered line is a title only when it reads like one: short, and not a sentence
+    if NUMBERED_HEADING_RE.match(line) and not line.endswith(SENTENCE_END) and len(line.split()) <= MAX_TITLE_WORDS + 1:
+        return 1
+    return None
+
+def parse_sections(text: str) -> List[Dict[str, str]]:
+    """Split a contract into sections. Joining the 'text' fields reproduces the input exactly."""
+    starts = [m.start() for m in LINE_RE.finditer(text) if heading_level(m.group(0)) is not None]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    sections = []
+    for i, start in enumerate(starts):
+        end = starts[i + 1] if i + 1 < len(starts) else len(text)
+        chunk = text[start:end]
+        first_line = chunk.split("\n", 1)[0]
+        level = heading_level(first_line)
+        heading = first_line.strip() if level is not None else ""
+        sections.append({"heading": heading, "level": level or 0, "text": chunk})
+    return sections
+
+def _keywords(text: str) -> set:
+    return {w for w in WORD_RE.findall(text.lower()) if w not in STOPWORDS}
+
+def select_sections(sections: List[Dict[str, str]], request: str, max_fraction: float = 0.5) -> Optional[List[int]]:
+    """Indices of the sections a request affects, or None if the edit is not local."""
+    if len(sections) < 2:
+        return None
+    placeholders = set(PLACEHOLDER_RE.findall(request))
+    request_words = _keywords(PLACEHOLDER_RE.sub(" ", request))
+    selected = []
+    for i, section in enumerate(sections):
+        section_placeholders = set(PLACEHOLDER_RE.findall(section["text"]))
+        heading_words = _keywords(section["heading"])
+        if placeholders & section_placeholders:
+            selected.append(i)
+        elif heading_words and heading_words & request_words:
+            selected.append(i)
+    if not selected or len(selected) > max(1, int(len(sections) * max_fraction)):
+        return None
+    return selected
+
+def splice_sections(sections: List[Dict[str, str]], replacements: Dict[int, str]) -> str:
+    """Rebuild the contract, swapping in regenerated section text."""
+    parts = []
+    for i, section in enumerate(sections):
+        if i in replacements:
+            original = section["text"]
+            trailing = original[len(original.rstrip("\n")):] or "\n"
+            parts.append(replacements[i].strip("\n") + trailing)
+        else:
+            parts.append(section["text"])
+    return "".join(parts)
+
+if __name__ == "__main__":
+    sample = "# Agreement\n\nBetween [CLIENT_NAME] and [PROVIDER_NAME].\n\n## 1. Scope\n\nWork.\n\n## 2. Payment\n\nPay [AMOUNT] within 30 days.\n\n## 3. Termination\n\nEither party.\n"
+    sections = parse_sections(sample)
+    print([s["heading"] for s in sections])
+    print(select_sections(sections, "Tighten the payment clause"))
+    print(select_sections(sections, "[CLIENT_NAME]Acme Corp"))
+    assert splice_sections(sections, {}) == sample
+
+    # Numbered clauses stay inside their section; only the titles split the draft
+    numbered = ("SERVICE AGREEMENT\n\n1. Scope of Work\n\n1. Freelancer shall build the site.\n2. Changes need written approval.\n\n"
+                "## 2. Payment Terms\n\n1. Client shall pay $5,000 USD.\n2. Invoices are due within 30 days.\n\n"
+                "**Termination**\n\n1. Either party may terminate with 14 days notice.\n")
+    sections = parse_sections(numbered)
+    assert [s["heading"] for s in sections] == ["SERVICE AGREEMENT", "1. Scope of Work", "## 2. Payment Terms", "**Termination**"]
+    payment = select_sections(sections, "Tighten the payment clause")
+    assert payment == [2] and "Client shall pay $5,000 USD." in sections[2]["text"]
+    assert splice_sections(sections, {}) == numbered
+    print("numbered-clause draft:", [s["heading"] for s in sections])
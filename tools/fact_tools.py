@@ -0,0 +1,125 @@
+import json
+import re
+import datetime
+from typing import Any, Dict, List, Tuple
+from tools.placeholder_tools import FILL_PAIR_RE, parse_fill_input
+
+EMAIL_RE = re.compile(r"\b[\w.+-]+@[\w-]+\.[\w.-]+\b")
+ISO_DATE_RE = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+US_DATE_RE = re.compile(r"\b(\d{1,2}/\d{1,2}/\d{4})\b")
+LONG_DATE_RE = re.compile(
+    r"\b((?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]*\.?\s+\d{1,2},?\s+\d{4})\b", re.IGNORECASE
+)
+CURRENCY_SYMBOLS = {"$": "USD", "€": "EUR", "£": "GBP", "₹": "INR"}
+CURRENCY_WORDS = {
+    "usd": "USD", "dollars": "USD", "eur": "EUR", "euros": "EUR", "gbp": "GBP", "pounds": "GBP",
+    "inr": "INR", "rupees": "INR", "cad": "CAD", "aud": "AUD",
+}
+SCALE_WORDS = {"k": 1000, "thousand": 1000, "m": 10 ** 6, "mn": 10 ** 6, "million": 10 ** 6,
+               "bn": 10 ** 9, "billion": 10 ** 9}
+SCALE = r"(?:k|thousand|mn?|million|bn|billion)\b"
+AMOUNT_RE = re.compile(
+    r"(?P<symbol>[$€£₹])\s?(?P<num>\d[\d,]*(?:\.\d+)?)\s?(?P<k>" + SCALE + r")?"
+    r"|(?P<num2>\d[\d,]*(?:\.\d+)?)\s?(?P<k2>" + SCALE + r")?\s?(?P<word>USD|EUR|GBP|INR|CAD|AUD|dollars|euros|pounds|rupees)\b",
+    re.IGNORECASE,
+)
+# Rate words right after an amount, allowing a currency code in between ("$2,000 USD per month")
+RATE_PREFIX = r"^\s*(?:(?:USD|EUR|GBP|INR|CAD|AUD)\b)?\s*"
+HOURLY_RE = re.compile(RATE_PREFIX + r"(?:/\s*(?:hr|hour)|per\s+hour|an\s+hour|hourly)", re.IGNORECASE)
+MONTHLY_RE = re.compile(RATE_PREFIX + r"(?:/\s*(?:mo|month)\b|per\s+month|a\s+month|each\s+month|every\s+month|monthly)",
+                        re.IGNORECASE)
+NET_DAYS_RE = re.compile(r"\b(?:net\s*(\d{1,3})|within\s+(\d{1,3})\s+days)\b", re.IGNORECASE)
+LATE_FEE_RE = re.compile(r"(\d+(?:\.\d+)?)\s?%\s*(?:per\s+month|monthly|late)", re.IGNORECASE)
+WORD_RE = re.compile(r"[A-Za-z]{3,}")
+
+FILLER_WORDS = {"the", "and", "for", "here", "are", "details", "with", "is", "my", "our", "its", "it"}
+
+def parse_date(text: str) -> str:
+    for fmt in ("%Y-%m-%d", "%m/%d/%Y", "%B %d, %Y", "%B %d %Y", "%b %d, %Y", "%b %d %Y", "%b. %d, %Y"):
+        try:
+            return datetime.datetime.strptime(text.strip(), fmt).date().isoformat()
+        except ValueError:
+            continue
+    return ""
+
+def _parse_number(num: str, scale: str = "") -> float:
+    # "$1.5 million" is 1,500,000, not 1.5
+    return float(num.replace(",", "")) * SCALE_WORDS.get((scale or "").lower(), 1)
+
+def extract_local_facts(text: str) -> Tuple[Dict[str, Any], str]:
+    """Rule-based extraction. Returns (facts, residual_text) where residual is what no rule explained."""
+    text = text or ""
+    facts: Dict[str, Any] = dict(parse_fill_input(text))
+    residual = FILL_PAIR_RE.sub(" ", text) if text.strip().startswith("[") else text
+
+    emails = EMAIL_RE.findall(residual)
+    if emails:
+        facts.setdefault("EMAILS", emails)
+
+    dates = []
+    for pattern in (ISO_DATE_RE, US_DATE_RE, LONG_DATE_RE):
+        for match in pattern.findall(residual):
+            parsed = parse_date(match)
+            if parsed and parsed not in dates:
+                dates.append(parsed)
+    if dates:
+        facts.setdefault("DATES", dates)
+
+    for match in AMOUNT_RE.finditer(residual):
+        if match.group("symbol"):
+            amount = _parse_number(match.group("num"), match.group("k"))
+            currency = CURRENCY_SYMBOLS[match.group("symbol")]
+        else:
+            amount = _parse_number(match.group("num2"), match.group("k2"))
+            currency = CURRENCY_WORDS[match.group("word").lower()]
+        rest = residual[match.end():]
+        key = "HOURLY_RATE" if HOURLY_RE.match(rest) else "MONTHLY_FEE" if MONTHLY_RE.match(rest) else "TOTAL_AMOUNT"
+        facts.setdefault(key, amount)
+        facts.setdefault("CURRENCY", currency)
+
+    net = NET_DAYS_RE.search(residual)
+    if net:
+        facts.setdefault("PAYMENT_TERMS_DAYS", int(net.group(1) or net.group(2)))
+    late_fee = LATE_FEE_RE.search(residual)
+    if late_fee:
+        facts.setdefault("LATE_FEE_PERCENT", float(late_fee.group(1)))
+
+    for pattern in (EMAIL_RE, ISO_DATE_RE, US_DATE_RE, LONG_DATE_RE, AMOUNT_RE, NET_DAYS_RE, LATE_FEE_RE):
+        residual = pattern.sub(" ", residual)
+    return facts, residual.strip()
+
+def needs_llm(residual: str, min_words: int = 3) -> bool:
+    """True when the text left after local extraction still looks like free-form content."""
+    words = [w for w in WORD_RE.findall(residual) if w.lower() not in FILLER_WORDS]
+    return len(words) >= min_words
+
+def load_facts(value: Any) -> Dict[str, Any]:
+    """key_info as a dict (older checkpoints stored it as a raw JSON string)."""
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, str) and value.strip():
+        try:
+            loaded = json.loads(value)
+            return loaded if isinstance(loaded, dict) else {}
+        except json.JSONDecodeError:
+            return {}
+    return {}
+
+def merge_facts(existing: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    merged = dict(existing)
+    for key, value in new.items():
+        if value in (None, "", [], {}):
+            continue
+        if isinstance(value, list) and isinstance(merged.get(key), list):
+            merged[key] = merged[key] + [v for v in value if v not in merged[key]]
+        else:
+            merged[key] = value
+    return merged
+
+def format_facts(facts: Any) -> str:
+    return json.dumps(load_facts(facts), indent=2, ensure_ascii=False) if facts else ""
+
+if __name__ == "__main__":
+    print(extract_local_facts("[CLIENT_NAME]Acme Corp [DATE]2025-01-01"))
+    print(extract_local_facts("Website for jane@acme.com, $5,000 total, $80/hr extra, Net 30, 1.5% per month late, starts March 3, 2025"))
+    print(needs_llm(extract_local_facts("Draft a contract for web design for Acme")[1]))
@@ -0,0 +1,278 @@
+import os
+import re
+import json
+import time
+import hashlib
+import random
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional
+import httpx
+import openai
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from dotenv import load_dotenv
+from tools.model_config import ModelConfig, load_model_config
+from tools.turn_budget import TurnBudget, current_budget
+
+load_dotenv()
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+# A 429 for an exhausted quota or billing limit: retrying cannot succeed
+FATAL_RATE_LIMIT_CODES = ("insufficient_quota", "billing_hard_limit_reached")
+DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+
+def parse_reset(value: Optional[str]) -> float:
+    """OpenAI reset headers look like '1s', '6m0s' or '250ms'. Returns seconds."""
+    if not value:
+        return 0.0
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(amount) * units[unit] for amount, unit in DURATION_RE.findall(value))
+
+class TokenBucket:
+    """Client-side limiter kept in sync with the provider's x-ratelimit-* headers."""
+
+    def __init__(self):
+        self.capacity: Optional[float] = None  # unknown until the first response
+        self.tokens = 0.0
+        self.rate = 0.0
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        if self.capacity is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1.0):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self.blocked_until - now
+                if wait <= 0:
+                    if self.capacity is None or self.tokens >= min(amount, self.capacity):
+                        if self.capacity is not None:
+                            self.tokens -= amount
+                        return
+                    wait = (min(amount, self.capacity) - self.tokens) / self.rate if self.rate else 1.0
+            time.sleep(min(wait, 5.0))
+
+    def sync(self, limit: Optional[str], remaining: Optional[str], reset: Optional[str]):
+        if limit is None or remaining is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.capacity = float(limit)
+            self.rate = self.capacity / 60.0  # limits are per minute
+            self.tokens = float(remaining)  # the provider's count is authoritative
+            if float(remaining) <= 0:
+                self.blocked_until = now + parse_reset(reset)
+
+    def block_for(self, seconds: float):
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+class GatedChatModel(Runnable):
+    """A chat model Runnable whose calls go through the gateway (concurrency, rate limits, retries)."""
+
+    def __init__(self, gateway: "LLMGateway", node: str, model: Runnable, model_name: str, tier: str):
+        self.gateway = gateway
+        self.node = node
+        self.model = model
+        self.model_name = model_name
+        self.tier = tier
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return self.gateway.call(self, input, config, **kwargs)
+
+    def with_structured_output(self, schema, **kwargs) -> "GatedChatModel":
+        return GatedChatModel(self.gateway, self.node, self.model.with_structured_output(schema, **kwargs),
+                              self.model_name, self.tier)
+
+class GatedEmbeddings(Embeddings):
+    """Embedding client whose requests share the chat models' concurrency limit, rate limits and retries."""
+
+    def __init__(self, gateway: "LLMGateway", model: OpenAIEmbeddings):
+        self.gateway = gateway
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.gateway.run("embeddings", sum(len(t) for t in texts) // 4, self.model.embed_documents, texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.gateway.run("embeddings", len(text) // 4, self.model.embed_query, text)
+
+class LLMGateway:
+    def __init__(self, max_concurrency: Optional[int] = None, max_retries: Optional[int] = None,
+                 config: Optional[ModelConfig] = None):
+        self.max_concurrency = max_concurrency or int(os.getenv("LEXIS_LLM_MAX_CONCURRENCY", "8"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("LEXIS_LLM_MAX_RETRIES", "4"))
+        self.config = config or load_model_config()
+        self.fixtures_path = os.getenv("LEXIS_RECORD_FIXTURES")
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrency)
+        self.request_bucket = TokenBucket()
+        self.token_bucket = TokenBucket()
+
+        # One pooled HTTP client for every chat model and embedding client in the process
+        limits = httpx.Limits(max_connections=self.max_concurrency * 2, max_keepalive_connections=self.max_concurrency)
+        self.http_client = httpx.Client(limits=limits, timeout=httpx.Timeout(120.0, connect=10.0))
+        self.http_async_client = httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(120.0, connect=10.0))
+        # Calls made under a turn budget run here so the caller can stop waiting when the turn is cancelled
+        self._call_pool = ThreadPoolExecutor(max_workers=self.max_concurrency * 2, thread_name_prefix="llm")
+        self._chat_models: Dict[tuple, ChatOpenAI] = {}
+        self._embeddings: Optional[GatedEmbeddings] = None
+        self._lock = threading.Lock()
+
+    def model_for(self, node: str) -> str:
+        # A per-node environment override wins over the preset
+        return os.getenv(f"LEXIS_MODEL_{node.upper()}") or self.config.model_for(node)
+
+    def _chat_model(self, model: str, temperature: float, max_tokens: Optional[int], timeout: float) -> ChatOpenAI:
+        key = (model, temperature, max_tokens, timeout)
+        with self._lock:
+            if key not in self._chat_models:
+                self._chat_models[key] = ChatOpenAI(
+                    model=model,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    timeout=timeout,
+                    max_retries=0,  # retries are handled by the gateway
+                    include_response_headers=True,
+                    http_client=self.http_client,
+                    http_async_client=self.http_async_client,
+                )
+            return self._chat_models[key]
+
+    def chat(self, node: str, temperature: float = 0) -> GatedChatModel:
+        """Chat model for a graph node; model tier, max tokens and timeout come from the model config."""
+        node_config = self.config.for_node(node)
+        model = self.model_for(node)
+        return GatedChatModel(self, node, self._chat_model(model, temperature, node_config.max_tokens, node_config.timeout),
+                              model, node_config.tier)
+
+    def embeddings(self) -> GatedEmbeddings:
+        with self._lock:
+            if self._embeddings is None:
+                model = OpenAIEmbeddings(http_client=self.http_client, http_async_client=self.http_async_client,
+                                         max_retries=0)  # retries are handled by the gateway
+                self._embeddings = GatedEmbeddings(self, model)
+            return self._embeddings
+
+    def _estimate_tokens(self, input: Any) -> int:
+        return max(len(str(input)) // 4, 1)
+
+    def _sync_limits(self, result: Any):
+        headers = getattr(result, "response_metadata", {}).get("headers") if hasattr(result, "response_metadata") else None
+        if not headers:
+            return
+        self.request_bucket.sync(headers.get("x-ratelimit-limit-requests"), headers.get("x-ratelimit-remaining-requests"),
+                                 headers.get("x-ratelimit-reset-requests"))
+        self.token_bucket.sync(headers.get("x-ratelimit-limit-tokens"), headers.get("x-ratelimit-remaining-tokens"),
+                               headers.get("x-ratelimit-reset-tokens"))
+
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        # Exponential backoff with full jitter
+        return random.uniform(0, min(30.0, 0.5 * 2 ** attempt))
+
+    def _record_fixture(self, gated: GatedChatModel, input: Any, result: Any, latency_ms: float):
+        # Recorded calls feed the offline evaluation in tools/model_config.py
+        output = result.content if hasattr(result, "content") else (
+            result.model_dump_json() if hasattr(result, "model_dump_json") else str(result))
+        record = {
+            "node": gated.node,
+            "tier": gated.tier,
+            "model": gated.model_name,
+            "prompt_hash": hashlib.sha256(str(input).encode("utf-8")).hexdigest(),
+            "latency_ms": round(latency_ms, 1),
+            "output": output,
+            "timestamp": time.time(),
+        }
+        with self._lock:
+            with open(self.fixtures_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+    def _invoke(self, func: Callable[..., Any], budget: Optional[TurnBudget], *args, **kwargs) -> Any:
+        """Run func on a concurrency slot the caller acquired; the slot is freed when the request ends."""
+        if budget is None:
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._semaphore.release()
+        try:
+            future = self._call_pool.submit(contextvars.copy_context().run, func, *args, **kwargs)
+        except BaseException:
+            self._semaphore.release()
+            raise
+        # Released by the request itself (or its cancellation), not by this waiter: an abandoned request keeps
+        # its connection busy until it finishes, so it keeps counting against the limit
+        future.add_done_callback(lambda _: self._semaphore.release())
+        while True:
+            try:
+                return future.result(timeout=min(0.25, max(budget.remaining(), 0.01)))
+            except FutureTimeout:
+                try:
+                    budget.check()
+                except BaseException:
+                    # The abandoned request finishes in the background and its result is dropped
+                    future.cancel()
+                    raise
+
+    def call(self, gated: GatedChatModel, input: Any, config: Optional[RunnableConfig] = None, **kwargs) -> Any:
+        def invoke() -> Any:
+            start = time.perf_counter()
+            result = gated.model.invoke(input, config, **kwargs)
+            if self.fixtures_path:
+                self._record_fixture(gated, input, result, (time.perf_counter() - start) * 1000)
+            return result
+        return self.run(gated.node, self._estimate_tokens(input), invoke)
+
+    def run(self, node: str, tokens: int, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run one provider request under the concurrency limit, rate limits, retries and the turn budget."""
+        budget = current_budget()
+        attempt = 0
+        while True:
+            if budget is not None:
+                budget.check()
+            self.request_bucket.acquire(1)
+            self.token_bucket.acquire(max(tokens, 1))
+            self._semaphore.acquire()
+            try:
+                result = self._invoke(func, budget, *args, **kwargs)
+                self._sync_limits(result)
+                return result
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries or getattr(e, "code", None) in FATAL_RATE_LIMIT_CODES:
+                    raise
+                delay = self._retry_delay(attempt, e)
+                error_name = e.__class__.__name__
+                if isinstance(e, openai.RateLimitError):
+                    # Every caller backs off, not just this one
+                    self.request_bucket.block_for(delay)
+            print(f"LLM call for {node} failed ({error_name}), retrying in {delay:.1f}s")
+            if budget is not None:
+                budget.wait(delay)
+            else:
+                time.sleep(delay)
+            attempt += 1
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+def get_gateway() -> LLMGateway:
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
@@ -0,0 +1,260 @@
+import os
+import sys
+import time
+import uuid
+import shutil
+import sqlite3
+import datetime
+from collections import defaultdict
+from typing import Dict, List, Optional
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+from tools.llm_gateway import get_gateway
+from tools.memory_store import MemoryStore
+
+PER_SESSION_CAP = int(os.getenv("LEXIS_MEMORY_SESSION_CAP", "200"))
+GLOBAL_CAP = int(os.getenv("LEXIS_MEMORY_GLOBAL_CAP", "5000"))
+MAX_AGE_DAYS = int(os.getenv("LEXIS_MEMORY_MAX_AGE_DAYS", "180"))
+# Chroma deletes only tombstone vectors in the HNSW files; rebuild once this share of the collection was removed
+REBUILD_FRACTION = float(os.getenv("LEXIS_MEMORY_REBUILD_FRACTION", "0.25"))
+SYNC_PAGE = 500
+KEEP_RECENT = 40  # turns left verbatim when a session is rolled up
+SUMMARY_CHUNK_CHARS = 12000
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_template(
+    "Summarize this part of a conversation between a freelancer and Lexis, a legal assistant. "
+    "Keep names, amounts, dates, contract decisions and open questions; drop greetings and filler. "
+    "Write at most 10 short bullet points.\n\n{transcript}"
+)
+
+class MemoryRetention:
+    """Roll-up, eviction and compaction for the conversation_history collection."""
+
+    def __init__(self, memory_store: Optional[MemoryStore] = None, per_session_cap: int = PER_SESSION_CAP,
+                 global_cap: int = GLOBAL_CAP, max_age_days: int = MAX_AGE_DAYS, keep_recent: int = KEEP_RECENT,
+                 rebuild_fraction: float = REBUILD_FRACTION):
+        self.memory_store = memory_store or MemoryStore()
+        self.collection = self.memory_store.vector_store._collection
+        self.per_session_cap = per_session_cap
+        self.global_cap = global_cap
+        self.max_age_days = max_age_days
+        self.keep_recent = min(keep_recent, per_session_cap - 1)
+        self.rebuild_fraction = rebuild_fraction
+        self.llm = get_gateway().chat("summarizer")
+
+    def _records(self, page: int = 1000) -> List[Dict]:
+        records, offset = [], 0
+        while True:
+            batch = self.collection.get(include=["metadatas"], limit=page, offset=offset)
+            records.extend({"id": i, "metadata": m or {}} for i, m in zip(batch["ids"], batch["metadatas"]))
+            if len(batch["ids"]) < page:
+                return records
+            offset += page
+
+    def _sessions(self) -> Dict[str, List[Dict]]:
+        sessions = defaultdict(list)
+        for record in self._records():
+            sessions[record["metadata"].get("session_id", "default")].append(record)
+        for records in sessions.values():
+            records.sort(key=lambda r: r["metadata"].get("timestamp", ""))
+        return sessions
+
+    def _summarize(self, records: List[Dict]) -> str:
+        lines = [f"{r['metadata'].get('role', 'unknown')}: {r['content']}" for r in records]
+        chunks, current = [], ""
+        for line in lines:
+            if current and len(current) + len(line) > SUMMARY_CHUNK_CHARS:
+                chunks.append(current)
+                current = ""
+            current += line[:SUMMARY_CHUNK_CHARS] + "\n"
+        chunks.append(current)
+        chain = SUMMARY_PROMPT | self.llm | StrOutputParser()
+        return "\n".join(chain.batch([{"transcript": chunk} for chunk in chunks]))
+
+    def roll_up(self, session_id: str, records: List[Dict]) -> int:
+        """Replace all but the most recent turns of a session with one summary record. Returns records removed."""
+        if len(records) <= self.per_session_cap:
+            return 0
+        old_ids = [r["id"] for r in records[:len(records) - self.keep_recent]]
+        batch = self.collection.get(ids=old_ids, include=["metadatas", "documents"])
+        old = sorted(({"id": i, "metadata": m or {}, "content": d} for i, m, d in
+                      zip(batch["ids"], batch["metadatas"], batch["documents"])),
+                     key=lambda r: r["metadata"].get("timestamp", ""))
+        try:
+            summary = self._summarize(old)
+            embedding = self.memory_store.embed(summary)
+        except Exception as e:
+            # Nothing is deleted unless the summary was written
+            print(f"⚠️ Could not summarize session {session_id}: {e}")
+            return 0
+
+        summarized = sum(int(r["metadata"].get("summarized_count", 1)) for r in old)
+        self.collection.upsert(
+            ids=[str(uuid.uuid4())],
+            embeddings=[embedding],
+            documents=[summary],
+            # The summary takes the timestamp of the last turn it covers so it sorts before the kept turns
+            metadatas=[{"role": "summary", "session_id": session_id, "summarized_count": summarized,
+                        "timestamp": old[-1]["metadata"].get("timestamp", "")}],
+        )
+        self.collection.delete(ids=old_ids)
+        print(f"Session {session_id}: rolled {len(old_ids)} records ({summarized} turns) into a summary")
+        return len(old_ids) - 1
+
+    def evict(self, sessions: Dict[str, List[Dict]]) -> int:
+        """Drop expired sessions, then least recently active sessions until under the global cap."""
+        cutoff = (datetime.datetime.now() - datetime.timedelta(days=self.max_age_days)).isoformat()
+        by_activity = sorted(sessions.items(), key=lambda item: item[1][-1]["metadata"].get("timestamp", ""))
+        total = sum(len(records) for records in sessions.values())
+        removed = 0
+        for session_id, records in by_activity:
+            expired = records[-1]["metadata"].get("timestamp", "") < cutoff
+            if not expired and total - removed <= self.global_cap:
+                break
+            self.collection.delete(ids=[r["id"] for r in records])
+            removed += len(records)
+            reason = "expired" if expired else "global cap"
+            print(f"Session {session_id}: evicted {len(records)} records ({reason})")
+        return removed
+
+    def _disk_usage(self) -> int:
+        total = 0
+        for root, _, files in os.walk(self.memory_store.persist_directory):
+            total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+        return total
+
+    def _segment_dirs(self, collection_id) -> List[str]:
+        path = os.path.join(self.memory_store.persist_directory, "chroma.sqlite3")
+        with sqlite3.connect(path, timeout=30) as conn:
+            rows = conn.execute("SELECT id FROM segments WHERE collection = ?", (str(collection_id),)).fetchall()
+        return [os.path.join(self.memory_store.persist_directory, row[0]) for row in rows]
+
+    def _ids(self, collection, page: int = SYNC_PAGE) -> List[str]:
+        ids, offset = [], 0
+        while True:
+            batch = collection.get(include=[], limit=page, offset=offset)
+            ids.extend(batch["ids"])
+            if len(batch["ids"]) < page:
+                return ids
+            offset += page
+
+    def _copy(self, source, target, ids: Optional[List[str]] = None, page: int = SYNC_PAGE) -> int:
+        """Copy every record (or just the given ids) from source to target."""
+        copied, offset = 0, 0
+        while True:
+            if ids is None:
+                batch = source.get(include=["embeddings", "documents", "metadatas"], limit=page, offset=offset)
+            else:
+                batch = source.get(ids=ids[offset:offset + page], include=["embeddings", "documents", "metadatas"])
+            if batch["ids"]:
+                target.add(ids=batch["ids"], embeddings=batch["embeddings"],
+                           documents=batch["documents"], metadatas=batch["metadatas"])
+                copied += len(batch["ids"])
+            offset += page
+            if (ids is None and len(batch["ids"]) < page) or (ids is not None and offset >= len(ids)):
+                return copied
+
+    def _scratch_name(self) -> str:
+        return f"{self.collection.name}_rebuild"
+
+    def recover(self):
+        """Finish a rebuild that was interrupted: copy back whatever the live collection is missing."""
+        client = self.memory_store.vector_store._client
+        try:
+            scratch = client.get_collection(self._scratch_name())
+        except Exception:
+            return
+        live = set(self._ids(self.collection))
+        missing = [doc_id for doc_id in self._ids(scratch) if doc_id not in live]
+        if missing:
+            print(f"Restoring {self._copy(scratch, self.collection, ids=missing)} records from an interrupted rebuild")
+        # The scratch copy goes only once everything in it is live again
+        live = set(self._ids(self.collection))
+        if all(doc_id in live for doc_id in self._ids(scratch)):
+            client.delete_collection(scratch.name)
+        else:
+            print("⚠️ Interrupted rebuild not fully restored; keeping the scratch collection for the next run")
+
+    def rebuild(self) -> bool:
+        """Copy the surviving records into a fresh collection and swap it in, dropping deleted vectors from HNSW."""
+        # A CLI or daemon with its own store would keep writing to the dropped collection and reading its
+        # segment files, so the swap only happens when this is the only open store
+        if not self.memory_store.try_exclusive():
+            print("Rebuild skipped: another Lexis process has the memory store open; HNSW files not compacted")
+            return False
+        try:
+            client = self.memory_store.vector_store._client
+            with self.memory_store._flush_lock:
+                scratch = client.create_collection(self._scratch_name(), metadata=self.collection.metadata)
+                survivors = self._copy(self.collection, scratch)
+                if survivors != self.collection.count():
+                    print(f"⚠️ Rebuild skipped: copied {survivors} of {self.collection.count()} records")
+                    client.delete_collection(scratch.name)
+                    return False
+                # Chroma drops the segment rows but leaves their directories on disk
+                stale = self._segment_dirs(self.collection.id) + self._segment_dirs(scratch.id)
+                self.memory_store.vector_store.reset_collection()
+                self.memory_store.reopen()
+                self.collection = self.memory_store.vector_store._collection
+                self._copy(scratch, self.collection)
+                client.delete_collection(scratch.name)
+            for path in stale:
+                shutil.rmtree(path, ignore_errors=True)
+        finally:
+            self.memory_store.release_exclusive()
+        print(f"Rebuilt conversation_history with {survivors} records")
+        return True
+
+    def vacuum(self) -> int:
+        """Reclaim space in chroma.sqlite3 after deletes. Returns bytes freed."""
+        path = os.path.join(self.memory_store.persist_directory, "chroma.sqlite3")
+        before = os.path.getsize(path)
+        try:
+            with sqlite3.connect(path, timeout=30) as conn:
+                conn.execute("VACUUM")
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ VACUUM skipped: {e}")
+        return before - os.path.getsize(path)
+
+    def query_latency_ms(self, session_id: str, runs: int = 5) -> float:
+        vector = self.memory_store.embed("payment terms and deadlines")
+        start = time.perf_counter()
+        for _ in range(runs):
+            self.memory_store.get_context("", session_id=session_id, query_embedding=vector)
+        return (time.perf_counter() - start) * 1000 / runs
+
+    def run(self) -> Dict:
+        self.memory_store.flush()
+        self.recover()
+        sessions = self._sessions()
+        before = sum(len(records) for records in sessions.values())
+        disk_before = self._disk_usage()
+
+        rolled = sum(self.roll_up(session_id, records) for session_id, records in sessions.items())
+        evicted = self.evict(self._sessions())
+        removed = before - self.collection.count()
+        rebuilt = bool(before) and removed >= before * self.rebuild_fraction and self.rebuild()
+        if removed and not rebuilt:
+            print(f"Removed {removed} of {before} records; HNSW files keep the deleted vectors until a rebuild "
+                  f"(threshold {self.rebuild_fraction:.0%})")
+        self.vacuum()
+
+        report = {
+            "sessions": len(sessions),
+            "records_before": before,
+            "records_after": self.collection.count(),
+            "rolled_up": rolled,
+            "evicted": evicted,
+            "hnsw_rebuilt": rebuilt,
+            "bytes_freed": disk_before - self._disk_usage(),
+        }
+        print(f"Memory maintenance: {report}")
+        return report
+
+if __name__ == "__main__":
+    # Maintenance command: python -m tools.memory_retention [--latency SESSION_ID]
+    retention = MemoryRetention()
+    if len(sys.argv) > 2 and sys.argv[1] == "--latency":
+        print(f"get_context: {retention.query_latency_ms(sys.argv[2]):.1f} ms")
+    else:
+        retention.run()
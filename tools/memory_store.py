@@ -1,27 +1,78 @@
 import os
+import uuid
+import fcntl
+import atexit
 import datetime
-from typing import List, Optional
+import threading
+from typing import List, Optional, Tuple
 from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
+from tools.llm_gateway import get_gateway
+from tools.content_cache import CACHE_DIR
 from langchain_core.documents import Document
 from dotenv import load_dotenv
 
 load_dotenv()
 
 class MemoryStore:
-    def __init__(self):
+    """Conversation memory with write-behind persistence.
+
+    Messages are queued and written by a background thread in batches (one embedding request and
+    one Chroma upsert per batch), flushed when the batch fills, every flush_interval seconds and at exit.
+    Messages queued with a precomputed embedding are stored with that vector instead of being re-embedded.
+    """
+
+    def __init__(self, batch_size: Optional[int] = None, flush_interval: Optional[float] = None):
         self.persist_directory = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "vector_db")
         os.makedirs(self.persist_directory, exist_ok=True)
         
-        self.embeddings = OpenAIEmbeddings()
+        # Every open store holds this lock shared (across processes); maintenance that swaps the collection
+        # needs it exclusively, so it never pulls the collection out from under a running CLI or daemon
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        self._open_lock = open(os.path.join(CACHE_DIR, "memory_store.lock"), "a")
+        fcntl.flock(self._open_lock, fcntl.LOCK_SH)
+
+        self.embeddings = get_gateway().embeddings()
+        self.reopen()
+
+        self.batch_size = batch_size or int(os.getenv("LEXIS_MEMORY_BATCH_SIZE", "32"))
+        self.flush_interval = flush_interval or float(os.getenv("LEXIS_MEMORY_FLUSH_INTERVAL", "2.0"))
+        self._pending: List[Tuple[Document, Optional[List[float]]]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name="memory-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def reopen(self):
+        """Open the collection by name (again, after maintenance replaced it)."""
         self.vector_store = Chroma(
-            persist_directory=self.persist_directory, 
+            persist_directory=self.persist_directory,
             embedding_function=self.embeddings,
             collection_name="conversation_history"
         )
 
-    def add_message(self, role: str, content: str, session_id: str = "default"):
-        """Save a message to the memory store."""
+    def try_exclusive(self) -> bool:
+        """Become the only open store in any process; False (still shared) while another one is open."""
+        try:
+            fcntl.flock(self._open_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            # Converting the lock may have dropped the shared one
+            fcntl.flock(self._open_lock, fcntl.LOCK_SH)
+            return False
+
+    def release_exclusive(self):
+        fcntl.flock(self._open_lock, fcntl.LOCK_SH)
+
+    def embed(self, text: str) -> List[float]:
+        """Embed a message once so the vector can serve both the context query and the stored record."""
+        return self.embeddings.embed_query(text)
+
+    def add_message(self, role: str, content: str, session_id: str = "default",
+                    embedding: Optional[List[float]] = None):
+        """Queue a message for the memory store; returns without waiting for the write."""
         timestamp = datetime.datetime.now().isoformat()
         doc = Document(
             page_content=content,
@@ -31,20 +82,83 @@ class MemoryStore:
                 "session_id": session_id
             }
         )
-        self.vector_store.add_documents([doc])
-        # print(f"Saved {role} message to memory (session: {session_id}).")
+        with self._lock:
+            self._pending.append((doc, embedding))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def _write_loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Write every queued message in one batch. Returns the number written."""
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._pending)
+            if not batch:
+                return 0
+            docs = [doc for doc, _ in batch]
+            vectors = [vector for _, vector in batch]
+            try:
+                missing = [i for i, vector in enumerate(vectors) if vector is None]
+                if missing:
+                    for i, vector in zip(missing, self.embeddings.embed_documents([docs[i].page_content for i in missing])):
+                        vectors[i] = vector
+                self.vector_store._collection.upsert(
+                    ids=[str(uuid.uuid4()) for _ in docs],
+                    embeddings=vectors,
+                    documents=[doc.page_content for doc in docs],
+                    metadatas=[doc.metadata for doc in docs],
+                )
+            except Exception as e:
+                # Keep the batch queued; the next flush retries it
+                print(f"⚠️ Memory flush failed ({e}); {len(batch)} message(s) kept for retry")
+                return 0
+            with self._lock:
+                # Only flush() removes messages, so the batch is still at the front of the queue
+                del self._pending[:len(batch)]
+            return len(batch)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._writer.join(timeout=5)
+        self.flush()
+        self._open_lock.close()
+
+    def _pending_messages(self, session_id: str) -> List[str]:
+        with self._lock:
+            docs = [doc for doc, _ in self._pending if doc.metadata.get("session_id") == session_id]
+        return [f"{doc.metadata.get('role', 'unknown')}: {doc.page_content}" for doc in reversed(docs)]
+
+    def get_context(self, query: str, session_id: str = "default", k: int = 5,
+                    query_embedding: Optional[List[float]] = None) -> List[str]:
+        """Retrieve relevant past messages based on a query (or its precomputed embedding) and session ID."""
+        # Unflushed messages are the most recent in the session, so they come first
+        context = self._pending_messages(session_id)[:k]
 
-    def get_context(self, query: str, session_id: str = "default", k: int = 5) -> List[str]:
-        """Retrieve relevant past messages based on a query and session ID."""
         # Filter by session_id
         filter_dict = {"session_id": session_id}
         
-        results = self.vector_store.similarity_search(
-            query, 
-            k=k,
-            filter=filter_dict
-        )
-        return [f"{doc.metadata.get('role', 'unknown')}: {doc.page_content}" for doc in results]
+        if query_embedding is not None:
+            results = self.vector_store.similarity_search_by_vector(query_embedding, k=k, filter=filter_dict)
+        else:
+            results = self.vector_store.similarity_search(
+                query, 
+                k=k,
+                filter=filter_dict
+            )
+        for doc in results:
+            line = f"{doc.metadata.get('role', 'unknown')}: {doc.page_content}"
+            if len(context) < k and line not in context:
+                context.append(line)
+        return context
 
     def get_recent_messages(self, session_id: str = "default", k: int = 5) -> List[str]:
         """Get the most recent messages for a session."""
@@ -55,5 +169,6 @@ if __name__ == "__main__":
     memory.add_message("user", "I need a contract for web design.")
     memory.add_message("assistant", "I can help with that. What are the payment terms?")
     
-    print("Context for 'payment':")
+    print("Context for 'payment' (before flush):")
     print(memory.get_context("payment"))
+    print(f"Flushed {memory.flush()} message(s)")
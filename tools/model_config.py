@@ -0,0 +1,137 @@
+import os
+import sys
+import json
+import statistics
+from collections import defaultdict
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "model_config.json")
+
+# Nodes whose output is a Pass/Fail verdict; used for agreement scoring
+VALIDATION_NODES = ["consistency_checker", "enforceability_scan", "payment_check", "ip_ownership_check"]
+
+class NodeModelConfig(BaseModel):
+    tier: str = "strong"
+    max_tokens: Optional[int] = None
+    timeout: float = 120.0
+
+class ModelConfig(BaseModel):
+    preset: str = "balanced"
+    tiers: Dict[str, str] = {"fast": "gpt-4o-mini", "strong": "gpt-4o"}
+    nodes: Dict[str, NodeModelConfig] = {}
+
+    def for_node(self, node: str) -> NodeModelConfig:
+        return self.nodes.get(node, NodeModelConfig())
+
+    def model_for(self, node: str) -> str:
+        tier = self.for_node(node).tier
+        return self.tiers.get(tier, tier)  # an unknown tier is taken as a literal model name
+
+def _nodes(fast: List[str], strong: List[str], **overrides) -> Dict[str, NodeModelConfig]:
+    nodes = {node: NodeModelConfig(tier="fast", timeout=30.0) for node in fast}
+    nodes.update({node: NodeModelConfig(tier="strong") for node in strong})
+    for node, values in overrides.items():
+        nodes[node] = nodes.get(node, NodeModelConfig()).model_copy(update=values)
+    return nodes
+
+PRESETS = {
+    # Everything on the strong model (the original behaviour)
+    "quality": _nodes(
+        fast=[],
+        strong=["router", "general_assistant", "feedback", "research_plan", "fact_extractor", "synthesizer",
+                "contract_writer", "section_writer", "consistency_checker", "self_correction", "deadline_extractor",
+                "impact_analyzer", "counterproposal_generator", "summarizer"] + VALIDATION_NODES,
+    ),
+    # Trivial classification/summary nodes on the fast tier; drafting and validation stay strong
+    "balanced": _nodes(
+        fast=["router", "general_assistant", "feedback", "research_plan", "fact_extractor", "deadline_extractor",
+              "summarizer"],
+        strong=["synthesizer", "contract_writer", "section_writer", "consistency_checker", "self_correction",
+                "impact_analyzer", "counterproposal_generator"] + VALIDATION_NODES,
+        router={"max_tokens": 5},
+        feedback={"max_tokens": 300},
+    ),
+    # Only the nodes that write contract text stay on the strong tier
+    "latency": _nodes(
+        fast=["router", "general_assistant", "feedback", "research_plan", "fact_extractor", "deadline_extractor",
+              "synthesizer", "consistency_checker", "impact_analyzer", "summarizer"] + VALIDATION_NODES,
+        strong=["contract_writer", "section_writer", "self_correction", "counterproposal_generator"],
+        router={"max_tokens": 5},
+        feedback={"max_tokens": 200},
+        research_plan={"max_tokens": 400},
+        synthesizer={"max_tokens": 1200},
+    ),
+}
+
+def load_model_config(preset: Optional[str] = None, path: str = CONFIG_PATH) -> ModelConfig:
+    """Preset from LEXIS_MODEL_PRESET (default 'balanced'), then overrides from data/model_config.json."""
+    overrides = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            overrides = json.load(f)
+    preset = preset or os.getenv("LEXIS_MODEL_PRESET") or overrides.get("preset") or "balanced"
+    if preset not in PRESETS:
+        print(f"Unknown model preset '{preset}', using 'balanced'")
+        preset = "balanced"
+
+    config = ModelConfig(preset=preset, nodes={k: v.model_copy() for k, v in PRESETS[preset].items()})
+    config.tiers.update(overrides.get("tiers", {}))
+    for node, values in overrides.get("nodes", {}).items():
+        config.nodes[node] = config.for_node(node).model_copy(update=values)
+    return config
+
+def _verdict(output: str) -> str:
+    return "pass" if (output or "").strip().strip("'\"*`").lower().startswith("pass") else "fail"
+
+def evaluate_fixtures(path: str, preset: Optional[str] = None) -> Dict:
+    """Offline evaluation over recorded gateway calls (LEXIS_RECORD_FIXTURES).
+
+    Reports per-node latency per tier, fast-vs-strong verdict agreement on validation nodes for
+    prompts recorded under both tiers, and the expected per-node latency under a preset.
+    """
+    latencies = defaultdict(lambda: defaultdict(list))
+    verdicts = defaultdict(dict)  # (node, prompt_hash) -> {tier: verdict}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            latencies[record["node"]][record["tier"]].append(record["latency_ms"])
+            if record["node"] in VALIDATION_NODES:
+                verdicts[(record["node"], record["prompt_hash"])][record["tier"]] = _verdict(record["output"])
+
+    report = {"latency_ms": {}, "agreement": {}, "preset": {}}
+    for node, tiers in latencies.items():
+        report["latency_ms"][node] = {
+            tier: {"n": len(values), "p50": round(statistics.median(values), 1),
+                   "p95": round(sorted(values)[max(int(len(values) * 0.95) - 1, 0)], 1)}
+            for tier, values in tiers.items()
+        }
+
+    paired = defaultdict(list)
+    for (node, _), by_tier in verdicts.items():
+        if "fast" in by_tier and "strong" in by_tier:
+            paired[node].append(by_tier["fast"] == by_tier["strong"])
+    report["agreement"] = {node: {"pairs": len(v), "rate": round(sum(v) / len(v), 3)} for node, v in paired.items()}
+
+    config = load_model_config(preset)
+    total = 0.0
+    for node, tiers in report["latency_ms"].items():
+        tier = config.for_node(node).tier
+        if tier in tiers:
+            report["preset"][node] = {"tier": tier, "p50": tiers[tier]["p50"]}
+            total += tiers[tier]["p50"]
+    report["preset_name"] = config.preset
+    report["preset_total_p50_ms"] = round(total, 1)
+    return report
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "eval":
+        print(json.dumps(evaluate_fixtures(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None), indent=2))
+    else:
+        config = load_model_config()
+        print(f"Preset: {config.preset}")
+        for node in sorted(config.nodes):
+            node_config = config.for_node(node)
+            print(f"  {node:28} {node_config.tier:7} {config.model_for(node):14} max_tokens={node_config.max_tokens} timeout={node_config.timeout}")
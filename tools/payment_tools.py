@@ -1,22 +1,402 @@
-from typing import Dict, List
+import os
+import re
+import sys
+import json
+import time
+import random
+import calendar
+import datetime
+import hashlib
+import tempfile
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+import numpy as np
+from tools.fact_tools import SCALE, SCALE_WORDS, extract_local_facts, load_facts, parse_date
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+SINGLE_PAYMENT = ["Full payment"]  # a total without milestones is billed once, on the start date
+DEFAULT_NET_DAYS = 30
+REMINDER_DAYS = 3
+# Currencies without cents; everything else is billed in hundredths
+MINOR_DIGITS = {"JPY": 0, "KRW": 0}
+RECURRING_KEYS = ("MONTHLY_FEE", "MONTHLY_RETAINER", "RECURRING_AMOUNT")
+# Facts the rule-based extractor reads reliably from a contract's text
+PAYMENT_TEXT_FACTS = ("TOTAL_AMOUNT", "MONTHLY_FEE", "CURRENCY", "PAYMENT_TERMS_DAYS", "LATE_FEE_PERCENT")
+NUMBER_RE = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s?(" + SCALE + r")?", re.IGNORECASE)
+
+# All money is integer minor units (cents) and every division rounds half up, so the per-contract path and
+# the numpy batch path produce identical schedules.
+
+def _digits(currency: str) -> int:
+    return MINOR_DIGITS.get(currency, 2)
+
+def to_minor(amount: Any, currency: str = "USD") -> int:
+    return int((Decimal(str(amount)) * 10 ** _digits(currency)).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def from_minor(units: int, currency: str = "USD") -> str:
+    digits, units = _digits(currency), int(units)
+    if not digits:
+        return str(units)
+    whole, fraction = divmod(abs(units), 10 ** digits)
+    return f"{'-' if units < 0 else ''}{whole}.{fraction:0{digits}d}"
+
+def _div_half_up(numerator: int, denominator: int) -> int:
+    return (2 * numerator + denominator) // (2 * denominator)
+
+def _number(value: Any) -> Optional[Decimal]:
+    if isinstance(value, (int, float, Decimal)):
+        return Decimal(str(value))
+    match = NUMBER_RE.search(str(value or ""))
+    if not match:
+        return None
+    # "1.5 million" is 1,500,000, not 1.50
+    return Decimal(match.group(1).replace(",", "")) * SCALE_WORDS.get((match.group(2) or "").lower(), 1)
+
+def _add_months(date: datetime.date, months: int) -> datetime.date:
+    month = date.month - 1 + months
+    year, month = date.year + month // 12, month % 12 + 1
+    return datetime.date(year, month, min(date.day, calendar.monthrange(year, month)[1]))
+
+def payment_terms(facts: Any) -> Optional[Dict[str, Any]]:
+    """Normalize extracted facts into billing terms.
+
+    None when there is no amount, no start date, or no end date to spread several installments over:
+    dates and milestones are never made up.
+    """
+    facts = {str(k).upper(): v for k, v in load_facts(facts).items()}
+    currency = str(facts.get("CURRENCY") or "USD").upper()
+    recurring = next((_number(facts[key]) for key in RECURRING_KEYS if facts.get(key)), None)
+    total = _number(facts.get("TOTAL_AMOUNT"))
+    if recurring is None and total is None:
+        return None
+
+    milestones = facts.get("MILESTONES") or SINGLE_PAYMENT
+    if isinstance(milestones, str):
+        milestones = [label.strip() for label in milestones.split(",") if label.strip()] or SINGLE_PAYMENT
+    weights = facts.get("MILESTONE_PERCENTS") or [1] * len(milestones)
+    if isinstance(weights, str):
+        weights = weights.split(",")
+    # "40%", "33.34" and 40 all become plain numbers before the exact split
+    weights = [_number(w) or 0 for w in weights]
+    if len(weights) != len(milestones):
+        weights = [1] * len(milestones)
+
+    start = parse_date(str(facts.get("START_DATE") or ""))
+    end = parse_date(str(facts.get("END_DATE") or ""))
+    if not start or (not end and (recurring is not None or len(milestones) > 1)):
+        return None
+    start = datetime.date.fromisoformat(start)
+    end = datetime.date.fromisoformat(end) if end else start
+    net_days = _number(facts.get("PAYMENT_TERMS_DAYS"))
+    late_fee = _number(facts.get("LATE_FEE_PERCENT"))
 
-def generate_invoice(amount: float, currency: str = "USD") -> Dict[str, str]:
-    print(f"Generated invoice for {amount} {currency} (Placeholder)")
     return {
-        "invoice_id": "inv_123",
-        "amount": str(amount),
+        "kind": "recurring" if recurring is not None else "milestone",
         "currency": currency,
-        "status": "draft"
+        "amount_minor": to_minor(recurring if recurring is not None else total, currency),
+        "start": start,
+        "end": max(end, start),
+        "net_days": int(net_days) if net_days is not None else DEFAULT_NET_DAYS,
+        # Late fee as basis points per month, so fee arithmetic stays in integers
+        "late_fee_bp": int((late_fee * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP)) if late_fee is not None else 0,
+        "labels": [str(label) for label in milestones],
+        "weights": [int(to_minor(w, "USD")) for w in weights],  # hundredths, so 33.34% stays exact
     }
 
-def generate_payment_schedule(total_amount: float, milestones: List[str]) -> Dict[str, str]:
-    print(f"Generated payment schedule for {total_amount} with milestones {milestones} (Placeholder)")
+def _recurring_count(start: datetime.date, end: datetime.date) -> int:
+    # Monthly invoices dated strictly before the end date
+    months = (end.year - start.year) * 12 + end.month - start.month
+    return max(1, months + (end.day > start.day))
+
+def schedule_from_terms(terms: Dict[str, Any], contract_id: str = "") -> Dict[str, Any]:
+    """Exact schedule for one contract (the reference the batch path is checked against)."""
+    currency, start, end = terms["currency"], terms["start"], terms["end"]
+    if terms["kind"] == "recurring":
+        count = _recurring_count(start, end)
+        labels = [f"Month {i + 1}" for i in range(count)]
+        amounts = [terms["amount_minor"]] * count
+        dates = [_add_months(start, i) for i in range(count)]
+    else:
+        labels, weights = terms["labels"], terms["weights"]
+        total, weight_sum, count = terms["amount_minor"], sum(terms["weights"]) or 1, len(terms["labels"])
+        amounts = [_div_half_up(total * w, weight_sum) for w in weights[:-1]]
+        amounts.append(total - sum(amounts))  # the last milestone absorbs rounding
+        span = (end - start).days
+        dates = [start + datetime.timedelta(days=_div_half_up(i * span, count - 1) if count > 1 else 0)
+                 for i in range(count)]
+
+    installments = []
+    for i, (label, amount, date) in enumerate(zip(labels, amounts, dates)):
+        installments.append({
+            "number": i + 1,
+            "label": label,
+            "invoice_date": date.isoformat(),
+            "due_date": (date + datetime.timedelta(days=terms["net_days"])).isoformat(),
+            "amount": from_minor(amount, currency),
+            "late_fee_per_month": from_minor(_div_half_up(amount * terms["late_fee_bp"], 10000), currency),
+        })
+    digest = hashlib.sha256(json.dumps([contract_id, installments], default=str).encode("utf-8")).hexdigest()
     return {
-        "schedule_id": "sched_123",
-        "total_amount": str(total_amount),
-        "milestones": milestones
+        "schedule_id": f"sched_{digest[:12]}",
+        "contract_id": contract_id,
+        "kind": terms["kind"],
+        "currency": currency,
+        "total_amount": from_minor(sum(amounts), currency),
+        "net_days": terms["net_days"],
+        "late_fee_percent": str(Decimal(terms["late_fee_bp"]) / 100),
+        "installments": installments,
     }
 
+def schedule_from_facts(facts: Any, contract_id: str = "") -> Optional[Dict[str, Any]]:
+    terms = payment_terms(facts)
+    return schedule_from_terms(terms, contract_id) if terms else None
+
+def late_fee(amount: Any, late_fee_percent: Any, days_late: int, currency: str = "USD") -> str:
+    """Fee owed on an overdue amount: the monthly percentage for every started 30 days."""
+    months = -(-max(days_late, 0) // 30)
+    bp = int((Decimal(str(late_fee_percent)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    return from_minor(_div_half_up(to_minor(amount, currency) * bp * months, 10000), currency)
+
+def generate_invoice(amount: float, currency: str = "USD", issue_date: Optional[str] = None,
+                     net_days: int = DEFAULT_NET_DAYS, client: Optional[str] = None,
+                     description: str = "Services") -> Dict[str, str]:
+    issued = datetime.date.fromisoformat(issue_date) if issue_date else datetime.date.today()
+    invoice = {
+        "amount": from_minor(to_minor(amount, currency), currency),
+        "currency": currency,
+        "status": "draft",
+        "issue_date": issued.isoformat(),
+        "due_date": (issued + datetime.timedelta(days=net_days)).isoformat(),
+        "client": client or "",
+        "description": description,
+    }
+    digest = hashlib.sha256(json.dumps(invoice, sort_keys=True).encode("utf-8")).hexdigest()
+    return {"invoice_id": f"inv_{digest[:12]}", **invoice}
+
+def generate_payment_schedule(total_amount: float, milestones: List[str], start_date: Optional[str] = None,
+                              end_date: Optional[str] = None, currency: str = "USD",
+                              net_days: int = DEFAULT_NET_DAYS, late_fee_percent: float = 0) -> Optional[Dict[str, Any]]:
+    """Milestone schedule, or None without an amount, a start date or (for several milestones) an end date."""
+    schedule = schedule_from_facts({
+        "TOTAL_AMOUNT": total_amount, "MILESTONES": milestones, "START_DATE": start_date, "END_DATE": end_date,
+        "CURRENCY": currency, "PAYMENT_TERMS_DAYS": net_days, "LATE_FEE_PERCENT": late_fee_percent,
+    })
+    return {**schedule, "milestones": milestones} if schedule else None
+
+class PortfolioSchedule:
+    """Schedules for many contracts as flat numpy arrays (one row per installment)."""
+
+    def __init__(self, contract_ids: List[str], terms: List[Dict[str, Any]]):
+        self.contract_ids = contract_ids
+        self.terms = terms
+        n = len(terms)
+        kinds = np.array([t["kind"] == "recurring" for t in terms], dtype=bool)
+        starts = np.array([t["start"] for t in terms], dtype="datetime64[D]")
+        ends = np.array([t["end"] for t in terms], dtype="datetime64[D]")
+        amount = np.array([t["amount_minor"] for t in terms], dtype=np.int64)
+        net_days = np.array([t["net_days"] for t in terms], dtype=np.int64)
+        late_bp = np.array([t["late_fee_bp"] for t in terms], dtype=np.int64)
+
+        # Installments per contract: milestone count, or months strictly before the end date
+        start_months = starts.astype("datetime64[M]")
+        start_day = (starts - start_months.astype("datetime64[D]")).astype(np.int64) + 1
+        end_months = ends.astype("datetime64[M]")
+        end_day = (ends - end_months.astype("datetime64[D]")).astype(np.int64) + 1
+        months = (end_months - start_months).astype(np.int64) + (end_day > start_day)
+        milestone_counts = np.array([len(t["labels"]) for t in terms], dtype=np.int64)
+        counts = np.where(kinds, np.maximum(months, 1), milestone_counts)
+
+        # Flatten: row -> contract, and row -> installment index within its contract
+        self.contract = np.repeat(np.arange(n), counts)
+        offsets = np.cumsum(counts) - counts  # also empty when no contract has terms
+        index = np.arange(counts.sum()) - np.repeat(offsets, counts)
+        recurring = kinds[self.contract]
+
+        # Recurring dates: month arithmetic, day clamped to the month's length
+        row_months = start_months[self.contract] + index.astype("timedelta64[M]")
+        month_days = ((row_months + 1).astype("datetime64[D]") - row_months.astype("datetime64[D]")).astype(np.int64)
+        monthly = row_months.astype("datetime64[D]") + (np.minimum(start_day[self.contract], month_days) - 1)
+        # Milestone dates: evenly spaced over the term, rounded half up to whole days
+        span = (ends - starts).astype(np.int64)[self.contract]
+        count = counts[self.contract]
+        step = np.where(count > 1, (2 * index * span + (count - 1)) // (2 * np.maximum(count - 1, 1)), 0)
+        spaced = starts[self.contract] + step
+        self.invoice_date = np.where(recurring, monthly, spaced)
+        self.due_date = self.invoice_date + net_days[self.contract]
+
+        # Milestone amounts: weighted split rounded half up; the last milestone absorbs the remainder
+        weights = np.concatenate([np.array(t["weights"] if t["kind"] == "milestone" else [1] * int(c), dtype=np.int64)
+                                  for t, c in zip(terms, counts)]) if n else np.zeros(0, dtype=np.int64)
+        weight_sums = np.add.reduceat(weights, offsets) if n else np.zeros(0, dtype=np.int64)
+        weight_sums = np.maximum(weight_sums, 1)
+        split = (2 * amount[self.contract] * weights + weight_sums[self.contract]) // (2 * weight_sums[self.contract])
+        last = index == count - 1
+        split_before_last = np.add.reduceat(np.where(last, 0, split), offsets) if n else split
+        split = np.where(last, amount[self.contract] - split_before_last[self.contract], split)
+        self.amount = np.where(recurring, amount[self.contract], split)
+        self.late_fee = (2 * self.amount * late_bp[self.contract] + 10000) // 20000
+        self.index = index
+        self.offsets = offsets
+        self.counts = counts
+
+    def __len__(self) -> int:
+        return len(self.amount)
+
+    def _label(self, contract: int, index: int) -> str:
+        terms = self.terms[contract]
+        return f"Month {index + 1}" if terms["kind"] == "recurring" else terms["labels"][index]
+
+    def for_contract(self, i: int) -> Dict[str, Any]:
+        """Schedule dict for one contract, in the same shape as schedule_from_terms."""
+        rows = range(self.offsets[i], self.offsets[i] + self.counts[i])
+        terms, currency = self.terms[i], self.terms[i]["currency"]
+        installments = [{
+            "number": int(self.index[row]) + 1,
+            "label": self._label(i, int(self.index[row])),
+            "invoice_date": str(self.invoice_date[row]),
+            "due_date": str(self.due_date[row]),
+            "amount": from_minor(self.amount[row], currency),
+            "late_fee_per_month": from_minor(self.late_fee[row], currency),
+        } for row in rows]
+        digest = hashlib.sha256(json.dumps([self.contract_ids[i], installments], default=str).encode("utf-8")).hexdigest()
+        return {
+            "schedule_id": f"sched_{digest[:12]}",
+            "contract_id": self.contract_ids[i],
+            "kind": terms["kind"],
+            "currency": currency,
+            "total_amount": from_minor(int(self.amount[rows.start:rows.stop].sum()), currency),
+            "net_days": terms["net_days"],
+            "late_fee_percent": str(Decimal(terms["late_fee_bp"]) / 100),
+            "installments": installments,
+        }
+
+    def totals(self) -> Dict[str, str]:
+        """Billed total per currency."""
+        currencies = np.array([t["currency"] for t in self.terms])[self.contract]
+        return {str(c): from_minor(int(self.amount[currencies == c].sum()), c) for c in np.unique(currencies)}
+
+    def invoices(self) -> Iterator[Dict[str, Any]]:
+        # Plain lists: indexing numpy scalars row by row is several times slower
+        columns = zip(self.contract.tolist(), self.index.tolist(), self.amount.tolist(), self.late_fee.tolist(),
+                      self.invoice_date.astype(str).tolist(), self.due_date.astype(str).tolist())
+        for contract, index, amount, fee, invoice_date, due_date in columns:
+            currency = self.terms[contract]["currency"]
+            yield {
+                "invoice_id": f"inv_{self.contract_ids[contract]}_{index + 1}",
+                "contract_id": self.contract_ids[contract],
+                "description": self._label(contract, index),
+                "amount": from_minor(amount, currency),
+                "currency": currency,
+                "issue_date": invoice_date,
+                "due_date": due_date,
+                "late_fee_per_month": from_minor(fee, currency),
+                "status": "draft",
+            }
+
+    def write_invoices(self, path: str) -> int:
+        """Stream every installment's invoice to a JSONL file."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        count = 0
+        with open(path, "w", encoding="utf-8") as f:
+            for invoice in self.invoices():
+                f.write(json.dumps(invoice) + "\n")
+                count += 1
+        return count
+
+    def write_ics(self, path: str, reminder_days: int = REMINDER_DAYS) -> int:
+        """One all-day event per due date, with a reminder a few days before."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("BEGIN:VCALENDAR\nVERSION:2.0\nPRODID:-//Lexis//PaymentSchedule//EN\n")
+            for invoice in self.invoices():
+                f.write("BEGIN:VEVENT\n"
+                        f"UID:{invoice['invoice_id']}@lexis\n"
+                        f"DTSTART;VALUE=DATE:{invoice['due_date'].replace('-', '')}\n"
+                        f"SUMMARY:Payment due: {invoice['description']} {invoice['amount']} {invoice['currency']}"
+                        f" ({invoice['contract_id']})\n"
+                        f"BEGIN:VALARM\nACTION:DISPLAY\nDESCRIPTION:Payment due\nTRIGGER:-P{reminder_days}D\nEND:VALARM\n"
+                        "END:VEVENT\n")
+            f.write("END:VCALENDAR\n")
+        return len(self)
+
+def batch_schedules(contracts: Sequence[Any], contract_ids: Optional[Sequence[str]] = None) -> PortfolioSchedule:
+    """Schedules for a whole portfolio. Contracts without an amount are left out."""
+    ids, terms = [], []
+    for i, facts in enumerate(contracts):
+        parsed = payment_terms(facts)
+        if parsed is not None:
+            ids.append(str(contract_ids[i]) if contract_ids is not None else str(i))
+            terms.append(parsed)
+    return PortfolioSchedule(ids, terms)
+
+def _synthetic_contracts(count: int) -> List[Dict[str, Any]]:
+    rng = random.Random(7)
+    contracts = []
+    for _ in range(count):
+        start = datetime.date(2025, 1, 1) + datetime.timedelta(days=rng.randrange(365))
+        facts = {
+            "START_DATE": start.isoformat(),
+            "END_DATE": (start + datetime.timedelta(days=rng.randrange(30, 720))).isoformat(),
+            "CURRENCY": rng.choice(["USD", "EUR", "GBP", "JPY"]),
+            "PAYMENT_TERMS_DAYS": rng.choice([15, 30, 45, 60]),
+            "LATE_FEE_PERCENT": rng.choice([0, 1, 1.5, 2]),
+        }
+        if rng.random() < 0.4:
+            facts["MONTHLY_RETAINER"] = f"{rng.randrange(500, 20000)}.{rng.randrange(100):02d}"
+        else:
+            facts["TOTAL_AMOUNT"] = f"{rng.randrange(1000, 500000)}.{rng.randrange(100):02d}"
+            if rng.random() < 0.5:
+                facts["MILESTONES"] = "Deposit, Design, Build, Launch"
+                facts["MILESTONE_PERCENTS"] = "33.33, 22.22, 22.22, 22.23"
+        contracts.append(facts)
+    return contracts
+
+def benchmark(count: int = 10000):
+    contracts = _synthetic_contracts(count)
+    ids = [f"c{i}" for i in range(count)]
+
+    start = time.perf_counter()
+    terms = [payment_terms(facts) for facts in contracts]
+    parse_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scalar = [schedule_from_terms(t, i) for t, i in zip(terms, ids)]
+    scalar_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    portfolio = PortfolioSchedule(ids, terms)
+    batch_s = time.perf_counter() - start
+
+    mismatches = sum(portfolio.for_contract(i) != scalar[i] for i in range(count))
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        portfolio.write_invoices(os.path.join(tmp, "invoices.jsonl"))
+        portfolio.write_ics(os.path.join(tmp, "payments.ics"))
+        emit_s = time.perf_counter() - start
+
+    print(f"{count} contracts, {len(portfolio)} installments")
+    print(f"  parse facts:      {parse_s * 1000:8.1f} ms")
+    print(f"  per-contract:     {scalar_s * 1000:8.1f} ms")
+    print(f"  batch (numpy):    {batch_s * 1000:8.1f} ms  ({scalar_s / batch_s:.1f}x)")
+    print(f"  invoices + ICS:   {emit_s * 1000:8.1f} ms")
+    print(f"  batch vs per-contract mismatches: {mismatches}")
+    print(f"  totals: {portfolio.totals()}")
+
 if __name__ == "__main__":
-    generate_invoice(1000)
-    generate_payment_schedule(5000, ["Start", "Mid", "End"])
+    # python -m tools.payment_tools [--benchmark [N]]
+    if len(sys.argv) > 1 and sys.argv[1] == "--benchmark":
+        benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 10000)
+    else:
+        print(generate_invoice(1000))
+        print(json.dumps(generate_payment_schedule(5000, ["Start", "Mid", "End"], "2025-01-01", "2025-03-31",
+                                                   late_fee_percent=1.5), indent=2))
+        print(late_fee("1666.67", 1.5, 45))
+
+        # A monthly amount in the payment clause bills every month of the term
+        local, _ = extract_local_facts("4. Payment\n\n1. Client shall pay $2,000 USD per month, invoiced monthly.\n")
+        monthly = schedule_from_facts({**local, "START_DATE": "2025-01-01", "END_DATE": "2025-06-30"})
+        assert local.get("MONTHLY_FEE") == 2000 and monthly["kind"] == "recurring"
+        assert [i["amount"] for i in monthly["installments"]] == ["2000.00"] * 6
+        assert generate_payment_schedule(None, ["Start"], "2025-01-01") is None
+        assert generate_payment_schedule(5000, ["Start", "End"]) is None
+        print("monthly fee from contract text:", len(monthly["installments"]), "invoices")
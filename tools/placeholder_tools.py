@@ -0,0 +1,113 @@
+import re
+from typing import Dict, List, Tuple
+
+PLACEHOLDER_RE = re.compile(r"\[([A-Z][A-Z0-9_]*)\]")
+# "[CLIENT_NAME]Acme Corp [DATE]2025-01-01" -> key/value pairs
+FILL_PAIR_RE = re.compile(r"\[([A-Za-z][A-Za-z0-9_ ]*)\]\s*([^\[]*)")
+# A placeholder value is a name, date, amount or short phrase; anything longer goes to the LLM router
+MAX_FILL_VALUE_CHARS = 80
+MAX_FILL_VALUE_WORDS = 10
+SENTENCE_BREAK_RE = re.compile(r"[.!?;]\s+[A-Za-z]")
+REQUEST_WORDS_RE = re.compile(r"\b(?:please|also|can you|could you|and then|make sure)\b", re.IGNORECASE)
+# A period after an initial or one of these ends a name or address part, not a sentence ("J. Smith", "Main St. East")
+ABBREVIATIONS = {"inc", "ltd", "co", "corp", "llc", "llp", "plc", "bros", "st", "ave", "rd", "blvd", "apt", "ste",
+                 "no", "dr", "mr", "mrs", "ms", "jr", "sr", "prof"}
+# ...unless an instruction follows it ("Acme Inc. Make the fee net 15")
+INSTRUCTION_START_RE = re.compile(
+    r"(?:please|also|can|could|and then|make|change|add|remove|tighten|update|fix|set|use|include|rewrite|"
+    r"replace|delete|draft)\b", re.IGNORECASE)
+
+def normalize_key(key: str) -> str:
+    return re.sub(r"\s+", "_", key.strip()).upper()
+
+def parse_fill_input(text: str) -> Dict[str, str]:
+    """Parse '[KEY]Value' pairs. Keys are normalized to PLACEHOLDER_CASE."""
+    values = {}
+    for key, value in FILL_PAIR_RE.findall(text or ""):
+        value = value.strip().rstrip(",;").strip()
+        if value:
+            values[normalize_key(key)] = value
+    return values
+
+def has_sentence_break(value: str) -> bool:
+    """True when the value runs on into another sentence; name and address abbreviations don't count."""
+    for match in SENTENCE_BREAK_RE.finditer(value):
+        before = value[:match.start()].split()
+        word = before[-1].rstrip(".").lower() if before else ""
+        if value[match.start()] == "." and (len(word) == 1 or word in ABBREVIATIONS):
+            if INSTRUCTION_START_RE.match(value, match.end() - 1):
+                return True
+            continue
+        return True
+    return False
+
+def is_plain_value(value: str) -> bool:
+    """True for a bare placeholder value; False when it carries an instruction or more text."""
+    value = value.strip().rstrip(",;").strip()
+    return (
+        bool(value)
+        and "\n" not in value
+        and len(value) <= MAX_FILL_VALUE_CHARS
+        and len(value.split()) <= MAX_FILL_VALUE_WORDS
+        and not has_sentence_break(value)
+        and not REQUEST_WORDS_RE.search(value)
+    )
+
+def is_fill_only(text: str) -> bool:
+    """True when the input consists solely of '[KEY]Value' pairs with plain values."""
+    text = (text or "").strip()
+    if not text.startswith("["):
+        return False
+    pairs = FILL_PAIR_RE.findall(text)
+    return bool(pairs) and all(is_plain_value(value) for _, value in pairs)
+
+class PlaceholderIndex:
+    def __init__(self, text: str):
+        self.text = text or ""
+        self.positions: Dict[str, List[int]] = {}
+        for match in PLACEHOLDER_RE.finditer(self.text):
+            self.positions.setdefault(match.group(1), []).append(match.start())
+
+    @property
+    def keys(self) -> List[str]:
+        return list(self.positions)
+
+    def covers(self, values: Dict[str, str]) -> bool:
+        """True if every key in values is a placeholder in the text."""
+        return bool(values) and all(key in self.positions for key in values)
+
+    def fill(self, values: Dict[str, str]) -> Tuple[str, Dict]:
+        """Replace placeholders in one pass. Returns (filled_text, report)."""
+        filled: Dict[str, int] = {}
+
+        def replace(match):
+            key = match.group(1)
+            if key in values:
+                filled[key] = filled.get(key, 0) + 1
+                return values[key]
+            return match.group(0)
+
+        text = PLACEHOLDER_RE.sub(replace, self.text)
+        report = {
+            "filled": filled,
+            "unfilled": [key for key in self.positions if key not in values],
+            "unknown_keys": [key for key in values if key not in self.positions],
+        }
+        return text, report
+
+def fill_placeholders(text: str, values: Dict[str, str]) -> Tuple[str, Dict]:
+    return PlaceholderIndex(text).fill(values)
+
+if __name__ == "__main__":
+    draft = "This Agreement is made on [DATE] between [CLIENT_NAME] and [PROVIDER_NAME]. [CLIENT_NAME] agrees to pay."
+    user_input = "[CLIENT_NAME]Acme Corp [DATE]2025-01-01"
+    print(is_fill_only(user_input), parse_fill_input(user_input))
+    print(fill_placeholders(draft, parse_fill_input(user_input)))
+
+    # Initials and abbreviations are part of the value; a following instruction or sentence is not
+    for text in ("[CLIENT_NAME]Acme Inc. Ltd", "[PROVIDER_NAME]J. Smith", "[ADDRESS]12 Main St. Springfield",
+                 "[CLIENT_NAME]Acme Corp. [DATE]2025-01-01"):
+        assert is_fill_only(text), text
+    for text in ("[CLIENT_NAME]Acme Corp. Make the fee net 15", "[CLIENT_NAME]Acme Corp, also tighten payment",
+                 "[CLIENT_NAME]Acme. Then shorten the term", "[DATE]2025-01-01; Remove the late fee"):
+        assert not is_fill_only(text), text
@@ -0,0 +1,411 @@
+import os
+import re
+import sys
+import json
+import time
+import glob
+import random
+import sqlite3
+import argparse
+import datetime
+import tempfile
+import threading
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from tools.content_cache import content_hash
+from tools.fact_tools import ISO_DATE_RE, LONG_DATE_RE, US_DATE_RE, parse_date, extract_local_facts, load_facts
+from tools.contract_rules import RULES, section_text
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+INDEX_PATH = os.getenv("LEXIS_PORTFOLIO_DB", os.path.join(DATA_DIR, "portfolio.db"))
+# Text exports only: PDF/DOCX/ICS files (signed contracts included) are indexed by the exporter that writes them
+EXPORT_PATTERNS = ("contract*.txt",)
+
+PARTY_RE = re.compile(r"\bbetween\s+(?P<a>[^\n,.;()\[\]]{2,80}?)\s*(?:\([^)]*\)\s*)?,?\s+and\s+(?P<b>[^\n,.;()\[\]]{2,80}?)\s*(?:\(|,|\.|;|\n)",
+                      re.IGNORECASE)
+
+PREAMBLE_CHARS = 1500  # parties are named at the top; later "between the Parties" is boilerplate
+TEXT_FACTS = ("TOTAL_AMOUNT", "CURRENCY", "PAYMENT_TERMS_DAYS")  # read from the payment section only
+SCHEMA_VERSION = 2
+
+# One document per contract (session + content hash); every file exported from it is a row in exports
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    doc_key TEXT UNIQUE NOT NULL,
+    session_id TEXT,
+    version_number INTEGER,
+    content_hash TEXT,
+    title TEXT,
+    client_name TEXT,
+    provider_name TEXT,
+    total_amount REAL,
+    currency TEXT,
+    payment_terms_days INTEGER,
+    governing_law TEXT,
+    start_date TEXT,
+    end_date TEXT,
+    indexed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_documents_client ON documents(client_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_documents_provider ON documents(provider_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_documents_amount ON documents(total_amount);
+CREATE INDEX IF NOT EXISTS idx_documents_terms ON documents(payment_terms_days);
+CREATE INDEX IF NOT EXISTS idx_documents_hash ON documents(content_hash);
+CREATE TABLE IF NOT EXISTS exports (
+    doc_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    path TEXT UNIQUE NOT NULL,
+    format TEXT,
+    exported_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_exports_doc ON exports(doc_id);
+CREATE TABLE IF NOT EXISTS deadlines (
+    doc_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    date TEXT NOT NULL,
+    description TEXT,
+    UNIQUE (doc_id, date, description)
+);
+CREATE INDEX IF NOT EXISTS idx_deadlines_date ON deadlines(date);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(body, tokenize = 'porter unicode61');
+"""
+EXPORTS_COLUMN = "(SELECT group_concat(e.path, ', ') FROM exports e WHERE e.doc_id = d.id) AS path"
+
+def _title(text: str) -> str:
+    for line in text.splitlines():
+        line = line.strip().strip("#*= ").strip()
+        if line and not line.startswith("---"):
+            return line[:120]
+    return ""
+
+def _local_deadlines(text: str) -> List[Dict[str, str]]:
+    """Dates in the text, described by the line they appear on."""
+    deadlines = []
+    for line in text.splitlines():
+        for pattern in (ISO_DATE_RE, US_DATE_RE, LONG_DATE_RE):
+            for match in pattern.findall(line):
+                date = parse_date(match)
+                if date:
+                    deadlines.append({"date": date, "description": line.strip()[:200]})
+    return deadlines
+
+def contract_fields(text: str, facts: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Queryable fields: facts the user gave win over what the local parser reads from the text."""
+    facts = load_facts(facts)
+    local, _ = extract_local_facts(text)
+    # Amounts elsewhere (a liability cap, an insurance minimum) are not the contract value
+    payment, _ = extract_local_facts(section_text(text, RULES["payment_heading"]))
+    parties = PARTY_RE.search(text[:PREAMBLE_CHARS])
+    if parties and "[" in parties.group(0):
+        parties = None  # unfilled placeholders are not names
+
+    def pick(key: str, fallback: Any = None) -> Any:
+        # Unfilled "[KEY]" placeholders in a draft parse as fill pairs, so only rule-based facts come from the text
+        value = facts.get(key, payment.get(key) if key in TEXT_FACTS else None)
+        return fallback if value in (None, "", []) else value
+
+    def number(value: Any) -> Optional[float]:
+        try:
+            return float(str(value).replace(",", "").lstrip("$€£₹")) if value not in (None, "") else None
+        except ValueError:
+            return None
+
+    dates = sorted(local.get("DATES", []))
+    return {
+        "title": _title(text),
+        "client_name": pick("CLIENT_NAME", parties.group("a").strip() if parties else None),
+        "provider_name": pick("PROVIDER_NAME", parties.group("b").strip() if parties else None),
+        "total_amount": number(pick("TOTAL_AMOUNT")),
+        "currency": pick("CURRENCY"),
+        "payment_terms_days": int(number(pick("PAYMENT_TERMS_DAYS")) or 0) or None,
+        "governing_law": pick("GOVERNING_LAW"),
+        "start_date": parse_date(str(pick("START_DATE", ""))) or (dates[0] if dates else None),
+        "end_date": parse_date(str(pick("END_DATE", ""))) or (dates[-1] if len(dates) > 1 else None),
+    }
+
+def _fts_query(text: str) -> str:
+    # Each word is quoted so user input can't inject FTS syntax; the words must appear as a phrase
+    words = re.findall(r"\w+", text)
+    return '"' + " ".join(words) + '"' if words else ""
+
+class PortfolioIndex:
+    """SQLite index (FTS5 + field columns) over exported contracts, draft versions and deadlines."""
+
+    def __init__(self, path: str = INDEX_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        existing = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'documents'").fetchone()
+        if existing and self.conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            # Older indexes kept one row per exported file; start over and let `reindex` fill it again
+            print("Portfolio index format changed; rebuilding (run `python -m tools.portfolio_index reindex`)")
+            self.conn.executescript("DROP TABLE IF EXISTS deadlines; DROP TABLE IF EXISTS exports; "
+                                    "DROP TABLE IF EXISTS documents; DROP TABLE IF EXISTS documents_fts;")
+        self.conn.executescript(SCHEMA)
+        self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._lock = threading.Lock()
+
+    def _write_deadlines(self, doc_id: int, text: str, deadlines: Optional[List[Dict[str, Any]]]):
+        items = [{"date": parse_date(str(item.get("date", ""))), "description": item.get("description", "")}
+                 for item in deadlines or []]
+        covered = {item["date"] for item in items}
+        # Dates found on a line only fill in what the extractor did not describe
+        items += [item for item in _local_deadlines(text) if item["date"] not in covered]
+        self.conn.execute("DELETE FROM deadlines WHERE doc_id = ?", (doc_id,))
+        self.conn.executemany("INSERT OR IGNORE INTO deadlines (doc_id, date, description) VALUES (?, ?, ?)",
+                              [(doc_id, item["date"], item["description"]) for item in items if item["date"]])
+
+    def upsert(self, text: str, session_id: Optional[str] = None, version_number: Optional[int] = None,
+               export_path: Optional[str] = None, facts: Optional[Dict[str, Any]] = None,
+               deadlines: Optional[List[Dict[str, Any]]] = None) -> bool:
+        """Index a contract and attach an exported file to it. Returns False when nothing new was recorded."""
+        digest = content_hash(text)
+        doc_key = f"{session_id or ''}:{digest}"
+        now = datetime.datetime.now().isoformat()
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT id, version_number FROM documents WHERE doc_key = ?", (doc_key,)).fetchone()
+            if row is None and session_id is None:
+                # A file found on disk belongs to the contract with the same content, whichever session wrote it
+                row = self.conn.execute("SELECT id, version_number FROM documents WHERE content_hash = ? "
+                                        "ORDER BY id LIMIT 1", (digest,)).fetchone()
+            changed = row is None
+            if row is None:
+                values = {"doc_key": doc_key, "session_id": session_id, "version_number": version_number,
+                          "content_hash": digest, "indexed_at": now, **contract_fields(text, facts)}
+                doc_id = self.conn.execute(
+                    f"INSERT INTO documents ({', '.join(values)}) VALUES ({', '.join('?' for _ in values)})",
+                    list(values.values())).lastrowid
+                self.conn.execute("INSERT INTO documents_fts (rowid, body) VALUES (?, ?)", (doc_id, text))
+                self._write_deadlines(doc_id, text, deadlines)
+            else:
+                doc_id = row["id"]
+                if version_number is not None and row["version_number"] != version_number:
+                    self.conn.execute("UPDATE documents SET version_number = ? WHERE id = ?", (version_number, doc_id))
+                    changed = True
+                if facts is not None or deadlines is not None:
+                    # Facts and deadlines can arrive on a later turn for the same text
+                    fields = contract_fields(text, facts)
+                    self.conn.execute(f"UPDATE documents SET {', '.join(f'{k} = ?' for k in fields)}, indexed_at = ? "
+                                      "WHERE id = ?", list(fields.values()) + [now, doc_id])
+                    if deadlines is not None:
+                        self._write_deadlines(doc_id, text, deadlines)
+            if export_path:
+                export_path = os.path.abspath(export_path)
+                known = self.conn.execute("SELECT doc_id FROM exports WHERE path = ?", (export_path,)).fetchone()
+                if known is None or known["doc_id"] != doc_id:
+                    self.conn.execute("INSERT INTO exports (doc_id, path, format, exported_at) VALUES (?, ?, ?, ?) "
+                                      "ON CONFLICT(path) DO UPDATE SET doc_id = excluded.doc_id, "
+                                      "exported_at = excluded.exported_at",
+                                      (doc_id, export_path, os.path.splitext(export_path)[1].lstrip("."), now))
+                    changed = True
+        return changed
+
+    def index_export(self, state, path: str) -> bool:
+        """Called by the admin exporters for every file they write."""
+        return self.upsert(state.draft_content or "", session_id=state.session_id, export_path=path,
+                           facts=state.extracted_facts.get("key_info"),
+                           deadlines=state.extracted_facts.get("deadlines") or None)
+
+    def index_version(self, state, version: Dict[str, Any]) -> bool:
+        """Called whenever a draft version is appended to the state."""
+        return self.upsert(version.get("content") or "", session_id=state.session_id,
+                           version_number=version.get("version_number"),
+                           facts=state.extracted_facts.get("key_info"),
+                           deadlines=state.extracted_facts.get("deadlines") or None)
+
+    def search(self, text: Optional[str] = None, party: Optional[str] = None, min_amount: Optional[float] = None,
+               max_amount: Optional[float] = None, date_from: Optional[str] = None, date_to: Optional[str] = None,
+               net_days: Optional[int] = None, kind: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Full-text plus field filters. Dates match the contract term or any deadline in the range."""
+        clauses, params = [], []
+        select = f"SELECT d.*, {EXPORTS_COLUMN}, NULL AS snippet FROM documents d"
+        if text and _fts_query(text):
+            select = (f"SELECT d.*, {EXPORTS_COLUMN}, snippet(documents_fts, 0, '[', ']', '…', 12) AS snippet "
+                      "FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid")
+            clauses.append("documents_fts MATCH ?")
+            params.append(_fts_query(text))
+        if party:
+            clauses.append("(d.client_name LIKE ? OR d.provider_name LIKE ?)")
+            params += [f"%{party}%"] * 2
+        if min_amount is not None:
+            clauses.append("d.total_amount >= ?")
+            params.append(min_amount)
+        if max_amount is not None:
+            clauses.append("d.total_amount <= ?")
+            params.append(max_amount)
+        if net_days is not None:
+            clauses.append("d.payment_terms_days = ?")
+            params.append(net_days)
+        if kind == "export":
+            clauses.append("EXISTS (SELECT 1 FROM exports e WHERE e.doc_id = d.id)")
+        elif kind == "version":
+            clauses.append("d.version_number IS NOT NULL")
+        if date_from or date_to:
+            low, high = date_from or "0000-01-01", date_to or "9999-12-31"
+            clauses.append("(EXISTS (SELECT 1 FROM deadlines x WHERE x.doc_id = d.id AND x.date BETWEEN ? AND ?) "
+                           "OR (d.start_date <= ? AND COALESCE(d.end_date, d.start_date) >= ?))")
+            params += [low, high, high, low]
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        order = " ORDER BY rank" if text and _fts_query(text) else " ORDER BY d.indexed_at DESC"
+        with self._lock:
+            rows = self.conn.execute(f"{select}{where}{order} LIMIT ?", params + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def deadlines(self, date_from: Optional[str] = None, date_to: Optional[str] = None,
+                  within_days: Optional[int] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        if within_days is not None:
+            today = datetime.date.today()
+            date_from, date_to = today.isoformat(), (today + datetime.timedelta(days=within_days)).isoformat()
+        # Each session's deadline is listed once, from its most recent version of the contract
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT x.date, x.description, d.title, d.client_name, d.session_id, d.version_number, {EXPORTS_COLUMN}, "
+                "MAX(d.id) AS doc_id FROM deadlines x JOIN documents d ON d.id = x.doc_id WHERE x.date BETWEEN ? AND ? "
+                "GROUP BY COALESCE(d.session_id, d.id), x.date, x.description ORDER BY x.date LIMIT ?",
+                (date_from or "0000-01-01", date_to or "9999-12-31", limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "contracts": self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0],
+                "versions": self.conn.execute("SELECT COUNT(*) FROM documents WHERE version_number IS NOT NULL").fetchone()[0],
+                "exports": self.conn.execute("SELECT COUNT(*) FROM exports").fetchone()[0],
+                "deadlines": self.conn.execute("SELECT COUNT(*) FROM deadlines").fetchone()[0],
+            }
+
+    def reindex(self, data_dir: str = DATA_DIR) -> int:
+        """Index exports and checkpointed versions already on disk (unchanged ones are skipped)."""
+        from graph.state import ContractState
+        indexed = 0
+        for path in sorted(p for pattern in EXPORT_PATTERNS for p in glob.glob(os.path.join(data_dir, pattern))):
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                indexed += self.upsert(f.read(), export_path=path)
+        checkpoints = [os.path.join(data_dir, "state.json")] + glob.glob(os.path.join(data_dir, "sessions", "*.json"))
+        for path in checkpoints:
+            if not os.path.exists(path):
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    state = ContractState(**json.load(f))
+            except Exception as e:
+                print(f"Skipping {path}: {e}")
+                continue
+            for version in state.versions:
+                indexed += self.index_version(state, version)
+        return indexed
+
+_index: Optional[PortfolioIndex] = None
+_index_lock = threading.Lock()
+
+def get_portfolio_index() -> PortfolioIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = PortfolioIndex()
+        return _index
+
+def record_export(state, path: str):
+    """Index an exported file; a failing index never fails the export."""
+    try:
+        get_portfolio_index().index_export(state, path)
+    except sqlite3.Error as e:
+        print(f"⚠️ Portfolio index not updated for {path}: {e}")
+
+def export_recorder(state) -> Callable[[Optional[str]], None]:
+    """Completion callback for a background render: indexes the file, as of this turn's draft, once it exists."""
+    snapshot = SimpleNamespace(draft_content=state.draft_content, session_id=state.session_id,
+                               extracted_facts=dict(state.extracted_facts))
+
+    def recorded(path: Optional[str]):
+        if path:
+            record_export(snapshot, path)
+    return recorded
+
+def record_version(state, version: Dict[str, Any]):
+    try:
+        get_portfolio_index().index_version(state, version)
+    except sqlite3.Error as e:
+        print(f"⚠️ Portfolio index not updated for version {version.get('version_number')}: {e}")
+
+def benchmark(contracts: int = 5000):
+    """Index synthetic contracts into a temporary database and time typical queries."""
+    clients = ["Acme Corp", "Globex", "Initech", "Umbrella LLC", "Stark Industries", "Wayne Enterprises"]
+    with tempfile.TemporaryDirectory() as tmp:
+        index = PortfolioIndex(os.path.join(tmp, "portfolio.db"))
+        start = time.perf_counter()
+        for i in range(contracts):
+            day = datetime.date(2025, 1, 1) + datetime.timedelta(days=i % 365)
+            text = (f"# Service Agreement {i}\n\nThis Agreement is between {random.choice(clients)} and Studio {i % 50}.\n\n"
+                    f"1. Compensation\n\nClient shall pay ${random.randint(1, 200) * 500:,} within Net "
+                    f"{random.choice([15, 30, 45, 60])} days. Late payments accrue 1.5% per month.\n\n"
+                    f"2. Term\n\nThis Agreement begins on {day.isoformat()} and ends on "
+                    f"{(day + datetime.timedelta(days=90)).isoformat()}.\n\n" + "Standard clause text. " * 200)
+            index.upsert(text, session_id=f"bench{i}", export_path=os.path.join(tmp, f"contract_{i}.txt"))
+        print(f"Indexed {contracts} contracts in {time.perf_counter() - start:.1f}s")
+
+        queries = {
+            "text 'net 60'": lambda: index.search("net 60"),
+            "party 'Globex'": lambda: index.search(party="Globex"),
+            "amount 10k-50k": lambda: index.search(min_amount=10000, max_amount=50000),
+            "net 60 field + party": lambda: index.search(net_days=60, party="Acme"),
+            "date range (March)": lambda: index.search(date_from="2025-03-01", date_to="2025-03-31"),
+            "deadlines next 30 days": lambda: index.deadlines("2025-06-01", "2025-06-30"),
+        }
+        for name, query in queries.items():
+            runs = 20
+            start = time.perf_counter()
+            for _ in range(runs):
+                results = query()
+            print(f"  {name:26} {(time.perf_counter() - start) * 1000 / runs:7.2f} ms  ({len(results)} results)")
+
+def _print_rows(rows: Iterable[Dict[str, Any]], columns: List[str]):
+    for row in rows:
+        print("  " + " | ".join(str(row.get(column) or "") for column in columns))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the contract portfolio index.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    search = commands.add_parser("search", help="full-text and field search")
+    search.add_argument("text", nargs="?")
+    search.add_argument("--party")
+    search.add_argument("--min-amount", type=float)
+    search.add_argument("--max-amount", type=float)
+    search.add_argument("--from", dest="date_from")
+    search.add_argument("--to", dest="date_to")
+    search.add_argument("--net-days", type=int)
+    search.add_argument("--kind", choices=["export", "version"])
+    search.add_argument("--limit", type=int, default=20)
+    deadlines = commands.add_parser("deadlines", help="deadlines in a date range")
+    deadlines.add_argument("--within", type=int, help="days from today")
+    deadlines.add_argument("--from", dest="date_from")
+    deadlines.add_argument("--to", dest="date_to")
+    commands.add_parser("reindex", help="index existing exports and checkpointed versions")
+    commands.add_parser("stats")
+    bench = commands.add_parser("benchmark")
+    bench.add_argument("contracts", nargs="?", type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        benchmark(args.contracts)
+        sys.exit(0)
+    index = get_portfolio_index()
+    start = time.perf_counter()
+    if args.command == "search":
+        rows = index.search(args.text, args.party, args.min_amount, args.max_amount, args.date_from, args.date_to,
+                            args.net_days, args.kind, args.limit)
+        _print_rows(rows, ["path", "session_id", "version_number", "client_name", "total_amount",
+                           "payment_terms_days", "snippet"])
+    elif args.command == "deadlines":
+        rows = index.deadlines(args.date_from, args.date_to, 30 if not (args.within or args.date_from or args.date_to) else args.within)
+        _print_rows(rows, ["date", "description", "client_name", "path", "session_id"])
+    elif args.command == "reindex":
+        rows = []
+        print(f"Indexed {index.reindex()} new or changed documents")
+    else:
+        rows = []
+        print(index.stats())
+    print(f"({len(rows)} results in {(time.perf_counter() - start) * 1000:.1f} ms)")
@@ -0,0 +1,148 @@
+import os
+import re
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+import tiktoken
+
+# Default token budget for a single assembled prompt (override with LEXIS_PROMPT_TOKEN_BUDGET)
+DEFAULT_PROMPT_BUDGET = int(os.getenv("LEXIS_PROMPT_TOKEN_BUDGET", "12000"))
+
+TRIM_MARKER = "\n[... trimmed to fit prompt budget ...]"
+
+class _ApproxEncoding:
+    # Fallback when the tiktoken BPE files cannot be loaded (e.g. offline): ~4 chars per token
+    def encode(self, text: str) -> List[str]:
+        return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+    def decode(self, tokens: List[str]) -> str:
+        return "".join(tokens)
+
+@lru_cache(maxsize=None)
+def load_encoding(model: str = "gpt-4o"):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        print(f"tiktoken unavailable ({e.__class__.__name__}), using approximate token counts")
+        return _ApproxEncoding()
+
+def condense_snippets(text: str) -> str:
+    """Keep only the first sentence of each '- ' bullet (web search snippets)."""
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        first = re.split(r"(?<=[.!?])\s+", line, maxsplit=1)[0]
+        lines.append(first)
+    return "\n".join(lines)
+
+def dedupe_texts(texts: List[str], threshold: float = 0.8) -> List[str]:
+    """Drop texts that are near-duplicates (word-shingle Jaccard) of an earlier one."""
+    kept, signatures = [], []
+    for text in texts:
+        words = re.findall(r"\w+", text.lower())
+        shingles = {" ".join(words[i:i + 3]) for i in range(max(len(words) - 2, 1))}
+        duplicate = False
+        for other in signatures:
+            union = len(shingles | other)
+            if union and len(shingles & other) / union >= threshold:
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append(text)
+            signatures.append(shingles)
+    return kept
+
+class PromptBudgeter:
+    def __init__(self, budget: Optional[int] = None, model: str = "gpt-4o"):
+        self.budget = budget or DEFAULT_PROMPT_BUDGET
+        self.encoding = load_encoding(model)
+        self.components: List[Dict] = []
+        self.report: Dict = {}
+
+    def count(self, text: str) -> int:
+        return len(self.encoding.encode(text or ""))
+
+    def prompt_overhead(self, prompt) -> int:
+        """Tokens used by a ChatPromptTemplate's fixed instructions."""
+        return self.count(prompt.format(**{name: "" for name in prompt.input_variables}))
+
+    def add(self, name: str, text: Optional[str], priority: int, required: bool = False,
+            min_tokens: int = 0, condense: Optional[Callable[[str], str]] = None):
+        """Register a prompt component. Lower priority components are trimmed first."""
+        text = text or ""
+        self.components.append({
+            "name": name,
+            "text": text,
+            "priority": priority,
+            "required": required,
+            "min_tokens": min_tokens,
+            "condense": condense,
+            "tokens": self.count(text),
+        })
+
+    def fit(self, reserved: int = 0) -> Dict[str, str]:
+        """Trim components to fit the budget and return {name: text}. See self.report."""
+        available = self.budget - reserved
+        for comp in self.components:
+            comp["kept"] = comp["text"]
+            comp["kept_tokens"] = comp["tokens"]
+            comp["action"] = "kept"
+
+        used = sum(c["kept_tokens"] for c in self.components)
+        for comp in sorted(self.components, key=lambda c: c["priority"]):
+            if used <= available:
+                break
+            if comp["required"] or not comp["text"]:
+                continue
+            overflow = used - available
+
+            # 1. Condense (e.g. first sentence per web snippet)
+            if comp["condense"]:
+                condensed = comp["condense"](comp["kept"])
+                condensed_tokens = self.count(condensed)
+                if condensed_tokens < comp["kept_tokens"]:
+                    used -= comp["kept_tokens"] - condensed_tokens
+                    overflow = used - available
+                    comp.update(kept=condensed, kept_tokens=condensed_tokens, action="condensed")
+                if overflow <= 0:
+                    continue
+
+            # 2. Truncate down to min_tokens, 3. drop entirely
+            target = max(comp["kept_tokens"] - overflow, comp["min_tokens"])
+            if target <= 0:
+                used -= comp["kept_tokens"]
+                comp.update(kept="", kept_tokens=0, action="dropped")
+            elif target < comp["kept_tokens"]:
+                tokens = self.encoding.encode(comp["kept"])[:target]
+                kept = self.encoding.decode(tokens) + TRIM_MARKER
+                used -= comp["kept_tokens"] - target
+                comp.update(kept=kept, kept_tokens=target, action="trimmed")
+
+        self.report = {
+            "budget": self.budget,
+            "reserved": reserved,
+            "used": used + reserved,
+            "over_budget": used > available,
+            "components": {
+                c["name"]: {"tokens": c["tokens"], "kept": c["kept_tokens"], "action": c["action"]}
+                for c in self.components
+            },
+        }
+        return {c["name"]: c["kept"] for c in self.components}
+
+    def summary(self) -> str:
+        changed = [f"{name}:{info['action']}" for name, info in self.report.get("components", {}).items()
+                   if info["action"] != "kept"]
+        status = ", ".join(changed) if changed else "no trimming"
+        return f"{self.report.get('used', 0)}/{self.budget} tokens ({status})"
+
+if __name__ == "__main__":
+    budgeter = PromptBudgeter(budget=60)
+    budgeter.add("brief", "Build a website for Acme Corp. Fee $5,000.", priority=100, required=True)
+    budgeter.add("market_terms", "- Rates range $50-$150/hr. Many sources agree.\n- Net 30 is common. Some use Net 15.", priority=20, condense=condense_snippets)
+    budgeter.add("templates", "PAYMENT TERMS: The Client shall pay the Freelancer a total fee. " * 5, priority=30)
+    print(budgeter.fit(reserved=10))
+    print(budgeter.summary())
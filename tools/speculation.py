@@ -0,0 +1,171 @@
+import os
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Set
+from tools.content_cache import content_hash
+from tools.turn_budget import current_budget
+
+# Opt-in: speculative work spends LLM calls and CPU on follow-ups the user may never ask for
+SPECULATE = os.getenv("LEXIS_SPECULATE", "0").lower() in ("1", "true", "yes", "on")
+MAX_SESSIONS = int(os.getenv("LEXIS_SPECULATE_MAX_SESSIONS", "64"))
+
+class Speculation:
+    """Precomputed artifacts for one session's draft."""
+
+    def __init__(self, session_id: str, key: str):
+        self.session_id = session_id
+        self.key = key
+        self.futures: Dict[str, Future] = {}
+        self.seconds: Dict[str, float] = {}
+        self.used: Set[str] = set()
+        self.discarded = False
+
+class Speculator:
+    """Runs registered jobs (deadlines, placeholder index, renders) on a fresh draft while the user reads it.
+
+    Results are keyed by session and draft hash: a follow-up turn on the same draft takes them instead of
+    recomputing, and they are thrown away as soon as the draft changes.
+    """
+
+    def __init__(self, enabled: Optional[bool] = None, max_workers: int = 2):
+        self.enabled = SPECULATE if enabled is None else enabled
+        self.jobs: Dict[str, Callable[[str], Any]] = {}
+        self.sessions: Dict[str, Speculation] = {}
+        self.stats = {"scheduled": 0, "hits": 0, "misses": 0, "discarded": 0,
+                      "saved_seconds": 0.0, "wasted_seconds": 0.0}
+        self._lock = threading.Lock()
+        # Few workers so speculation never crowds out a live turn; two let an LLM call overlap a render
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculate")
+
+    def register(self, artifact: str, job: Callable[[str], Any]):
+        """job(draft) -> artifact; returning None means nothing usable was produced."""
+        self.jobs[artifact] = job
+
+    def schedule(self, state):
+        if not self.enabled or not self.jobs or not state.draft_content:
+            return
+        key = content_hash(state.draft_content)
+        with self._lock:
+            current = self.sessions.pop(state.session_id, None)
+            if current is not None and current.key == key:
+                self.sessions[state.session_id] = current
+                return
+            if current is not None:
+                self._discard(current)
+            while len(self.sessions) >= MAX_SESSIONS:
+                self._discard(self.sessions.pop(next(iter(self.sessions))))
+
+            speculation = self.sessions[state.session_id] = Speculation(state.session_id, key)
+            for artifact, job in self.jobs.items():
+                speculation.futures[artifact] = self._executor.submit(self._run, speculation, artifact, job,
+                                                                      state.draft_content)
+            self.stats["scheduled"] += 1
+        print(f"--- Speculation: precomputing {', '.join(self.jobs)} in the background ---")
+
+    def _run(self, speculation: Speculation, artifact: str, job: Callable[[str], Any], draft: str) -> Any:
+        if speculation.discarded:
+            return None
+        start = time.perf_counter()
+        try:
+            return job(draft)
+        except Exception as e:
+            print(f"⚠️ Speculative {artifact} failed: {e}")
+            return None
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                speculation.seconds[artifact] = elapsed
+                if speculation.discarded:
+                    self.stats["wasted_seconds"] += elapsed
+
+    def _discard(self, speculation: Speculation):
+        # Caller holds the lock. Jobs not started yet are cancelled; finished ones that were never used are waste.
+        speculation.discarded = True
+        unused = [artifact for artifact in speculation.futures if artifact not in speculation.used]
+        for artifact in unused:
+            future = speculation.futures[artifact]
+            if not future.cancel() and future.done():
+                self.stats["wasted_seconds"] += speculation.seconds.get(artifact, 0.0)
+        if unused:
+            self.stats["discarded"] += 1
+
+    def _lookup(self, state, artifact: str):
+        key = content_hash(state.draft_content)
+        with self._lock:
+            speculation = self.sessions.get(state.session_id)
+            if speculation is not None and speculation.key != key:
+                # The draft changed since speculating
+                self._discard(self.sessions.pop(state.session_id))
+                speculation = None
+            future = speculation.futures.get(artifact) if speculation is not None else None
+            if future is None:
+                self.stats["misses"] += 1
+            return speculation, future
+
+    def _settle(self, speculation: Speculation, artifact: str, result: Any) -> Any:
+        with self._lock:
+            if result is None:
+                self.stats["misses"] += 1
+            elif artifact not in speculation.used:
+                speculation.used.add(artifact)
+                self.stats["hits"] += 1
+                self.stats["saved_seconds"] += speculation.seconds.get(artifact, 0.0)
+        return result
+
+    def take(self, state, artifact: str, wait: bool = True) -> Any:
+        """The speculated artifact for the state's current draft; None on a miss.
+
+        A job still running is waited for within the turn budget, or counted as a miss with wait=False.
+        """
+        if not self.enabled:
+            return None
+        speculation, future = self._lookup(state, artifact)
+        if future is None:
+            return None
+        budget = current_budget()
+        try:
+            if not wait and not future.done():
+                raise TimeoutError(artifact)
+            result = future.result(timeout=budget.remaining() if budget is not None else None)
+        except Exception:
+            result = None  # cancelled, still running, or still running at the deadline
+        return self._settle(speculation, artifact, result)
+
+    def then(self, state, artifact: str, callback: Callable[[Any], Any]) -> bool:
+        """Run callback(artifact or None) once the speculated artifact is ready, without waiting for it here.
+
+        Returns False on a miss, in which case the callback is not scheduled.
+        """
+        if not self.enabled:
+            return False
+        speculation, future = self._lookup(state, artifact)
+        if future is None:
+            return False
+
+        def chained(done: Future):
+            try:
+                result = done.result()
+            except Exception:
+                result = None
+            callback(self._settle(speculation, artifact, result))
+        # Runs right away when the job already finished, otherwise on the speculation worker
+        future.add_done_callback(chained)
+        return True
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **{k: round(v, 2) if isinstance(v, float) else v for k, v in self.stats.items()},
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+                "enabled": self.enabled,
+            }
+
+_speculator: Optional[Speculator] = None
+
+def get_speculator() -> Speculator:
+    global _speculator
+    if _speculator is None:
+        _speculator = Speculator()
+    return _speculator
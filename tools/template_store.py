@@ -1,33 +1,177 @@
 import os
-from typing import List, Optional
+import re
+import sys
+import time
+import uuid
+import sqlite3
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
 from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
+from tools.llm_gateway import get_gateway
+from tools.bm25_index import BM25Index, reciprocal_rank_fusion
+from tools.content_cache import content_hash
 from langchain_core.documents import Document
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# hybrid: BM25 + vector fused with RRF; vector: embeddings only; lexical: BM25 only, no embedding call
+SEARCH_MODES = ("hybrid", "vector", "lexical")
+DEFAULT_SEARCH_MODE = os.getenv("LEXIS_CLAUSE_SEARCH_MODE", "hybrid")
+CANDIDATES_PER_RESULT = 4  # each retriever contributes k * 4 candidates to the fusion
+HASH_KEY = "content_hash"  # metadata field: lets a refresh find edited documents without reading their text
+SYNC_PAGE = 1000
+
+# One lexical index per collection, shared by every TemplateStore in the process
+_lexical_indexes: Dict[Tuple[str, str], BM25Index] = {}
+_lexical_lock = threading.Lock()
+# Collection write mark each shared index was last synced at
+_synced_marks: Dict[Tuple[str, str], Optional[int]] = {}
+
 class TemplateStore:
-    def __init__(self):
-        self.persist_directory = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "vector_db")
+    def __init__(self, collection_name: str = "contract_clauses", persist_directory: Optional[str] = None,
+                 mode: str = DEFAULT_SEARCH_MODE, lexical: bool = True):
+        self.persist_directory = persist_directory or os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "vector_db")
         os.makedirs(self.persist_directory, exist_ok=True)
-        
-        self.embeddings = OpenAIEmbeddings()
+
+        self.embeddings = get_gateway().embeddings()
         self.vector_store = Chroma(
             persist_directory=self.persist_directory, 
             embedding_function=self.embeddings,
-            collection_name="contract_clauses"
+            collection_name=collection_name
         )
+        self.mode = mode if mode in SEARCH_MODES else "hybrid"
+        # Lexical index over the same documents, keyed by Chroma id; built once per collection, then kept current
+        # by this class's writes. Write-only users (bulk import) pass lexical=False and never load it; readers
+        # pick their writes up on the next search.
+        key = self._index_key = (os.path.abspath(self.persist_directory), collection_name)
+        self.lexical_index: Optional[BM25Index] = None
+        if not lexical:
+            self.mode = "vector"
+            return
+        with _lexical_lock:
+            self.lexical_index = _lexical_indexes.get(key)
+            if self.lexical_index is None:
+                self.lexical_index = _lexical_indexes[key] = BM25Index()
+                self.refresh()
+
+    def _write_mark(self) -> Optional[int]:
+        """Highest sequence number Chroma has applied to this collection; moves on every add, update or delete."""
+        path = os.path.join(self.persist_directory, "chroma.sqlite3")
+        try:
+            with sqlite3.connect(path, timeout=30) as conn:
+                row = conn.execute(
+                    "SELECT MAX(m.seq_id) FROM max_seq_id m JOIN segments s ON s.id = m.segment_id "
+                    "WHERE s.collection = ?", (str(self.vector_store._collection.id),)).fetchone()
+            return row[0]
+        except sqlite3.Error:
+            return self.vector_store._collection.count()
+
+    def _refresh_if_changed(self):
+        """Resync the lexical index when the collection was written since the last sync (by anyone)."""
+        if self.lexical_index is None:
+            return
+        mark = self._write_mark()
+        if _synced_marks.get(self._index_key, -1) != mark:
+            self.refresh()
+
+    def refresh(self) -> int:
+        """Bring the lexical index in line with the collection after writes from another process.
+
+        Reads ids and content hashes only; text is fetched just for new or edited documents. Returns the
+        number of documents indexed or dropped.
+        """
+        # Taken first: a write landing during the scan moves the mark again and triggers the next refresh
+        mark = self._write_mark()
+        collection = self.vector_store._collection
+        seen, changed, offset = set(), [], 0
+        while True:
+            batch = collection.get(include=["metadatas"], limit=SYNC_PAGE, offset=offset)
+            for doc_id, metadata in zip(batch["ids"], batch["metadatas"]):
+                seen.add(doc_id)
+                digest = (metadata or {}).get(HASH_KEY)
+                if doc_id not in self.lexical_index or (digest and digest != self.lexical_index.hashes.get(doc_id)):
+                    changed.append(doc_id)
+            if len(batch["ids"]) < SYNC_PAGE:
+                break
+            offset += SYNC_PAGE
+        for start in range(0, len(changed), SYNC_PAGE):
+            batch = collection.get(ids=changed[start:start + SYNC_PAGE], include=["documents"])
+            for doc_id, text in zip(batch["ids"], batch["documents"]):
+                self.lexical_index.add(doc_id, text or "")
+        stale = [doc_id for doc_id in list(self.lexical_index.hashes) if doc_id not in seen]
+        self.lexical_index.remove(stale)
+        _synced_marks[self._index_key] = mark
+        return len(changed) + len(stale)
+
+    def _with_hashes(self, documents: List[str], metadatas: Optional[List[dict]]) -> Tuple[List[str], List[dict]]:
+        digests = [content_hash(text) for text in documents]
+        metadatas = metadatas or [{} for _ in documents]
+        return digests, [{**(metadata or {}), HASH_KEY: digest} for metadata, digest in zip(metadatas, digests)]
 
     def add_documents(self, documents: List[str], metadatas: Optional[List[dict]] = None):
         if not documents:
             return
-        self.vector_store.add_texts(texts=documents, metadatas=metadatas)
+        ids = [str(uuid.uuid4()) for _ in documents]
+        digests, metadatas = self._with_hashes(documents, metadatas)
+        self.vector_store.add_texts(texts=documents, metadatas=metadatas, ids=ids)
+        if self.lexical_index is not None:
+            for doc_id, text, digest in zip(ids, documents, digests):
+                self.lexical_index.add(doc_id, text, digest)
         print(f"Added {len(documents)} documents to TemplateStore.")
 
-    def search(self, query: str, k: int = 3) -> List[str]:
-        results = self.vector_store.similarity_search(query, k=k)
-        return [doc.page_content for doc in results]
+    def upsert_documents(self, ids: List[str], documents: List[str], metadatas: Optional[List[dict]] = None,
+                         embeddings: Optional[List[List[float]]] = None):
+        """Insert or replace documents by id; only documents whose content changed are re-indexed."""
+        if not documents:
+            return
+        digests, metadatas = self._with_hashes(documents, metadatas)
+        self.vector_store._collection.upsert(
+            ids=ids,
+            embeddings=embeddings if embeddings is not None else self.embeddings.embed_documents(documents),
+            documents=documents,
+            metadatas=metadatas,
+        )
+        if self.lexical_index is not None:
+            for doc_id, text, digest in zip(ids, documents, digests):
+                self.lexical_index.add(doc_id, text, digest)
+
+    def delete_documents(self, ids: List[str]):
+        if ids:
+            self.vector_store.delete(ids=ids)
+            if self.lexical_index is not None:
+                self.lexical_index.remove(ids)
+
+    def _lexical_search(self, query: str, k: int) -> List[Tuple[str, str]]:
+        self._refresh_if_changed()
+        ids = [doc_id for doc_id, _ in self.lexical_index.search(query, k)]
+        if not ids:
+            return []
+        # Text comes from the collection; the index only holds postings
+        batch = self.vector_store._collection.get(ids=ids, include=["documents"])
+        texts = dict(zip(batch["ids"], batch["documents"]))
+        return [(doc_id, texts[doc_id]) for doc_id in ids if texts.get(doc_id) is not None]
+
+    def _vector_search(self, query: str, k: int) -> List[Tuple[str, str]]:
+        return [(doc.id, doc.page_content) for doc in self.vector_store.similarity_search(query, k=k)]
+
+    def search(self, query: str, k: int = 3, mode: Optional[str] = None) -> List[str]:
+        mode = (mode or self.mode) if self.lexical_index is not None else "vector"
+        if mode == "lexical":
+            return [text for _, text in self._lexical_search(query, k)]
+        if mode == "vector":
+            return [text for _, text in self._vector_search(query, k)]
+
+        lexical = self._lexical_search(query, k * CANDIDATES_PER_RESULT)
+        try:
+            vector = self._vector_search(query, k * CANDIDATES_PER_RESULT)
+        except Exception as e:
+            print(f"⚠️ Vector search failed ({e}); using lexical results")
+            return [text for _, text in lexical[:k]]
+        texts: Dict[str, str] = dict(lexical + vector)
+        fused = reciprocal_rank_fusion([[doc_id for doc_id, _ in lexical], [doc_id for doc_id, _ in vector]])
+        return [texts[doc_id] for doc_id in fused[:k]]
 
     def get_retriever(self):
         return self.vector_store.as_retriever(search_kwargs={"k": 3})
@@ -53,10 +197,106 @@ class TemplateStore:
         else:
             print(f"No text files found in {directory}")
 
+# Benchmark queries over clauses/ split into sections: (query, expected section label).
+# These were written while reading the clauses, so they share its wording and flatter lexical search.
+BENCHMARK_QUERIES = [
+    ("Net 30 invoice payment due", "payment.txt"),
+    ("late fee on unpaid invoices", "general_service_agreement.txt#4"),
+    ("hourly rate compensation", "general_service_agreement.txt#4"),
+    ("work for hire intellectual property ownership", "general_service_agreement.txt#7"),
+    ("indemnification survives termination", "termination.txt"),
+    ("terminate with written notice", "general_service_agreement.txt#9"),
+    ("deliverables described in Exhibit A", "scope.txt"),
+    ("scope creep out-of-scope work", "general_service_agreement.txt#1"),
+    ("independent contractor taxes insurance", "general_service_agreement.txt#5"),
+    ("confidential proprietary information", "general_service_agreement.txt#8"),
+    ("limitation of liability damages", "general_service_agreement.txt#11"),
+    ("arbitration dispute resolution", "general_service_agreement.txt#12"),
+    ("which state law governs", "general_service_agreement.txt#13"),
+    ("unlimited revisions rounds", "general_service_agreement.txt#6"),
+]
+# Held out: phrased the way users ask, written from the section titles without reusing the clause text.
+# Any of the listed sections counts as a hit.
+HELD_OUT_QUERIES = [
+    ("client wants to cancel the project early", ("general_service_agreement.txt#9", "termination.txt")),
+    ("who keeps the rights to the logo I designed", ("general_service_agreement.txt#7",)),
+    ("what if the client never pays me", ("general_service_agreement.txt#4", "payment.txt")),
+    ("am I their employee", ("general_service_agreement.txt#5",)),
+    ("how many times can they ask for changes", ("general_service_agreement.txt#6",)),
+    ("keeping the client's business secrets private", ("general_service_agreement.txt#8",)),
+    ("most I could owe if something goes wrong", ("general_service_agreement.txt#11",)),
+    ("we disagree and need a mediator", ("general_service_agreement.txt#12",)),
+    ("which courts have jurisdiction", ("general_service_agreement.txt#12", "general_service_agreement.txt#13")),
+    ("how long does this contract last", ("general_service_agreement.txt#2",)),
+    ("when do I need to be reachable each week", ("general_service_agreement.txt#3",)),
+    ("list of things I am supposed to hand over", ("scope.txt", "general_service_agreement.txt#1")),
+    ("does this replace what we agreed over email", ("general_service_agreement.txt#14",)),
+    ("promises about the quality of my work", ("general_service_agreement.txt#10",)),
+]
+SECTION_RE = re.compile(r"^(\d+)\.\s+\S", re.MULTILINE)
+
+def _benchmark_sections(directory: str) -> Tuple[List[str], List[dict]]:
+    documents, metadatas = [], []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".txt"):
+            continue
+        with open(os.path.join(directory, filename), "r", encoding="utf-8") as f:
+            content = f.read()
+        starts = list(SECTION_RE.finditer(content))
+        if len(starts) < 5:
+            documents.append(content)
+            metadatas.append({"source": filename, "label": filename})
+            continue
+        for i, match in enumerate(starts):
+            end = starts[i + 1].start() if i + 1 < len(starts) else len(content)
+            documents.append(content[match.start():end])
+            metadatas.append({"source": filename, "label": f"{filename}#{match.group(1)}"})
+    return documents, metadatas
+
+def benchmark_search(directory: str, k: int = 3):
+    """Recall@k and mean latency per search mode over clauses/ split into sections."""
+    documents, metadatas = _benchmark_sections(directory)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = TemplateStore(collection_name="clause_benchmark", persist_directory=tmp)
+        ids = [str(uuid.uuid4()) for _ in documents]
+        labels = {doc_id: meta["label"] for doc_id, meta in zip(ids, metadatas)}
+        for doc_id, text in zip(ids, documents):
+            store.lexical_index.add(doc_id, text)
+        modes = ["lexical"]
+        try:
+            store.vector_store.add_texts(texts=documents, metadatas=metadatas, ids=ids)
+            modes += ["vector", "hybrid"]
+        except Exception as e:
+            print(f"Embeddings unavailable ({e}); benchmarking lexical mode only")
+
+        # The index is queried directly: it stays populated even when embedding (and so the collection) failed
+        retrievers = {
+            "lexical": lambda q: [doc_id for doc_id, _ in store.lexical_index.search(q, k)],
+            "vector": lambda q: [doc_id for doc_id, _ in store._vector_search(q, k)],
+            "hybrid": lambda q: reciprocal_rank_fusion(
+                [[doc_id for doc_id, _ in store.lexical_index.search(q, k * CANDIDATES_PER_RESULT)],
+                 [doc_id for doc_id, _ in store._vector_search(q, k * CANDIDATES_PER_RESULT)]])[:k],
+        }
+        query_sets = [("in-sample (written against the corpus, optimistic)", BENCHMARK_QUERIES),
+                      ("held-out", HELD_OUT_QUERIES)]
+        print(f"{len(documents)} sections, k={k}")
+        for title, queries in query_sets:
+            print(f"{title}: {len(queries)} queries")
+            for mode in modes:
+                hits, start = 0, time.perf_counter()
+                for query, expected in queries:
+                    accepted = (expected,) if isinstance(expected, str) else expected
+                    hits += any(labels[doc_id] in accepted for doc_id in retrievers[mode](query))
+                elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+                print(f"  {mode:8} recall@{k}: {hits / len(queries):.2f}  latency: {elapsed_ms:.2f} ms/query")
+
 if __name__ == "__main__":
-    store = TemplateStore()
-    # Test loading clauses
     clauses_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "clauses")
-    store.load_clauses(clauses_dir)
-    print("Search results for 'payment':")
-    print(store.search("payment"))
+    if len(sys.argv) > 1 and sys.argv[1] == "--benchmark":
+        benchmark_search(clauses_dir)
+    else:
+        store = TemplateStore()
+        # Test loading clauses
+        store.load_clauses(clauses_dir)
+        print("Search results for 'payment':")
+        print(store.search("payment"))
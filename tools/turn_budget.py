@@ -0,0 +1,84 @@
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+DEFAULT_TURN_BUDGET = float(os.getenv("LEXIS_TURN_BUDGET_SECONDS", "180"))
+# Time kept back for the required stages (writer, validator) before an optional stage may start
+RESERVE_SECONDS = float(os.getenv("LEXIS_TURN_RESERVE_SECONDS", "60"))
+# Rough time an optional stage needs; below reserve + this it is skipped or served from cache
+OPTIONAL_STAGE_SECONDS = {
+    "structure_research": 10.0,
+    "market_research": 10.0,
+    "self_correction": 30.0,
+    "feedback": 8.0,
+}
+
+class TurnCancelled(Exception):
+    """The turn was cancelled by the user or ran past its deadline during a required call."""
+
+class TurnBudget:
+    """Deadline and cancellation flag for one turn, visible to every node through a contextvar."""
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.seconds = seconds or DEFAULT_TURN_BUDGET
+        self.started = time.monotonic()
+        self.deadline = self.started + self.seconds
+        self.reason: Optional[str] = None
+        self.degraded: Dict[str, str] = {}  # stage -> "skipped" / "served from cache"
+        self._cancelled = threading.Event()
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self, reason: str = "cancelled by user"):
+        if not self.cancelled:
+            self.reason = reason
+            self._cancelled.set()
+
+    def check(self):
+        """Raise TurnCancelled if the turn was cancelled or its deadline has passed."""
+        if not self.cancelled and self.remaining() <= 0:
+            self.cancel(f"turn budget of {self.seconds:.0f}s exceeded")
+        if self.cancelled:
+            raise TurnCancelled(self.reason)
+
+    def wait(self, seconds: float):
+        """Sleep (e.g. a retry backoff) that wakes up as soon as the turn is cancelled."""
+        self._cancelled.wait(min(seconds, self.remaining()))
+        self.check()
+
+    def allows(self, stage: str) -> bool:
+        """Whether there is time for an optional stage on top of the reserve for required stages."""
+        return not self.cancelled and self.remaining() >= RESERVE_SECONDS + OPTIONAL_STAGE_SECONDS.get(stage, 5.0)
+
+    def degrade(self, stage: str, how: str):
+        self.degraded[stage] = how
+        print(f"--- Turn budget: {stage} {how} ({self.remaining():.0f}s left) ---")
+
+_current_budget: contextvars.ContextVar[Optional[TurnBudget]] = contextvars.ContextVar("turn_budget", default=None)
+
+def current_budget() -> Optional[TurnBudget]:
+    return _current_budget.get()
+
+@contextmanager
+def active_budget(budget: TurnBudget) -> Iterator[TurnBudget]:
+    """Make the budget current for this turn; an interrupt (Ctrl-C) cancels it for every worker thread."""
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    except BaseException as e:
+        if not isinstance(e, TurnCancelled):
+            budget.cancel("interrupted" if isinstance(e, KeyboardInterrupt) else f"failed: {e}")
+        raise
+    finally:
+        _current_budget.reset(token)